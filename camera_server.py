@@ -37,11 +37,73 @@ import subprocess
 
 app = Flask(__name__)
 
+# 新しいフレームが来ない間の再送間隔（秒）。カメラ停止中でも切断されたクライアントを検知するため
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get('STREAM_KEEPALIVE_SECONDS', '5'))
+
+class FrameSlot:
+    """
+    最新のJPEGフレームを版数つきで保持するスロット
+    配信側は条件変数で新しい版を待つので、同じフレームの再送や無駄な待ち時間が発生しない
+    """
+    LATENCY_EMA_ALPHA = 0.1
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.frame = None
+        self.version = 0
+        self.capture_time = None
+        # 取得から送信までの遅延（秒）
+        self.latency_last = 0.0
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+        self.sent_count = 0
+
+    def publish(self, frame_bytes, capture_time):
+        with self._cond:
+            self.frame = frame_bytes
+            self.capture_time = capture_time
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_newer(self, last_version, timeout=None):
+        """
+        last_version より新しい版を待って返す
+
+        Returns:
+            (version, frame_bytes, capture_time): タイムアウト時は (last_version, None, None)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.version > last_version and self.frame is not None, timeout):
+                return last_version, None, None
+            return self.version, self.frame, self.capture_time
+
+    def record_sent(self, capture_time):
+        latency = time.time() - capture_time
+        with self._cond:
+            self.sent_count += 1
+            self.latency_last = latency
+            if self.latency_avg == 0.0:
+                self.latency_avg = latency
+            else:
+                self.latency_avg += self.LATENCY_EMA_ALPHA * (latency - self.latency_avg)
+            self.latency_max = max(self.latency_max, latency)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "version": self.version,
+                "sent": self.sent_count,
+                "latency_ms": {
+                    "last": round(self.latency_last * 1000, 1),
+                    "avg": round(self.latency_avg * 1000, 1),
+                    "max": round(self.latency_max * 1000, 1),
+                },
+            }
+
 # グローバル変数
 camera = None
 running = True
-latest_frame = None
-frame_lock = threading.Lock()
+frame_slot = FrameSlot()  # 最新フレーム（JPEG）
 camera_thread = None
 camera_control_lock = threading.Lock()
 
@@ -278,7 +340,7 @@ def camera_capture_loop(camera_device_id=0):
     バックグラウンドでカメラからフレームを取得し続けるループ
     サーバー起動時に自動的に開始される
     """
-    global camera, running, latest_frame, frame_lock
+    global camera, running
     
     print(f"[カメラサーバー] カメラデバイス {camera_device_id} を開きます...")
     camera = cv2.VideoCapture(camera_device_id)
@@ -302,6 +364,7 @@ def camera_capture_loop(camera_device_id=0):
     try:
         while running:
             ret, frame = camera.read()
+            capture_time = time.time()
             if not ret:
                 print(f"[カメラサーバー] フレーム読み込みに失敗しました")
                 time.sleep(0.1)
@@ -314,16 +377,14 @@ def camera_capture_loop(camera_device_id=0):
                 alpha = float(2.0 ** software_ev)
                 frame = cv2.convertScaleAbs(frame, alpha=alpha, beta=0)
             
-            # 最新フレームを更新（スレッドセーフ）
-            with frame_lock:
-                # JPEG形式にエンコード
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if ret:
-                    latest_frame = buffer.tobytes()
-                    frame_count += 1
-                    
-                    if frame_count % 300 == 0:  # 300フレームごとにログ出力（約10秒）
-                        print(f"[カメラサーバー] {frame_count}フレームを生成しました")
+            # JPEG形式にエンコードして最新フレームを更新（待機中の配信スレッドに通知）
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            if ret:
+                frame_slot.publish(buffer.tobytes(), capture_time)
+                frame_count += 1
+                
+                if frame_count % 300 == 0:  # 300フレームごとにログ出力（約10秒）
+                    print(f"[カメラサーバー] {frame_count}フレームを生成しました")
             
             time.sleep(0.125)  # 約8fps
     except Exception as e:
@@ -338,23 +399,32 @@ def camera_capture_loop(camera_device_id=0):
 def generate_frames():
     """
     ストリーミング用のフレーム生成ジェネレータ
-    バックグラウンドで生成された最新フレームを返す
+    バックグラウンドで生成された最新フレームを、新しい版が届いた時だけ返す
+    （カメラが止まって新しい版が来ない場合も、切断検知のため一定間隔で最後のフレームを再送）
     """
-    global running, latest_frame, frame_lock
+    global running
     
+    last_version = 0
+    last_bytes = None
+    last_sent = time.monotonic()
     while running:
-        with frame_lock:
-            if latest_frame is not None:
-                frame_bytes = latest_frame
-            else:
-                # フレームがまだ生成されていない場合は待機
-                time.sleep(0.1)
+        version, frame_bytes, capture_time = frame_slot.wait_newer(last_version, timeout=1.0)
+        if frame_bytes is None:
+            # フレームがまだ生成されていない、またはカメラが停止している
+            if last_bytes is None or time.monotonic() - last_sent < STREAM_KEEPALIVE_SECONDS:
                 continue
+            # 送信に失敗すればジェネレータが閉じられ、このスレッドも終了する
+            frame_bytes, capture_time = last_bytes, None
+        last_version = version
+        last_bytes = frame_bytes
+        last_sent = time.monotonic()
         
+        # Content-Lengthを付けると受信側（母艦のパススルー受信）が次の区切りを待たずに切り出せる
         yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.125)  # 約8fps
+               b'Content-Type: image/jpeg\r\n'
+               b'Content-Length: ' + str(len(frame_bytes)).encode('ascii') + b'\r\n\r\n' + frame_bytes + b'\r\n')
+        if capture_time is not None:
+            frame_slot.record_sent(capture_time)
 
 @app.route('/stream')
 def video_feed():
@@ -418,7 +488,8 @@ def info():
         'ip_address': ip_address,
         'stream_url': f"http://{ip_address}:{port}/stream",
         'status': 'running',
-        'camera_device_id': camera_device_id
+        'camera_device_id': camera_device_id,
+        'stream_stats': frame_slot.stats(),
     })
 
 @app.route('/controls', methods=['GET'])
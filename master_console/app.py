@@ -1,9 +1,9 @@
 """
-Flaskアプリケーション: 4カメラストリーミング受信・統合・YOLO処理
+Flaskアプリケーション: 複数カメラストリーミング受信・統合・YOLO処理
 """
 import cv2
 import numpy as np
-from flask import Flask, render_template, Response
+from flask import Flask, render_template, Response, jsonify
 from flask_socketio import SocketIO, emit
 import threading
 import queue
@@ -15,6 +15,12 @@ import signal
 import sys
 import requests
 from yolo_processor import YOLOProcessor
+from inference_worker import InferencePool, DROPPED
+from frame_ring import SharedFrameRing, CopyMeter
+from frame_broadcast import FrameBroadcaster, placeholder_jpeg
+from mjpeg_reader import MjpegPassthroughStream
+from mosaic import MosaicCompositor
+from grid_layout import GridLayout
 import config
 from camera_discovery import discover_cameras_fast, discover_cameras, discover_cameras_by_info, get_local_ip
 
@@ -31,27 +37,54 @@ def add_no_cache_headers(response):
     response.headers.setdefault('Expires', '0')
     return response
 
+# 統合フレームのタイル配置（合成とYOLOのカメラ判定で共有）
+grid_layout = GridLayout(
+    config.MAX_CAMERAS,
+    config.FRAME_WIDTH,
+    config.FRAME_HEIGHT,
+    columns=config.GRID_COLUMNS or None
+)
+
 # YOLOプロセッサの初期化
 yolo_processor = YOLOProcessor(
     model_path=config.YOLO_MODEL_PATH,
-    confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD
+    confidence_threshold=config.YOLO_CONFIDENCE_THRESHOLD,
+    layout=grid_layout,
+    load_model=config.YOLO_WORKERS == 0
 )
 
+# 統合フレームのスナップショット用リングバッファ（YOLO処理・推論ワーカーはスロットをコピーせずに読み、配信前にJPEGへエンコードする）
+# スロット数: 推論中（ワーカー数）+ 書き込み中 + 予備
+frame_ring = SharedFrameRing(max(3, config.YOLO_WORKERS + 2), (grid_layout.height, grid_layout.width, 3))
+frame_copy_meter = CopyMeter()  # フレーム全体のコピー量（バイト/秒）
+
+# 推論ワーカープール（YOLO_WORKERS > 0 の場合のみ。推論だけを別プロセスで行う）
+inference_pool = None
+if config.YOLO_WORKERS > 0:
+    inference_pool = InferencePool(
+        config.YOLO_WORKERS,
+        model_path=config.YOLO_MODEL_PATH,
+        confidence=config.YOLO_CONFIDENCE_THRESHOLD,
+        # per_cameraモードでカメラ台数分の720pフレームが収まるサイズ（mosaicモードはリングバッファを直接読む）
+        slot_bytes=config.MAX_CAMERAS * 1280 * 720 * 3,
+        ring=frame_ring,
+        copy_meter=frame_copy_meter
+    )
+
 # グローバル変数
 camera_streams = {}  # カメラストリームの管理
 stream_queues = {}  # 各カメラのフレームキュー
 merged_frame = None  # 統合されたフレーム
 merged_frame_lock = threading.Lock()  # 統合フレームのロック
 merged_frame_version = 0  # フレーム更新版数
-processed_frame_cache = None  # YOLO処理済みフレーム
-processed_frame_lock = threading.Lock()
-processed_frame_version = 0
+merged_frame_time = None  # 統合フレームへ最後に反映したカメラフレームの取得時刻
+merged_tile_versions = {}  # カメラIDごとのタイルの更新版数（変化したタイルだけトラッキングを進めるため）
 processing_thread = None
 processing_thread_running = False
 running = True  # アプリケーションの実行状態
 camera_threads = []  # カメラスレッドのリスト
 camera_running = {}  # 各カメラの実行状態（カメラIDをキー、True/Falseを値）
-camera_caps = {}  # 各カメラのVideoCaptureオブジェクト（停止時にリリースするため）
+camera_caps = {}  # 各カメラのVideoCapture/MjpegPassthroughStream（停止時にリリースするため）
 camera_targets = {}  # 各カメラの制御先（子機のbase_url/port/ip）
 
 # カメラ設定（config.pyから読み込み）
@@ -59,6 +92,13 @@ MAX_CAMERAS = config.MAX_CAMERAS
 CAMERA_PORTS = config.CAMERA_PORTS
 # カメラベースURLは検出時に動的に決定（起動時は使用しない）
 
+# 配信用ブロードキャスタ（JPEGエンコードはソースごと・版数ごとに1回だけ）
+camera_broadcasters = {i: FrameBroadcaster(f'camera{i}', jpeg_quality=85) for i in range(MAX_CAMERAS)}
+merged_broadcaster = FrameBroadcaster('merged', jpeg_quality=90)
+
+# 統合フレームの合成（バッファは起動時に1回だけ確保）
+mosaic_compositor = MosaicCompositor(grid_layout)
+
 # データ保存用ディレクトリ
 DATA_DIR = config.DATA_DIR
 if not os.path.exists(DATA_DIR):
@@ -66,163 +106,272 @@ if not os.path.exists(DATA_DIR):
 
 # read_camera_stream関数は削除（read_camera_stream_with_urlに統合）
 
-def update_merged_frame(camera_id, frame):
+def update_merged_frame(camera_id, frame, capture_time=None):
     """
-    4つのカメラフレームを1つの画像に統合
-    接続されているカメラだけでマージし、未接続のカメラは空白を開ける
+    カメラフレームを1つの画像（グリッド）に統合
+    更新されたカメラのタイルだけを統合フレームのバッファへ直接書き込む
+    （未接続のカメラのタイルは「No Signal」表示のまま）
     """
-    global merged_frame, merged_frame_version
-    
-    # カメラフレームを保存
-    camera_streams[camera_id] = frame.copy()
+    global merged_frame, merged_frame_version, merged_frame_time
     
-    # 接続されているカメラの数に関わらず、常にマージ画像を生成
-    frames = []
-    for i in range(MAX_CAMERAS):
-        if i in camera_streams:
-            # 接続されているカメラ: フレームをリサイズ（アスペクト比を保持）
-            original_frame = camera_streams[i]
-            original_h, original_w = original_frame.shape[:2]
-            original_aspect = original_w / original_h
-            
-            # 目標サイズのアスペクト比
-            target_aspect = config.FRAME_WIDTH / config.FRAME_HEIGHT
-            
-            # アスペクト比を保持してリサイズ
-            if original_aspect > target_aspect:
-                # 幅基準でリサイズ
-                new_w = config.FRAME_WIDTH
-                new_h = int(config.FRAME_WIDTH / original_aspect)
-            else:
-                # 高さ基準でリサイズ
-                new_h = config.FRAME_HEIGHT
-                new_w = int(config.FRAME_HEIGHT * original_aspect)
-            
-            resized = cv2.resize(original_frame, (new_w, new_h))
-            
-            # 目標サイズに合わせてパディング（中央配置）
-            pad_h = (config.FRAME_HEIGHT - new_h) // 2
-            pad_w = (config.FRAME_WIDTH - new_w) // 2
-            
-            padded = np.zeros((config.FRAME_HEIGHT, config.FRAME_WIDTH, 3), dtype=np.uint8)
-            padded[pad_h:pad_h+new_h, pad_w:pad_w+new_w] = resized
-            
-            frames.append(padded)
-        else:
-            # 接続されていないカメラは黒画像（空白を開ける）
-            blank_frame = np.zeros((config.FRAME_HEIGHT, config.FRAME_WIDTH, 3), dtype=np.uint8)
-            cv2.putText(blank_frame, f'Camera {i} - No Signal', 
-                       (10, config.FRAME_HEIGHT // 2), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (128, 128, 128), 1)
-            frames.append(blank_frame)
-    
-    # 2x2グリッドに配置
-    top_row = np.hstack([frames[0], frames[1]])
-    bottom_row = np.hstack([frames[2], frames[3]])
-    merged = np.vstack([top_row, bottom_row])
+    # カメラフレームを保存（接続状態の判定用）
+    camera_streams[camera_id] = frame
     
     with merged_frame_lock:
-        merged_frame = merged
+        mosaic_compositor.update_tile(camera_id, frame)
+        merged_frame = mosaic_compositor.buffer
         merged_frame_version += 1
+        merged_frame_time = capture_time or time.time()
+        merged_tile_versions[camera_id] = merged_tile_versions.get(camera_id, 0) + 1
 
-def get_latest_frame(camera_id):
+def clear_merged_tile(camera_id):
     """
-    指定カメラの最新フレームを取得
+    切断されたカメラのタイルを「No Signal」表示に戻す
     """
-    # camera_streamsから直接取得（最新のフレーム）
-    if camera_id in camera_streams:
-        return camera_streams[camera_id].copy()
-    
-    # キューから取得を試みる（フォールバック）
-    if camera_id in stream_queues:
-        try:
-            frame = stream_queues[camera_id].get_nowait()
-            # 取得したフレームをcamera_streamsにも保存
-            camera_streams[camera_id] = frame.copy()
-            return frame
-        except queue.Empty:
-            pass
-    
-    return None
+    global merged_frame_version
+    with merged_frame_lock:
+        mosaic_compositor.clear_tile(camera_id)
+        if merged_frame is not None:
+            merged_frame_version += 1
+            merged_tile_versions[camera_id] = merged_tile_versions.get(camera_id, 0) + 1
+
+def _iter_new_jpegs(broadcaster, placeholder_text):
+    """
+    ブロードキャスタに新しい版が登録されるたびにJPEGバイト列を返すジェネレータ
+    フレーム未登録の間はプレースホルダを返し、その後は新しい版が来るまで待機する
+    （同じフレームは再送しない。ただし長時間更新がない場合は切断検知のため最後の画像を再送）
+    """
+    last_version = 0
+    last_bytes = placeholder_jpeg(placeholder_text)
+    if broadcaster.version == 0:
+        yield last_bytes
+    while True:
+        version = broadcaster.wait_for_version(last_version, timeout=config.STREAM_KEEPALIVE_SECONDS)
+        if version == last_version:
+            yield last_bytes
+            continue
+        sent_version, frame_bytes = broadcaster.get_jpeg(last_version)
+        if frame_bytes is None:
+            # エンコード失敗した版は読み飛ばす
+            last_version = version
+            continue
+        last_version = sent_version
+        last_bytes = frame_bytes
+        yield frame_bytes
 
 def generate_frames(camera_id):
     """
     カメラストリーム用のジェネレータ（MJPEG形式）
+    エンコード済みのJPEGをブロードキャスタから受け取り、新しいフレームが届いた時だけ配信する
     """
     print(f"[generate_frames] カメラ {camera_id} のストリーム生成を開始")
-    last_frame = None
     frame_sent_count = 0
     
-    while True:
-        try:
-            frame = get_latest_frame(camera_id)
-            if frame is None:
-                # フレームがない場合は最後のフレームを使用、または黒画像
-                if last_frame is not None:
-                    frame = last_frame
-                else:
-                    frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                    cv2.putText(frame, f'Camera {camera_id} - No Signal', 
-                               (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            else:
-                last_frame = frame.copy()
-                frame_sent_count += 1
-                if frame_sent_count == 1:
-                    print(f"[generate_frames] カメラ {camera_id}: 最初のフレームを送信")
-                if frame_sent_count % 30 == 0:
-                    print(f"[generate_frames] カメラ {camera_id}: {frame_sent_count}フレーム送信")
-            
-            # JPEG形式にエンコード
-            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            if not ret:
-                print(f"[generate_frames] カメラ {camera_id}: JPEGエンコード失敗")
-                time.sleep(0.033)  # 約30fps
-                continue
+    try:
+        for frame_bytes in _iter_new_jpegs(camera_broadcasters[camera_id], f'Camera {camera_id} - No Signal'):
+            frame_sent_count += 1
+            if frame_sent_count == 1:
+                print(f"[generate_frames] カメラ {camera_id}: 最初のフレームを送信")
+            if frame_sent_count % 30 == 0:
+                print(f"[generate_frames] カメラ {camera_id}: {frame_sent_count}フレーム送信")
             
-            frame_bytes = buffer.tobytes()
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            
-            # フレームレート制御（約30fps）
-            time.sleep(0.033)
-        except Exception as e:
-            print(f"[generate_frames] カメラ {camera_id} エラー: {e}")
-            import traceback
-            traceback.print_exc()
-            time.sleep(0.1)
+    except Exception as e:
+        print(f"[generate_frames] カメラ {camera_id} エラー: {e}")
+        import traceback
+        traceback.print_exc()
+
+def _compose_passthrough_frames(composed_versions):
+    """
+    パススルー受信したカメラのJPEGをデコードして統合フレームへ反映
+    YOLO処理ループから呼ばれるため、処理が追いつかない間に届いた版はデコードされない
+    
+    Args:
+        composed_versions: カメラIDごとに統合フレームへ反映済みの版数（呼び出し側で保持）
+    """
+    for camera_id, broadcaster in camera_broadcasters.items():
+        if not camera_running.get(camera_id, False):
             continue
+        if broadcaster.version == composed_versions.get(camera_id):
+            continue
+        version, frame = broadcaster.get_frame()
+        if frame is None:
+            continue
+        composed_versions[camera_id] = version
+        update_merged_frame(camera_id, frame, capture_time=broadcaster.capture_time)
+
+def _collect_per_camera_frames(inferred_versions, camera_detections):
+    """
+    前回推論以降に新しいフレームが届いたカメラの最新フレームを集める（同じフレームを二重に数えないため）
+    
+    Args:
+        inferred_versions: カメラIDごとに推論済みの版数（呼び出し側で保持）
+        camera_detections: カメラIDごとの直近の検出結果（停止したカメラの分を消す）
+    
+    Returns:
+        frames_by_camera: {camera_id: フレーム}
+    """
+    frames_by_camera = {}
+    for camera_id, broadcaster in camera_broadcasters.items():
+        if not camera_running.get(camera_id, False):
+            camera_detections.pop(camera_id, None)
+            continue
+        version, frame = broadcaster.get_frame()
+        if frame is None or version == inferred_versions.get(camera_id):
+            continue
+        inferred_versions[camera_id] = version
+        frames_by_camera[camera_id] = frame
+    return frames_by_camera
+
+def _draw_per_camera_detections(mosaic_frame, frames_by_camera, detections, camera_detections):
+    """
+    カメラ座標の検出結果を統合フレーム座標に変換して描画（統合フレームのスナップショットに直接描画）
+    今回推論しなかったカメラは直近の検出結果をそのまま描画する
+    """
+    for camera_id, frame in frames_by_camera.items():
+        src_size = (frame.shape[1], frame.shape[0])
+        mapped = []
+        for detection in detections:
+            if detection['camera_id'] != camera_id:
+                continue
+            bbox = mosaic_compositor.bbox_to_mosaic(camera_id, detection['bbox'], src_size)
+            if bbox is not None:
+                mapped.append(dict(detection, bbox=bbox))
+        camera_detections[camera_id] = mapped
+    
+    drawn = [d for camera_id in camera_detections for d in camera_detections[camera_id]]
+    return yolo_processor.draw_detections(mosaic_frame, drawn, in_place=True)
+
+def _run_per_camera_inference(mosaic_frame, inferred_versions, camera_detections):
+    """
+    各カメラの最新フレームを1バッチでYOLO推論し、結果を統合フレームに描画
+    
+    Args:
+        mosaic_frame: 描画先の統合フレーム（リングバッファのスロット）
+        inferred_versions: カメラIDごとに推論済みの版数（呼び出し側で保持）
+        camera_detections: カメラIDごとの直近の検出結果（描画用、呼び出し側で保持）
+    
+    Returns:
+        (processed_frame, detections): 描画済みフレームと今回の検出結果
+    """
+    frames_by_camera = _collect_per_camera_frames(inferred_versions, camera_detections)
+    detections = yolo_processor.process_batch(frames_by_camera)
+    return _draw_per_camera_detections(mosaic_frame, frames_by_camera, detections, camera_detections), detections
+
+def _snapshot_merged_frame(last_processed_version):
+    """
+    統合フレームが更新されていればリングバッファの空きスロットへスナップショットを書き込む
+    
+    Returns:
+        (slot, frame, version, capture_time, tile_versions): 更新が無い・空きスロットが無い場合は None
+    """
+    with merged_frame_lock:
+        if merged_frame is None or merged_frame_version == last_processed_version:
+            return None
+        acquired = frame_ring.acquire()
+        if acquired is None:
+            return None
+        slot, frame = acquired
+        np.copyto(frame, merged_frame)
+        version = merged_frame_version
+        capture_time = merged_frame_time
+        tile_versions = dict(merged_tile_versions)
+    frame_copy_meter.add(frame.nbytes)
+    frame_ring.commit(slot, capture_time)
+    return slot, frame, version, capture_time, tile_versions
+
+def _submit_to_inference_pool(slot, mosaic_frame, capture_time, tile_versions, inferred_versions, camera_detections):
+    """
+    推論ワーカーへフレームを投入（結果は _handle_pool_result で処理）
+    mosaicモードはリングバッファのスロットをそのまま渡す（ワーカーが共有メモリを直接読む）
+    """
+    if config.YOLO_INFERENCE_MODE == 'per_camera':
+        frames_by_camera = _collect_per_camera_frames(inferred_versions, camera_detections)
+        if not frames_by_camera:
+            frame_ring.release(slot)
+            return
+        context = ('per_camera', slot, mosaic_frame, frames_by_camera, None, capture_time)
+        inference_pool.submit(list(frames_by_camera.values()), context)
+    else:
+        context = ('mosaic', slot, mosaic_frame, None, tile_versions, capture_time)
+        inference_pool.submit_ring_slot(slot, frame_ring.seq_of(slot), context)
+
+def _handle_pool_result(context, arrays, error, camera_detections):
+    """
+    推論ワーカーの結果をパース・描画・保存して配信する
+    """
+    mode, slot, mosaic_frame, frames_by_camera, tile_versions, capture_time = context
+    if error == DROPPED:
+        # 新しいフレームに置き換えられたため推論しなかった
+        frame_ring.release(slot)
+        return
+    if error is not None:
+        print(f"[YOLO] 推論ワーカーでエラー: {error}")
+        _publish_processed_frame(slot, mosaic_frame, [], capture_time)
+        return
+    if mode == 'per_camera':
+        detections = yolo_processor.process_batch_results(frames_by_camera, arrays)
+        processed_frame = _draw_per_camera_detections(mosaic_frame, frames_by_camera, detections, camera_detections)
+    else:
+        processed_frame, detections = yolo_processor.process_frame_result(
+            mosaic_frame, arrays[0], in_place=True, tile_versions=tile_versions
+        )
+    _publish_processed_frame(slot, processed_frame, detections, capture_time)
+
+def _publish_processed_frame(slot, processed_frame, detections, capture_time):
+    """
+    YOLO処理済みフレームを配信し、検出結果をSocketIOで通知
+    スロットの画素は再利用されるため、JPEGにエンコードしてからスロットを解放する
+    （購読者が後からスロットを読むと書き換え途中のフレームを送ってしまう）
+    """
+    merged_broadcaster.publish_encoded(processed_frame, capture_time=capture_time)
+    frame_ring.release(slot)
+    
+    if detections:
+        try:
+            socketio.emit(
+                'yolo_detections',
+                {'detections': detections, 'timestamp': datetime.now().isoformat()},
+                namespace='/',
+            )
+        except Exception as emit_error:
+            print(f"[YOLO] SocketIO送信エラー: {emit_error}")
 
 def _process_merged_frames_loop():
     """
     UI表示に依存せず統合フレームへYOLO処理を走らせるバックグラウンドタスク
     """
-    global processed_frame_cache, processed_frame_version
     print("[YOLO] 背景処理スレッドを開始します")
     last_processed_version = -1
+    composed_versions = {}
+    inferred_versions = {}
+    camera_detections = {}
     while processing_thread_running:
         try:
-            with merged_frame_lock:
-                frame = merged_frame.copy() if merged_frame is not None else None
-                current_version = merged_frame_version
-            if frame is None or current_version == last_processed_version:
-                socketio.sleep(0.05)
+            if config.CAMERA_PASSTHROUGH:
+                _compose_passthrough_frames(composed_versions)
+            if inference_pool is not None:
+                for context, arrays, error in inference_pool.poll():
+                    _handle_pool_result(context, arrays, error, camera_detections)
+            snapshot = _snapshot_merged_frame(last_processed_version)
+            if snapshot is None:
+                socketio.sleep(0.01 if inference_pool is not None else 0.05)
                 continue
-            last_processed_version = current_version
+            slot, frame, last_processed_version, capture_time, tile_versions = snapshot
 
-            processed_frame, detections = yolo_processor.process_frame(frame, camera_id=None)
-            with processed_frame_lock:
-                processed_frame_cache = processed_frame.copy()
-                processed_frame_version = current_version
+            if inference_pool is not None:
+                _submit_to_inference_pool(slot, frame, capture_time, tile_versions, inferred_versions, camera_detections)
+                socketio.sleep(0)
+                continue
 
-            if detections:
-                try:
-                    socketio.emit(
-                        'yolo_detections',
-                        {'detections': detections, 'timestamp': datetime.now().isoformat()},
-                        namespace='/',
-                    )
-                except Exception as emit_error:
-                    print(f"[YOLO] SocketIO送信エラー: {emit_error}")
+            if config.YOLO_INFERENCE_MODE == 'per_camera':
+                processed_frame, detections = _run_per_camera_inference(frame, inferred_versions, camera_detections)
+            else:
+                processed_frame, detections = yolo_processor.process_frame(
+                    frame, camera_id=None, in_place=True, tile_versions=tile_versions
+                )
+            _publish_processed_frame(slot, processed_frame, detections, capture_time)
 
             socketio.sleep(0)
         except Exception as loop_error:
@@ -254,39 +403,11 @@ def generate_merged_frame():
     統合フレーム用のジェネレータ（YOLO処理済みフレームを配信）
     """
     ensure_processing_thread()
-    while True:
-        try:
-            with processed_frame_lock:
-                if processed_frame_cache is not None:
-                    frame = processed_frame_cache.copy()
-                else:
-                    frame = None
-
-            if frame is None:
-                frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv2.putText(
-                    frame,
-                    'Merged Frame - No Signal',
-                    (50, 240),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    1,
-                    (255, 255, 255),
-                    2,
-                )
-
-            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            if not ret:
-                time.sleep(0.033)
-                continue
-
-            frame_bytes = buffer.tobytes()
+    try:
+        for frame_bytes in _iter_new_jpegs(merged_broadcaster, 'Merged Frame - No Signal'):
             yield b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n'
-
-            # フレームレート制御（約30fps）
-            time.sleep(0.033)
-        except Exception as e:
-            print(f"generate_merged_frame error: {e}")
-            time.sleep(0.1)
+    except Exception as e:
+        print(f"generate_merged_frame error: {e}")
 
 
 # UI表示の有無に関わらずYOLO処理を常駐させる
@@ -296,7 +417,12 @@ ensure_processing_thread()
 def index():
     """メインページ"""
     # カメラポート情報をテンプレートに渡す
-    return render_template('index.html', camera_ports=CAMERA_PORTS)
+    return render_template(
+        'index.html',
+        camera_ports=CAMERA_PORTS,
+        max_cameras=MAX_CAMERAS,
+        grid_columns=grid_layout.columns,
+    )
 
 @app.route('/video_feed/<int:camera_id>')
 def video_feed(camera_id):
@@ -327,6 +453,26 @@ def merged_feed():
                         'Expires': '0'
                     })
 
+@app.route('/stream_stats')
+def stream_stats():
+    """
+    配信統計（JPEGエンコード回数と配信フレーム数）
+    """
+    return jsonify(_collect_stream_stats())
+
+def _collect_stream_stats():
+    """ブロードキャスタごとの統計をまとめる"""
+    stats = {
+        'cameras': {i: b.stats() for i, b in camera_broadcasters.items()},
+        'merged': merged_broadcaster.stats(),
+        'frame_ring': frame_ring.stats(),
+        'frame_copies': frame_copy_meter.stats(),
+    }
+    all_stats = list(stats['cameras'].values()) + [stats['merged']]
+    stats['total_encodes'] = sum(s['encodes'] for s in all_stats)
+    stats['total_served'] = sum(s['served'] for s in all_stats)
+    return stats
+
 @socketio.on('connect')
 def handle_connect():
     """クライアント接続時の処理"""
@@ -372,6 +518,7 @@ def handle_stop_camera(data):
     # データ構造から削除
     if camera_id in camera_streams:
         camera_streams.pop(camera_id)
+        clear_merged_tile(camera_id)
     if camera_id in stream_queues:
         stream_queues.pop(camera_id)
     camera_targets.pop(camera_id, None)
@@ -385,6 +532,9 @@ def handle_get_status():
     status = {
         'cameras': {},
         'merged_frame_available': merged_frame is not None,
+        'stream_stats': _collect_stream_stats(),
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        'tracking': yolo_processor.tracking_stats(),
         'timestamp': datetime.now().isoformat()
     }
     for i in range(MAX_CAMERAS):
@@ -502,8 +652,12 @@ def signal_handler(sig, frame):
     running = False
     
     stop_processing_thread()
-    # 集計スレッドを停止
-    yolo_processor.stop_aggregation_thread()
+    # 集計スレッドを停止し、検出データの残りを書き出す
+    yolo_processor.close()
+    # 推論ワーカーを停止
+    if inference_pool is not None:
+        inference_pool.close()
+    frame_ring.close()
     
     # カメラスレッドの終了を待つ
     for thread in camera_threads:
@@ -536,6 +690,9 @@ def handle_discover_cameras():
         except ValueError:
             print(f"[警告] ポート {port} が設定にありません。スキップします。")
             return
+        if camera_id >= MAX_CAMERAS:
+            print(f"[警告] ポート {port} はカメラ台数 (MAX_CAMERAS={MAX_CAMERAS}) を超えています。スキップします。")
+            return
         
         connected_ports.add(port)
         discovered_cameras[port] = ip
@@ -561,6 +718,7 @@ def handle_discover_cameras():
                         camera_caps.pop(camera_id, None)
             # データ構造から削除
             camera_streams.pop(camera_id, None)
+            clear_merged_tile(camera_id)
             stream_queues.pop(camera_id, None)
             camera_running.pop(camera_id, None)
         
@@ -591,7 +749,7 @@ def handle_discover_cameras():
     for port, ip in fast_scan_results.items():
         connect_camera_immediately(port, ip)
     
-    # 4台すべて見つからない場合は、HTTPベースの検出を試行（/infoエンドポイント使用）
+    # 全台見つからない場合は、HTTPベースの検出を試行（/infoエンドポイント使用）
     if len(connected_ports) < MAX_CAMERAS:
         print(f"高速モードで {len(connected_ports)} 台接続。HTTPベースの検出を実行します...")
         # 既知の子機IPアドレスがあればデバッグモードでスキャン（環境変数から取得可能）
@@ -638,20 +796,27 @@ def handle_discover_cameras():
 def read_camera_stream_with_url(camera_id, port, base_url):
     """
     カメラストリームを読み込む（URL指定版）
+    パススルーモードではJPEGをデコードせずにそのまま配信用ブロードキャスタへ渡す
     """
     global running, camera_running, camera_caps
     url = f"{base_url}:{port}/stream"
-    print(f"\n[カメラ {camera_id}] 接続を試みます: {url}")
+    passthrough = config.CAMERA_PASSTHROUGH
+    print(f"\n[カメラ {camera_id}] 接続を試みます: {url}" + (" (パススルー)" if passthrough else ""))
     
     # カメラの実行状態をTrueに設定
     camera_running[camera_id] = True
     
-    # OpenCVのVideoCaptureでMJPEGストリームを読み込む
-    cap = cv2.VideoCapture(url)
-    camera_caps[camera_id] = cap  # 後でリリースするために保存
-    
-    # タイムアウト設定（重要）
-    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # バッファを最小化
+    if passthrough:
+        # multipartを直接読み、JPEGバイト列のまま受け取る
+        cap = MjpegPassthroughStream(url)
+        camera_caps[camera_id] = cap  # 後でリリースするために保存
+    else:
+        # OpenCVのVideoCaptureでMJPEGストリームを読み込む
+        cap = cv2.VideoCapture(url)
+        camera_caps[camera_id] = cap  # 後でリリースするために保存
+        
+        # タイムアウト設定（重要）
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # バッファを最小化
     
     if not cap.isOpened():
         error_msg = f"カメラ {camera_id} (ポート {port}, URL: {url}) に接続できませんでした"
@@ -684,7 +849,10 @@ def read_camera_stream_with_url(camera_id, port, base_url):
             break
         
         try:
-            ret, frame = cap.read()
+            if passthrough:
+                ret, frame = cap.read_jpeg()
+            else:
+                ret, frame = cap.read()
         except Exception as e:
             print(f"[カメラ {camera_id}] cap.read()でエラーが発生しました: {e}")
             # capが無効になった可能性があるので、ループを終了
@@ -699,17 +867,25 @@ def read_camera_stream_with_url(camera_id, port, base_url):
             time.sleep(0.1)  # 短い待機時間
             continue
         
-        # フレーム読み込み成功
+        # フレーム読み込み成功（受信時刻を遅延計測の起点として個別表示・統合フレームの両方に渡す）
+        capture_time = time.time()
         no_frame_count = 0
         frame_count += 1
         
         if frame_count == 1:
             print(f"[カメラ {camera_id}] 最初のフレームを受信しました！")
+        if passthrough:
+            if frame_count % 30 == 0:  # 30フレームごとにログ出力
+                print(f"[カメラ {camera_id}] {frame_count}フレーム受信 (JPEG {len(frame)}バイト)")
+            # デコードせずに配信（統合フレームへの反映はYOLO処理ループがデコードして行う）
+            camera_broadcasters[camera_id].publish_jpeg(frame, capture_time=capture_time)
+            continue
+        
         if frame_count % 30 == 0:  # 30フレームごとにログ出力
             print(f"[カメラ {camera_id}] {frame_count}フレーム受信 (サイズ: {frame.shape})")
         
-        # フレームをcamera_streamsに保存（統合フレーム用・個別表示用）
-        camera_streams[camera_id] = frame.copy()
+        # 個別表示用に配信（統合フレームへの反映は下のupdate_merged_frameで行う）
+        camera_broadcasters[camera_id].publish(frame, capture_time=capture_time)
         
         # フレームをキューに追加（個別表示用のバックアップ）
         if camera_id in stream_queues:
@@ -725,7 +901,7 @@ def read_camera_stream_with_url(camera_id, port, base_url):
         
         # 統合フレームの更新
         if running and camera_running.get(camera_id, False):
-            update_merged_frame(camera_id, frame)
+            update_merged_frame(camera_id, frame, capture_time=capture_time)
     
     # クリーンアップ
     print(f"[カメラ {camera_id}] ストリームを停止しています...")
@@ -746,6 +922,7 @@ def read_camera_stream_with_url(camera_id, port, base_url):
     camera_running.pop(camera_id, None)
     if camera_id in camera_streams:
         camera_streams.pop(camera_id)
+        clear_merged_tile(camera_id)
     if camera_id in stream_queues:
         stream_queues.pop(camera_id)
     
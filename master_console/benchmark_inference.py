@@ -0,0 +1,138 @@
+"""
+推論モードのベンチマーク
+録画したクリップ（カメラごとに1ファイル）を使って、統合フレーム推論（mosaic）と
+カメラごとのバッチ推論（per_camera）のスループットと人物検出数を比較する
+
+使い方:
+    python benchmark_inference.py cam0.mp4 cam1.mp4 cam2.mp4 cam3.mp4 --frames 200
+
+正解ラベルは無いため、recall は per_camera（各カメラの元解像度で検出）の結果を基準に
+mosaic がどれだけ同じ人物を検出できたか（IoU >= 閾値で対応付け）として計算する
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+import config
+from grid_layout import GridLayout
+from mosaic import MosaicCompositor
+from tracker import iou_matrix
+
+
+def _count_matches(reference, candidates, iou_threshold):
+    """
+    reference の各bboxに対して、IoUが閾値以上の candidates を貪欲に1対1で対応付けた数
+    """
+    iou = iou_matrix(reference, candidates)
+    matched = 0
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        matched += 1
+        iou[i, :] = -1
+        iou[:, j] = -1
+    return matched
+
+
+def _person_boxes(result):
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 4))
+    data = result.boxes.data.cpu().numpy()
+    return data[data[:, 5] == 0, :4]
+
+
+def run_benchmark(clip_paths, max_frames, model_path, confidence, iou_threshold):
+    from ultralytics import YOLO
+
+    model = YOLO(model_path or 'yolov8n.pt')
+    captures = [cv2.VideoCapture(path) for path in clip_paths]
+    layout = GridLayout(len(captures), config.FRAME_WIDTH, config.FRAME_HEIGHT, columns=config.GRID_COLUMNS or None)
+    compositor = MosaicCompositor(layout)
+
+    # ウォームアップ（初回推論のモデル初期化を計測に含めない）
+    warmup = np.zeros((layout.height, layout.width, 3), dtype=np.uint8)
+    model(warmup, conf=confidence, classes=[0], verbose=False)
+
+    mosaic_seconds = 0.0
+    batch_seconds = 0.0
+    steps = 0
+    reference_count = 0
+    mosaic_count = 0
+    matched_count = 0
+    straddling_count = 0
+
+    while steps < max_frames:
+        frames = []
+        for cap in captures:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        if len(frames) < len(captures):
+            break
+        steps += 1
+
+        # mosaic: 統合フレームを合成して1枚として推論
+        start = time.perf_counter()
+        for camera_id, frame in enumerate(frames):
+            compositor.update_tile(camera_id, frame)
+        mosaic_result = model(compositor.buffer.copy(), conf=confidence, classes=[0], verbose=False)[0]
+        mosaic_boxes = _person_boxes(mosaic_result)
+        mosaic_seconds += time.perf_counter() - start
+
+        # per_camera: 各カメラのフレームを1バッチで推論
+        start = time.perf_counter()
+        batch_results = model(frames, conf=confidence, classes=[0], verbose=False)
+        camera_boxes = [_person_boxes(result) for result in batch_results]
+        batch_seconds += time.perf_counter() - start
+
+        # mosaic の検出をカメラ座標に戻して per_camera と対応付け
+        mosaic_by_camera = [[] for _ in frames]
+        for box in mosaic_boxes:
+            center_x, center_y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+            camera_id = layout.camera_at(center_x, center_y)
+            if camera_id is None:
+                continue
+            if layout.camera_at(box[0], box[1]) != layout.camera_at(box[2] - 1, box[3] - 1):
+                straddling_count += 1
+            src_size = (frames[camera_id].shape[1], frames[camera_id].shape[0])
+            mosaic_by_camera[camera_id].append(compositor.bbox_from_mosaic(camera_id, box, src_size))
+
+        for reference, candidates in zip(camera_boxes, mosaic_by_camera):
+            reference_count += len(reference)
+            mosaic_count += len(candidates)
+            matched_count += _count_matches(reference, candidates, iou_threshold)
+
+    for cap in captures:
+        cap.release()
+
+    if steps == 0:
+        print("クリップからフレームを読み込めませんでした")
+        return
+
+    camera_frames = steps * len(captures)
+    print("=== 推論モード ベンチマーク ===")
+    print(f"カメラ数: {len(captures)} / ステップ数: {steps} / グリッド: {layout.rows}x{layout.columns}")
+    print(f"mosaic     : {camera_frames / mosaic_seconds:7.1f} カメラフレーム/秒 "
+          f"({mosaic_seconds / steps * 1000:6.1f} ms/ステップ), 検出 {mosaic_count} 人, "
+          f"タイル境界をまたぐ検出 {straddling_count}")
+    print(f"per_camera : {camera_frames / batch_seconds:7.1f} カメラフレーム/秒 "
+          f"({batch_seconds / steps * 1000:6.1f} ms/ステップ), 検出 {reference_count} 人")
+    recall = matched_count / reference_count if reference_count else 0.0
+    print(f"mosaic の recall（per_camera 基準, IoU>={iou_threshold}）: {recall * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mosaic / per_camera 推論モードのベンチマーク")
+    parser.add_argument("clips", nargs="+", help="カメラごとの録画クリップ（カメラ0から順に指定）")
+    parser.add_argument("--frames", type=int, default=200, help="計測するステップ数（各カメラ1フレームで1ステップ）")
+    parser.add_argument("--model", default=config.YOLO_MODEL_PATH, help="YOLOモデルのパス")
+    parser.add_argument("--conf", type=float, default=config.YOLO_CONFIDENCE_THRESHOLD, help="信頼度閾値")
+    parser.add_argument("--iou", type=float, default=0.5, help="recall 計算時の対応付けIoU閾値")
+    args = parser.parse_args()
+    run_benchmark(args.clips, args.frames, args.model, args.conf, args.iou)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+検出データ書き込みのベンチマーク
+1行ごとに open/append/close する方式と BufferedJsonlWriter の書き込み行数/秒を比較する
+
+使い方:
+    python benchmark_jsonl_writer.py --seconds 5 --fps 8 --people 20
+
+--fps と --people で実運用の書き込み（1フレームごとに人数分の行）を再現し、
+呼び出し側（YOLO処理ループ）がブロックされた時間と、ファイルに書き込めた行数/秒を表示する
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from jsonl_writer import BufferedJsonlWriter
+
+
+def _rows(frame_index, people):
+    timestamp = f"2024-01-01T12:00:{frame_index % 60:02d}"
+    return [
+        {
+            "timestamp": timestamp,
+            "camera_id": i % 4,
+            "direction": "right" if i % 2 else "left",
+            "person_count": 1,
+            "detection_id": f"camera{i % 4}_person_{i}",
+        }
+        for i in range(people)
+    ]
+
+
+def _run(write_batch, finish, frames, people, fps):
+    """
+    frames 回分の書き込みを行い、(呼び出し側の合計時間, 全体の時間) を返す
+    fps=0 の場合は待たずに連続で書き込む（最大スループットの計測）
+    """
+    interval = 1.0 / fps if fps else 0.0
+    caller_seconds = 0.0
+    start = time.perf_counter()
+    for frame_index in range(frames):
+        rows = _rows(frame_index, people)
+        t = time.perf_counter()
+        write_batch(rows)
+        caller_seconds += time.perf_counter() - t
+        if interval:
+            time.sleep(max(0.0, start + (frame_index + 1) * interval - time.perf_counter()))
+    finish()
+    return caller_seconds, time.perf_counter() - start
+
+
+def run_benchmark(seconds, fps, people):
+    frames = int(seconds * fps) if fps else int(seconds * 1000)
+    total_rows = frames * people
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 従来方式: 1行ごとにファイルを開いて追記
+        naive_path = os.path.join(tmp_dir, "naive.jsonl")
+
+        def naive_write(rows):
+            for row in rows:
+                with open(naive_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+        naive_caller, naive_total = _run(naive_write, lambda: None, frames, people, fps)
+
+        # バッファ方式
+        writer = BufferedJsonlWriter(os.path.join(tmp_dir, "buffered.jsonl"))
+        buffered_caller, buffered_total = _run(writer.write_many, writer.close, frames, people, fps)
+
+        with open(writer.path, encoding='utf-8') as f:
+            buffered_lines = sum(1 for _ in f)
+
+    print("=== 検出データ書き込み ベンチマーク ===")
+    print(f"フレーム数: {frames} / 1フレームの行数: {people} / 合計: {total_rows} 行 / fps: {fps or '制限なし'}")
+    print(f"1行ごとに open : 呼び出し側 {naive_caller * 1000:8.1f} ms "
+          f"({total_rows / naive_caller:10.0f} 行/秒), 全体 {naive_total:.2f} 秒 ({total_rows / naive_total:.0f} 行/秒)")
+    print(f"BufferedWriter : 呼び出し側 {buffered_caller * 1000:8.1f} ms "
+          f"({total_rows / buffered_caller:10.0f} 行/秒), 全体 {buffered_total:.2f} 秒 ({total_rows / buffered_total:.0f} 行/秒), "
+          f"書き出し {writer.flush_count} 回, ファイル {buffered_lines} 行")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="検出データ書き込み方式のベンチマーク")
+    parser.add_argument("--seconds", type=float, default=5.0, help="計測時間（秒、fps指定時）")
+    parser.add_argument("--fps", type=float, default=8.0, help="書き込み頻度（0で待たずに連続書き込み）")
+    parser.add_argument("--people", type=int, default=20, help="1フレームあたりの検出人数")
+    args = parser.parse_args()
+    run_benchmark(args.seconds, args.fps, args.people)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,14 @@ FLASK_PORT = int(os.getenv('FLASK_PORT', 5000))
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
 
 # カメラ設定
-MAX_CAMERAS = 4
+# カメラ台数（統合フレームはこの台数から R×C のグリッドを自動計算）
+MAX_CAMERAS = int(os.getenv('MAX_CAMERAS', '4'))
+# 統合フレームの列数（0の場合は ceil(sqrt(台数)) 列）
+GRID_COLUMNS = int(os.getenv('GRID_COLUMNS', '0'))
 # カメラサーバーのポート
-# テスト環境（app.pyが5000を使用）: デフォルトは5001-5004
+# テスト環境（app.pyが5000を使用）: デフォルトは5001から台数分
 # 本番環境（子機が5000-5003を使用）: 環境変数 CAMERA_PORTS="5000,5001,5002,5003" で設定
-CAMERA_PORTS_STR = os.getenv('CAMERA_PORTS', '5001,5002,5003,5004')
+CAMERA_PORTS_STR = os.getenv('CAMERA_PORTS', ','.join(str(5001 + i) for i in range(MAX_CAMERAS)))
 CAMERA_PORTS = [int(p.strip()) for p in CAMERA_PORTS_STR.split(',')]
 # 子機のIPアドレス（環境変数または直接指定）
 CAMERA_BASE_URL = os.getenv('CAMERA_BASE_URL', 'http://localhost')
@@ -24,9 +27,31 @@ DATA_DIR = os.getenv('DATA_DIR', 'data')
 # YOLO設定
 YOLO_MODEL_PATH = os.getenv('YOLO_MODEL_PATH', None)  # Noneの場合はデフォルトモデル
 YOLO_CONFIDENCE_THRESHOLD = float(os.getenv('YOLO_CONFIDENCE_THRESHOLD', '0.5'))
+# 推論モード: 'mosaic'（統合フレーム1枚を推論）/ 'per_camera'（各カメラの最新フレームを1バッチで推論）
+YOLO_INFERENCE_MODE = os.getenv('YOLO_INFERENCE_MODE', 'mosaic')
+# 推論ワーカープロセス数（0の場合はFlaskと同じプロセス内で推論）
+YOLO_WORKERS = int(os.getenv('YOLO_WORKERS', '0'))
+# トラッキング設定: 検出が途切れてもトラックを保持するフレーム数と、対応付けに必要なIoU
+TRACKER_MAX_AGE = int(os.getenv('TRACKER_MAX_AGE', '8'))
+TRACKER_IOU_THRESHOLD = float(os.getenv('TRACKER_IOU_THRESHOLD', '0.3'))
+# 方向判定用の前回位置の保持期間（秒）と最大件数（長時間運用でメモリを一定に保つため）
+POSITION_MAX_AGE_SECONDS = float(os.getenv('POSITION_MAX_AGE_SECONDS', '10'))
+POSITION_MAX_ENTRIES = int(os.getenv('POSITION_MAX_ENTRIES', '2000'))
+
+# 生の検出データ（data_dir/detections/）を記録するか（1分ごとの集計はメモリ上で行うため監査用）
+SAVE_RAW_DETECTIONS = os.getenv('SAVE_RAW_DETECTIONS', 'True').lower() == 'true'
+# 検出データをまとめて書き出す間隔（秒）
+DETECTION_FLUSH_SECONDS = float(os.getenv('DETECTION_FLUSH_SECONDS', '1.0'))
+# 検出データを分けて保存するファイルの単位（分、60の約数）と保持期間（分）
+DETECTION_SEGMENT_MINUTES = int(os.getenv('DETECTION_SEGMENT_MINUTES', '5'))
+DETECTION_RETENTION_MINUTES = int(os.getenv('DETECTION_RETENTION_MINUTES', '30'))
 
 # ストリーミング設定
 STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', '10'))  # フレームキューサイズ
 FRAME_WIDTH = int(os.getenv('FRAME_WIDTH', '320'))  # 統合フレームの各カメラ幅
 FRAME_HEIGHT = int(os.getenv('FRAME_HEIGHT', '240'))  # 統合フレームの各カメラ高さ
+# 子機のJPEGをデコードせずにそのまま個別表示へ転送する（デコードはYOLO処理で必要な時だけ）
+CAMERA_PASSTHROUGH = os.getenv('CAMERA_PASSTHROUGH', 'False').lower() == 'true'
+# 新しいフレームが来ない間の再送間隔（秒）。切断されたブラウザ接続を検知するため
+STREAM_KEEPALIVE_SECONDS = float(os.getenv('STREAM_KEEPALIVE_SECONDS', '5'))
 
@@ -0,0 +1,223 @@
+"""
+フレーム配信モジュール
+映像ソースごとに最新フレームを保持し、JPEGエンコードを版数ごとに1回だけ行って
+全ての購読者（ブラウザのMJPEG接続）に同じバイト列を配る
+子機から受け取ったJPEGをそのまま登録した場合は、画素が必要な時だけデコードする
+購読者は新しい版が登録されるまで条件変数で待機する（スリープによるポーリングをしない）
+"""
+import threading
+import time
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+
+@lru_cache(maxsize=32)
+def placeholder_jpeg(text, width=640, height=480):
+    """
+    「No Signal」等の表示用プレースホルダJPEGを生成（テキストごとに1回だけエンコード）
+    """
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.putText(frame, text, (50, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return buffer.tobytes() if ret else b''
+
+
+class FrameBroadcaster:
+    """
+    1つの映像ソースのエンコード済みフレームを共有する
+
+    publish() で最新フレームを登録し、wait_for_version() で新しい版を待ってから get_jpeg() で取得する。
+    エンコードは最初に要求した購読者が1回だけ行い、他の購読者はキャッシュを受け取る。
+    購読者が遅い場合は途中の版を読み飛ばす（常に最新版のみを返す）。
+    """
+    LATENCY_EMA_ALPHA = 0.1
+
+    def __init__(self, name, jpeg_quality=85):
+        self.name = name
+        self.jpeg_quality = jpeg_quality
+        self._lock = threading.Lock()
+        self._version_changed = threading.Condition(self._lock)
+        self._encode_lock = threading.Lock()  # 同じ版を複数スレッドで同時にエンコードしないため
+        self._frame = None
+        self._version = 0
+        self._jpeg = None
+        self._jpeg_version = 0
+        self._decode_lock = threading.Lock()
+        self._capture_time = None  # 最新版の取得時刻（time.time()）
+
+        # 統計（エンコード回数と配信回数の比較用）
+        self.encode_count = 0
+        self.decode_count = 0
+        self.served_count = 0
+        self.skipped_count = 0
+        self.latency_last = 0.0  # 取得から送信までの遅延（秒）
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def capture_time(self):
+        return self._capture_time
+
+    def publish(self, frame, capture_time=None):
+        """
+        最新フレームを登録（呼び出し後にframeを書き換えないこと）
+
+        Args:
+            frame: BGRフレーム
+            capture_time: フレームの取得時刻（time.time()、省略時は現在時刻）
+
+        Returns:
+            version: 登録したフレームの版数
+        """
+        with self._lock:
+            self._frame = frame
+            self._version += 1
+            self._capture_time = capture_time or time.time()
+            self._version_changed.notify_all()
+            return self._version
+
+    def publish_jpeg(self, jpeg_bytes, capture_time=None):
+        """
+        エンコード済みJPEGをそのまま登録（パススルー）
+        画素はget_frame()で要求された時に初めてデコードする
+
+        Returns:
+            version: 登録したフレームの版数
+        """
+        with self._lock:
+            self._frame = None
+            self._version += 1
+            self._jpeg = jpeg_bytes
+            self._jpeg_version = self._version
+            self._capture_time = capture_time or time.time()
+            self._version_changed.notify_all()
+            return self._version
+
+    def publish_encoded(self, frame, capture_time=None):
+        """
+        フレームをその場でJPEGエンコードしてから登録
+        画素の参照は保持しないため、呼び出し後にframe（リングバッファのスロット等）を再利用してよい
+
+        Returns:
+            version: 登録したフレームの版数（エンコード失敗時は None）
+        """
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ret:
+            return None
+        with self._lock:
+            self.encode_count += 1
+        return self.publish_jpeg(buffer.tobytes(), capture_time)
+
+    def wait_for_version(self, last_version, timeout=None):
+        """
+        last_version より新しい版が登録されるまで待機
+
+        Returns:
+            version: 現在の版数（タイムアウト時は last_version のまま）
+        """
+        with self._version_changed:
+            self._version_changed.wait_for(lambda: self._version > last_version, timeout)
+            return self._version
+
+    def get_frame(self):
+        """
+        最新版のフレーム（BGR画素）を取得
+        パススルーで登録されたJPEGは版数ごとに1回だけデコードしてキャッシュする
+
+        Returns:
+            (version, frame): フレーム未登録またはデコード失敗時は (version, None)
+        """
+        with self._lock:
+            version, frame, jpeg = self._version, self._frame, self._jpeg
+            if frame is not None or jpeg is None or self._jpeg_version != version:
+                return version, frame
+
+        with self._decode_lock:
+            with self._lock:
+                if self._version == version and self._frame is not None:
+                    return version, self._frame
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                return version, None
+            with self._lock:
+                self.decode_count += 1
+                if self._version == version:
+                    self._frame = frame
+        return version, frame
+
+    def get_jpeg(self, last_version=0):
+        """
+        最新版のJPEGバイト列を取得
+
+        Args:
+            last_version: 購読者が前回受け取った版数（読み飛ばし数の集計用）
+
+        Returns:
+            (version, jpeg_bytes): フレーム未登録またはエンコード失敗時は (last_version, None)
+        """
+        with self._lock:
+            frame = self._frame
+            version = self._version
+            capture_time = self._capture_time
+            if self._jpeg_version == version and self._jpeg is not None:
+                jpeg = self._jpeg
+            elif frame is None:
+                return last_version, None
+            else:
+                jpeg = None
+
+        if jpeg is None:
+            with self._encode_lock:
+                # 待っている間に他の購読者がエンコード済みならそれを使う
+                with self._lock:
+                    if self._jpeg_version >= version:
+                        version, jpeg = self._jpeg_version, self._jpeg
+                if jpeg is None:
+                    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    if not ret:
+                        return last_version, None
+                    jpeg = buffer.tobytes()
+                    with self._lock:
+                        self.encode_count += 1
+                        if version > self._jpeg_version:
+                            self._jpeg = jpeg
+                            self._jpeg_version = version
+
+        with self._lock:
+            self.served_count += 1
+            if last_version and version - last_version > 1:
+                self.skipped_count += version - last_version - 1
+            if version != last_version and capture_time is not None:
+                self._record_latency(time.time() - capture_time)
+        return version, jpeg
+
+    def _record_latency(self, latency):
+        """取得から送信までの遅延を記録（ロック取得済みで呼ぶ）"""
+        self.latency_last = latency
+        if self.latency_avg == 0.0:
+            self.latency_avg = latency
+        else:
+            self.latency_avg += self.LATENCY_EMA_ALPHA * (latency - self.latency_avg)
+        self.latency_max = max(self.latency_max, latency)
+
+    def stats(self):
+        """エンコード回数・配信回数の統計を返す"""
+        with self._lock:
+            return {
+                'version': self._version,
+                'encodes': self.encode_count,
+                'decodes': self.decode_count,
+                'served': self.served_count,
+                'skipped': self.skipped_count,
+                'latency_ms': {
+                    'last': round(self.latency_last * 1000, 1),
+                    'avg': round(self.latency_avg * 1000, 1),
+                    'max': round(self.latency_max * 1000, 1),
+                },
+            }
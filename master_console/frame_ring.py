@@ -0,0 +1,205 @@
+"""
+共有メモリ上のフレームリングバッファ
+統合フレームのスナップショットを固定数のスロットに書き込み、YOLO処理・推論ワーカー・配信は
+スロットのビューをコピーせずに読む
+
+- スロットごとにシーケンス番号を共有メモリのヘッダに持ち、書き込み中は -1 にする
+  （読み手は読む前後でシーケンス番号が変わっていないことを確認できる）
+- 書き込みは親機プロセス（YOLO処理ループ）の1スレッドだけが行う
+- 読み手が使用中のスロット（hold中）は上書きしない。空きスロットが無い場合は acquire() が None を返す
+"""
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+HEADER_FIELDS = 2  # スロットごとのヘッダ: [シーケンス番号, 取得時刻]
+WRITING = -1
+
+
+def attach_shared_memory(name):
+    """
+    既存の共有メモリに接続（接続側のプロセス終了時に共有メモリが削除されないようにする）
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.12以前: resource_trackerへの登録を解除する
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+
+class CopyMeter:
+    """
+    フレームのコピー量（バイト数）を数え、直近の毎秒コピー量を返す
+    """
+    def __init__(self, window_seconds=5.0):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._events = []  # (時刻, バイト数)
+        self.total_bytes = 0
+
+    def add(self, nbytes):
+        now = time.time()
+        with self._lock:
+            self.total_bytes += nbytes
+            self._events.append((now, nbytes))
+            self._trim(now)
+
+    def _trim(self, now):
+        cutoff = now - self.window_seconds
+        drop = 0
+        while drop < len(self._events) and self._events[drop][0] < cutoff:
+            drop += 1
+        if drop:
+            del self._events[:drop]
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            self._trim(now)
+            recent = sum(nbytes for _, nbytes in self._events)
+            return {
+                'bytes_total': self.total_bytes,
+                'bytes_per_sec': round(recent / self.window_seconds),
+            }
+
+
+class SharedFrameRing:
+    """
+    固定サイズのフレームスロットを共有メモリ上に並べたリングバッファ
+
+    書き手: acquire() で空きスロットのビューを受け取り、書き込み後に commit() する
+    読み手: view() でスロットのビューを受け取る（コピーなし）。別プロセスからは attach() で接続する
+    """
+    def __init__(self, num_slots, shape, name=None, create=True):
+        """
+        Args:
+            num_slots: スロット数
+            shape: 1フレームの形状 (高さ, 幅, 3)
+            name: 共有メモリ名（接続時に指定）
+            create: Trueの場合は共有メモリを新規作成する
+        """
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.frame_bytes = int(np.prod(self.shape))
+        header_bytes = num_slots * HEADER_FIELDS * 8
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_bytes + num_slots * self.frame_bytes)
+        else:
+            self.shm = attach_shared_memory(name)
+        self._owner = create
+        self.name = self.shm.name
+
+        self._header = np.ndarray((num_slots, HEADER_FIELDS), dtype=np.float64, buffer=self.shm.buf)
+        self._slots = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf,
+                       offset=header_bytes + i * self.frame_bytes)
+            for i in range(num_slots)
+        ]
+        if create:
+            self._header[:, 0] = 0
+
+        # 書き手側（親機プロセス）だけが使う状態
+        self._next_seq = 1
+        self._next_slot = 0
+        self._holds = [0] * num_slots
+        self._hold_lock = threading.Lock()
+        self.commit_count = 0
+        self.full_count = 0  # 空きスロットが無く書き込めなかった回数
+
+    @classmethod
+    def attach(cls, name, num_slots, shape):
+        """別プロセスから既存のリングバッファに接続"""
+        return cls(num_slots, shape, name=name, create=False)
+
+    def acquire(self):
+        """
+        次に書き込むスロットを確保（使用中のスロットは飛ばす）
+
+        Returns:
+            (slot, view): 空きスロットが無い場合は None
+        """
+        with self._hold_lock:
+            for offset in range(self.num_slots):
+                slot = (self._next_slot + offset) % self.num_slots
+                if self._holds[slot] == 0:
+                    break
+            else:
+                self.full_count += 1
+                return None
+            self._next_slot = (slot + 1) % self.num_slots
+            self._holds[slot] += 1  # commitまでは書き手が保持
+        self._header[slot, 0] = WRITING
+        return slot, self._slots[slot]
+
+    def commit(self, slot, capture_time=None):
+        """
+        書き込みを確定してシーケンス番号を割り当てる（書き手の保持はそのまま。不要になったら release()）
+
+        Returns:
+            seq: スロットのシーケンス番号
+        """
+        seq = self._next_seq
+        self._next_seq += 1
+        self._header[slot, 1] = capture_time or time.time()
+        self._header[slot, 0] = seq
+        self.commit_count += 1
+        return seq
+
+    def hold(self, slot):
+        """読み手がスロットを使用中にする（releaseするまで上書きされない）"""
+        with self._hold_lock:
+            self._holds[slot] += 1
+
+    def release(self, slot):
+        with self._hold_lock:
+            if self._holds[slot] > 0:
+                self._holds[slot] -= 1
+
+    def view(self, slot, seq=None):
+        """
+        スロットのビュー（コピーなし）を返す
+
+        Args:
+            seq: 指定した場合、スロットのシーケンス番号が一致しなければ None を返す
+        """
+        if seq is not None and self.seq_of(slot) != seq:
+            return None
+        return self._slots[slot]
+
+    def seq_of(self, slot):
+        return int(self._header[slot, 0])
+
+    def capture_time_of(self, slot):
+        return float(self._header[slot, 1])
+
+    def stats(self):
+        with self._hold_lock:
+            held = sum(1 for count in self._holds if count)
+        return {
+            'slots': self.num_slots,
+            'held': held,
+            'commits': self.commit_count,
+            'full': self.full_count,
+        }
+
+    def close(self):
+        # ビューが残っていると共有メモリを閉じられないため先に手放す
+        self._slots = []
+        self._header = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # 配信側等がまだビューを参照している場合は閉じずにプロセス終了時の解放に任せる
+            pass
+        if self._owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
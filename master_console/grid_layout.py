@@ -0,0 +1,79 @@
+"""
+統合フレームのグリッドレイアウト
+任意のカメラ台数に対して R×C のタイル配置を計算し、
+合成処理（mosaic.py）と検出結果のカメラ判定（yolo_processor.py）で同じ対応表を共有する
+"""
+import math
+
+import numpy as np
+
+
+class GridLayout:
+    """
+    カメラ台数からタイル配置を決める
+
+    - 列数を省略すると ceil(sqrt(台数)) 列の正方形に近いグリッドにする（4台なら2x2、9台なら3x3）
+    - カメラ i は行優先で i 番目のセルに配置する
+    - 座標→カメラIDはセル→カメラIDの対応表を引くだけ（O(1)）
+    """
+    def __init__(self, num_cameras, tile_width, tile_height, columns=None):
+        if num_cameras < 1:
+            raise ValueError("num_cameras は1以上を指定してください")
+        self.num_cameras = num_cameras
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = columns or math.ceil(math.sqrt(num_cameras))
+        self.rows = math.ceil(num_cameras / self.columns)
+        self.width = self.columns * tile_width
+        self.height = self.rows * tile_height
+
+        # セル（行, 列）→ カメラID。カメラが割り当てられていないセルは -1
+        self.cell_to_camera = np.full((self.rows, self.columns), -1, dtype=np.int16)
+        for camera_id in range(num_cameras):
+            row, col = divmod(camera_id, self.columns)
+            self.cell_to_camera[row, col] = camera_id
+
+    def tile_origin(self, camera_id):
+        """
+        カメラのタイルの左上座標 (x, y) を返す
+        """
+        row, col = divmod(camera_id, self.columns)
+        return col * self.tile_width, row * self.tile_height
+
+    def tile_slices(self, camera_id):
+        """
+        統合フレームのバッファからタイルを切り出すスライス (行スライス, 列スライス) を返す
+        """
+        x, y = self.tile_origin(camera_id)
+        return slice(y, y + self.tile_height), slice(x, x + self.tile_width)
+
+    def camera_at(self, x, y, frame_width=None, frame_height=None):
+        """
+        統合フレーム内の座標からカメラIDを判定
+
+        Args:
+            x, y: 座標
+            frame_width, frame_height: 座標系の画像サイズ（統合フレームを縮小して処理した場合に指定）
+
+        Returns:
+            camera_id: カメラID（カメラが割り当てられていないセルの場合はNone）
+        """
+        scale_x = self.width / frame_width if frame_width else 1.0
+        scale_y = self.height / frame_height if frame_height else 1.0
+        col = min(max(int(x * scale_x // self.tile_width), 0), self.columns - 1)
+        row = min(max(int(y * scale_y // self.tile_height), 0), self.rows - 1)
+        camera_id = int(self.cell_to_camera[row, col])
+        return camera_id if camera_id >= 0 else None
+
+    def cameras_at(self, xs, ys, frame_width=None, frame_height=None):
+        """
+        camera_at() の配列版（複数の座標をまとめて判定）
+
+        Returns:
+            camera_ids: カメラIDの配列（カメラが割り当てられていないセルは -1）
+        """
+        scale_x = self.width / frame_width if frame_width else 1.0
+        scale_y = self.height / frame_height if frame_height else 1.0
+        cols = np.clip((np.asarray(xs) * scale_x // self.tile_width).astype(int), 0, self.columns - 1)
+        rows = np.clip((np.asarray(ys) * scale_y // self.tile_height).astype(int), 0, self.rows - 1)
+        return self.cell_to_camera[rows, cols].astype(int)
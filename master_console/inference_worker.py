@@ -0,0 +1,328 @@
+"""
+YOLO推論ワーカープール
+Flask/SocketIOとは別のプロセスでYOLO推論を実行し、母艦のCPUコアを使い切れるようにする
+
+- ワーカーはこのファイルをスクリプトとして起動した独立プロセス
+  （app.pyをmultiprocessingのspawnで再importさせないため）
+- フレームはワーカーごとの共有メモリに書き込み、ワーカーへは形状だけを送る
+  （統合フレームのリングバッファ（frame_ring.py）のスロットを渡す場合はコピーもしない）
+- ワーカーは検出結果（boxes.dataのnumpy配列）だけを返し、パース・トラッキング・保存は母艦側で行う
+- 全ワーカーが処理中の時は最新フレームだけを保留し、古いフレームは捨てる（推論が遅れても遅延が溜まらない）
+"""
+import os
+import secrets
+import subprocess
+import sys
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener, wait
+
+import numpy as np
+
+from frame_ring import SharedFrameRing, attach_shared_memory
+
+AUTHKEY_ENV = 'INFERENCE_WORKER_AUTHKEY'
+DROPPED = 'dropped'
+
+
+def frames_from_buffer(buffer, shapes):
+    """
+    共有メモリ上に連続して書き込まれたフレームのビュー（コピーなし）を返す
+    """
+    frames = []
+    offset = 0
+    for shape in shapes:
+        size = int(np.prod(shape))
+        frames.append(np.ndarray(shape, dtype=np.uint8, buffer=buffer, offset=offset))
+        offset += size
+    return frames
+
+
+class _Worker:
+    def __init__(self, index, process, shm):
+        self.index = index
+        self.process = process
+        self.shm = shm
+        self.conn = None
+        self.ready = False
+        self.busy_seq = None
+
+
+class InferencePool:
+    """
+    別プロセスのYOLO推論ワーカーを管理する
+
+    submit() でフレームを投入し、poll() で完了した結果を投入順に受け取る
+    （呼び出し側は1スレッドから使う想定でロックは持たない）
+    """
+    def __init__(self, num_workers, model_path=None, confidence=0.5, slot_bytes=4 * 1280 * 720 * 3,
+                 ring=None, copy_meter=None, connect_timeout=30.0):
+        """
+        Args:
+            num_workers: ワーカープロセス数
+            model_path: YOLOモデルのパス（Noneの場合はデフォルトモデル）
+            confidence: 検出の信頼度閾値
+            slot_bytes: ワーカーごとの共有メモリサイズ（1回に投入するフレームの合計バイト数の上限）
+            ring: ワーカーが直接読むリングバッファ（SharedFrameRing、submit_ring_slot() で使用）
+            copy_meter: 共有メモリへのコピー量を数えるCopyMeter
+            connect_timeout: ワーカーの接続待ちタイムアウト（秒）
+        """
+        self.slot_bytes = slot_bytes
+        self.copy_meter = copy_meter
+        self._next_seq = 0
+        self._next_result_seq = 0
+        self._contexts = {}  # seq -> 呼び出し側のコンテキスト
+        self._finished = {}  # seq -> (arrays, error)（投入順に返すための並べ替え待ち）
+        self._pending = None  # 全ワーカーが処理中の間に届いた最新の (task, context)
+        self._dropped_contexts = []  # 捨てたタスクのコンテキスト（poll() で呼び出し側へ返す）
+        self.submitted_count = 0
+        self.completed_count = 0
+        self.dropped_count = 0
+
+        authkey = secrets.token_bytes(16)
+        self._listener = Listener(('127.0.0.1', 0), authkey=authkey)
+        host, port = self._listener.address
+        env = os.environ.copy()
+        env[AUTHKEY_ENV] = authkey.hex()
+
+        self._workers = []
+        for index in range(num_workers):
+            shm = shared_memory.SharedMemory(create=True, size=slot_bytes)
+            cmd = [
+                sys.executable, os.path.abspath(__file__),
+                host, str(port), str(index), shm.name, model_path or '', str(confidence),
+            ]
+            if ring is not None:
+                cmd += [ring.name, str(ring.num_slots), ','.join(str(d) for d in ring.shape)]
+            process = subprocess.Popen(cmd, env=env)
+            self._workers.append(_Worker(index, process, shm))
+
+        # ワーカーの接続を待つ（接続してこないワーカーがいても起動処理を止めない）
+        accept_thread = threading.Thread(target=self._accept_workers, daemon=True)
+        accept_thread.start()
+        accept_thread.join(timeout=connect_timeout)
+        connected = sum(1 for worker in self._workers if worker.conn is not None)
+        print(f"[推論ワーカー] {connected}/{num_workers} プロセスが接続しました（モデル読み込み中）")
+
+    def _accept_workers(self):
+        for _ in self._workers:
+            try:
+                conn = self._listener.accept()
+                message = conn.recv()
+            except Exception as e:
+                print(f"[推論ワーカー] 接続受付エラー: {e}")
+                return
+            if message[0] == 'hello':
+                self._workers[message[1]].conn = conn
+
+    def idle_workers(self):
+        return [w for w in self._workers if w.conn is not None and w.ready and w.busy_seq is None]
+
+    def submit(self, frames, context=None):
+        """
+        フレームを推論に投入
+
+        空いているワーカーがあればすぐに渡す。全ワーカーが処理中の場合は最新の1件だけを保留し、
+        それより前に保留していたフレームは古くなったものとして捨てる（dropped に数える）。
+        保留したフレームは poll() でワーカーが空いた時に渡される。
+        捨てたフレームのコンテキストは poll() が error=DROPPED として返す。
+
+        Args:
+            frames: 推論するフレームのリスト（uint8, BGR）
+            context: 結果と一緒に返す任意の値（推論したフレーム等）
+
+        Returns:
+            dispatched: すぐにワーカーへ渡した場合はTrue（保留・破棄した場合はFalse）
+        """
+        total_bytes = sum(frame.nbytes for frame in frames)
+        if total_bytes > self.slot_bytes:
+            print(f"[推論ワーカー] フレームが共有メモリより大きいため投入できません ({total_bytes} > {self.slot_bytes})")
+            self._drop(context)
+            return False
+        return self._offer(('frames', frames), context)
+
+    def submit_ring_slot(self, slot, ring_seq, context=None):
+        """
+        リングバッファのスロットを推論に投入（ワーカーはスロットを直接読むのでコピーしない）
+        結果が返るまで呼び出し側でスロットを hold しておくこと
+        """
+        return self._offer(('ring', slot, ring_seq), context)
+
+    def _offer(self, task, context):
+        idle = self.idle_workers()
+        if not idle:
+            if self._pending is not None:
+                self._drop(self._pending[1])
+            self._pending = (task, context)
+            return False
+        self._dispatch(idle[0], task, context)
+        return True
+
+    def _drop(self, context):
+        self.dropped_count += 1
+        self._dropped_contexts.append(context)
+
+    def _dispatch(self, worker, task, context):
+        seq = self._next_seq
+        self._next_seq += 1
+        self._contexts[seq] = context
+        worker.busy_seq = seq
+        self.submitted_count += 1
+
+        if task[0] == 'frames':
+            frames = task[1]
+            shapes = [frame.shape for frame in frames]
+            for view, frame in zip(frames_from_buffer(worker.shm.buf, shapes), frames):
+                np.copyto(view, frame)
+                if self.copy_meter is not None:
+                    self.copy_meter.add(frame.nbytes)
+            message = ('infer', seq, shapes)
+        else:
+            _, slot, ring_seq = task
+            message = ('infer_ring', seq, slot, ring_seq)
+        try:
+            worker.conn.send(message)
+        except Exception as e:
+            self._mark_dead(worker, f"送信エラー: {e}")
+
+    def _mark_dead(self, worker, reason):
+        print(f"[推論ワーカー] ワーカー {worker.index} を切り離します: {reason}")
+        if worker.busy_seq is not None:
+            self._finished[worker.busy_seq] = (None, reason)
+            worker.busy_seq = None
+        if worker.conn is not None:
+            try:
+                worker.conn.close()
+            except Exception:
+                pass
+        worker.conn = None
+        worker.ready = False
+
+    def poll(self, timeout=0):
+        """
+        完了した推論結果を投入順に取得
+
+        Returns:
+            [(context, arrays, error), ...]: arrays は各フレームの boxes.data（N×6）のリスト
+        """
+        conns = {worker.conn: worker for worker in self._workers if worker.conn is not None}
+        if conns:
+            for conn in wait(list(conns.keys()), timeout=timeout):
+                worker = conns[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError) as e:
+                    self._mark_dead(worker, f"プロセスが終了しました ({e})")
+                    continue
+                if message[0] == 'ready':
+                    worker.ready = True
+                    print(f"[推論ワーカー] ワーカー {worker.index} の準備ができました")
+                elif message[0] == 'result':
+                    _, seq, arrays, error = message
+                    worker.busy_seq = None
+                    self._finished[seq] = (arrays, error)
+                    self.completed_count += 1
+
+        if self._pending is not None:
+            idle = self.idle_workers()
+            if idle:
+                task, context = self._pending
+                self._pending = None
+                self._dispatch(idle[0], task, context)
+
+        results = [(context, None, DROPPED) for context in self._dropped_contexts]
+        self._dropped_contexts = []
+        while self._next_result_seq in self._finished:
+            seq = self._next_result_seq
+            arrays, error = self._finished.pop(seq)
+            results.append((self._contexts.pop(seq, None), arrays, error))
+            self._next_result_seq += 1
+        return results
+
+    def stats(self):
+        return {
+            'workers': len(self._workers),
+            'ready': sum(1 for w in self._workers if w.conn is not None and w.ready),
+            'busy': sum(1 for w in self._workers if w.busy_seq is not None),
+            'pending': self._pending is not None,
+            'submitted': self.submitted_count,
+            'completed': self.completed_count,
+            'dropped': self.dropped_count,
+        }
+
+    def close(self):
+        """ワーカーを停止して共有メモリを解放"""
+        for worker in self._workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(('stop',))
+                except Exception:
+                    pass
+        for worker in self._workers:
+            try:
+                worker.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+            if worker.conn is not None:
+                worker.conn.close()
+            worker.shm.close()
+            try:
+                worker.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._listener.close()
+
+
+def _worker_main(host, port, index, shm_name, model_path, confidence, ring_args=None):
+    """
+    ワーカープロセスの本体: 共有メモリのフレームを推論して検出結果の配列を返す
+    """
+    conn = Client((host, port), authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+    conn.send(('hello', index))
+
+    from ultralytics import YOLO
+    from yolo_processor import boxes_to_array
+    model = YOLO(model_path or 'yolov8n.pt')
+    shm = attach_shared_memory(shm_name)
+    ring = SharedFrameRing.attach(*ring_args) if ring_args else None
+    conn.send(('ready', index))
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message[0] == 'stop':
+                break
+            seq = message[1]
+            try:
+                if message[0] == 'infer_ring':
+                    _, _, slot, ring_seq = message
+                    frame = ring.view(slot, ring_seq) if ring is not None else None
+                    if frame is None:
+                        conn.send(('result', seq, None, 'リングバッファのスロットが上書きされています'))
+                        continue
+                    frames = [frame]
+                else:
+                    frames = frames_from_buffer(shm.buf, message[2])
+                results = model(frames, conf=confidence, classes=[0], verbose=False)
+                arrays = [boxes_to_array(result) for result in results]
+                # Resultsは元画像（共有メモリのビュー）を参照しているため手放す
+                frames = frame = results = None
+                conn.send(('result', seq, arrays, None))
+            except Exception as e:
+                conn.send(('result', seq, None, str(e)))
+    finally:
+        if ring is not None:
+            ring.close()
+        shm.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    _host, _port, _index, _shm_name, _model_path, _confidence = sys.argv[1:7]
+    _ring_args = None
+    if len(sys.argv) > 9:
+        _ring_args = (sys.argv[7], int(sys.argv[8]), tuple(int(d) for d in sys.argv[9].split(',')))
+    _worker_main(_host, int(_port), int(_index), _shm_name, _model_path or None, float(_confidence), _ring_args)
@@ -0,0 +1,121 @@
+"""
+JSONL書き込みモジュール
+検出データ等の行をメモリ上のバッファに溜め、バックグラウンドスレッドが1つのファイルハンドルでまとめて追記する
+（1行ごとに open/write/close しない）
+"""
+import json
+import threading
+import time
+
+
+class BufferedJsonlWriter:
+    """
+    JSONLファイルへのバッファ付き追記
+
+    - write() はバッファに追加するだけ（呼び出し側のスレッドでファイルI/Oをしない）
+    - バッファが max_buffer_rows 行に達するか、flush_interval 秒経過したら書き出す
+    - ファイルハンドルは開いたまま使い回す（追記モードなので他の処理による切り詰め後も末尾に書く）
+    - close() で残りを書き出してから閉じる
+    """
+    def __init__(self, path, flush_interval=1.0, max_buffer_rows=1000):
+        """
+        Args:
+            path: 書き込み先のJSONLファイル（Noneの場合は rotate() で指定する）
+            flush_interval: 書き出し間隔（秒）
+            max_buffer_rows: この行数に達したら間隔を待たずに書き出す
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffer_rows = max_buffer_rows
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._file_lock = threading.Lock()  # ファイルへの書き出しと外部からの排他処理用
+        self._wakeup = threading.Event()
+        self._file = None
+        self._running = True
+        self.rows_written = 0
+        self.flush_count = 0
+        self._thread = threading.Thread(target=self._flush_worker, daemon=True)
+        self._thread.start()
+
+    def write(self, row):
+        """1行分のデータ（dict）をバッファに追加"""
+        line = json.dumps(row, ensure_ascii=False) + '\n'
+        with self._buffer_lock:
+            self._buffer.append(line)
+            full = len(self._buffer) >= self.max_buffer_rows
+        if full:
+            self._wakeup.set()
+
+    def write_many(self, rows):
+        lines = [json.dumps(row, ensure_ascii=False) + '\n' for row in rows]
+        with self._buffer_lock:
+            self._buffer.extend(lines)
+            full = len(self._buffer) >= self.max_buffer_rows
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """バッファの内容をファイルに書き出す"""
+        with self._file_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        with self._buffer_lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        if self.path is None:
+            with self._buffer_lock:
+                self._buffer[:0] = lines
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(''.join(lines))
+            self._file.flush()
+        except Exception:
+            # 書き出せなかった行は次回に回す
+            with self._buffer_lock:
+                self._buffer[:0] = lines
+            raise
+        self.rows_written += len(lines)
+        self.flush_count += 1
+
+    def rotate(self, path):
+        """
+        書き込み先のファイルを切り替える（それまでに溜まっていた行は切り替え前のファイルに書き出す）
+        """
+        with self._file_lock:
+            if self.path is not None:
+                self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.path = path
+
+    def _flush_worker(self):
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[JSONL書き込み] {self.path} への書き込みエラー: {e}")
+                time.sleep(self.flush_interval)
+
+    def pending_rows(self):
+        with self._buffer_lock:
+            return len(self._buffer)
+
+    def close(self):
+        """残りを書き出してファイルを閉じる"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+        with self._file_lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,72 @@
+"""
+1分ごとの検出集計モジュール
+検出データを受け取るたびにメモリ上のカウンタを更新し、分の境界で集計行を取り出す
+（detections.jsonl を毎分読み直さない）
+"""
+import threading
+
+
+class MinuteAggregator:
+    """
+    分ごと・カメラごとの方向別カウントとユニークなトラックIDを保持する
+
+    add() は検出データの保存時に呼ばれ、pop_completed() は集計スレッドが分の境界で呼ぶ
+    取り出し済みの分に遅れて届いた検出は、まだ取り出していない最初の分に加える
+    （同じ分・カメラの行を2回書くと、後の一部だけの行で集計が上書きされるため）
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._minutes = {}  # 分の開始時刻 -> {'counts': {(camera_id, direction): 件数}, 'unique': {camera_id: set}}
+        self._emitted_until = None  # この時刻より前に始まった分は取り出し済み
+        self.late_count = 0  # 取り出し済みの分に届き、次の分へ回した検出の件数
+
+    def add(self, minute_start, rows):
+        """
+        検出データを集計に加える
+
+        Args:
+            minute_start: 検出時刻の分の開始時刻（datetime）
+            rows: detections.jsonl と同じ形式の行（camera_id, direction, detection_id）
+        """
+        with self._lock:
+            if self._emitted_until is not None and minute_start < self._emitted_until:
+                minute_start = self._emitted_until
+                self.late_count += len(rows)
+            bucket = self._minutes.get(minute_start)
+            if bucket is None:
+                bucket = {'counts': {}, 'unique': {}}
+                self._minutes[minute_start] = bucket
+            counts = bucket['counts']
+            unique = bucket['unique']
+            for row in rows:
+                camera_id = row.get('camera_id')
+                if camera_id is None:
+                    continue
+                key = (camera_id, row.get('direction', 'unknown'))
+                counts[key] = counts.get(key, 0) + 1
+                ids = unique.get(camera_id)
+                if ids is None:
+                    ids = unique[camera_id] = set()
+                detection_id = row.get('detection_id', '')
+                if detection_id:
+                    ids.add(detection_id)
+
+    def pop_completed(self, end_time):
+        """
+        end_time より前に始まった分の集計を取り出して削除
+
+        Returns:
+            [(minute_start, counts, unique), ...]: 分の昇順
+        """
+        with self._lock:
+            if self._emitted_until is None or end_time > self._emitted_until:
+                self._emitted_until = end_time
+            completed = []
+            for minute in sorted(minute for minute in self._minutes if minute < end_time):
+                bucket = self._minutes.pop(minute)
+                completed.append((minute, bucket['counts'], bucket['unique']))
+            return completed
+
+    def pending_minutes(self):
+        with self._lock:
+            return len(self._minutes)
@@ -0,0 +1,139 @@
+"""
+MJPEGストリーム読み込みモジュール
+子機（camera_server.py）の /stream を multipart のまま読み、JPEGバイト列をデコードせずに取り出す
+"""
+import re
+
+# requestsライブラリのインポート（オプション）
+try:
+    import requests
+    REQUESTS_AVAILABLE = True
+except ImportError:
+    REQUESTS_AVAILABLE = False
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+MAX_BUFFER_BYTES = 4 * 1024 * 1024  # 壊れたストリームでバッファが膨らみ続けないための上限
+
+
+def parse_boundary(content_type):
+    """
+    Content-Typeヘッダから multipart の boundary を取り出す
+
+    Returns:
+        boundary: バイト列（見つからない場合は b'frame'）
+    """
+    match = re.search(r'boundary="?([^";]+)"?', content_type or '')
+    boundary = match.group(1) if match else 'frame'
+    if boundary.startswith('--'):
+        boundary = boundary[2:]
+    return boundary.encode('ascii', errors='ignore')
+
+
+def iter_jpeg_parts(chunks, boundary=b'frame'):
+    """
+    multipart/x-mixed-replace のチャンク列からJPEGパートを順に取り出す
+
+    Content-Length ヘッダがあればその長さで切り出し、無ければJPEGのEOIマーカーまでを1枚とする
+    （OpenCVが出力するJPEGはサムネイルを含まないため、最初のEOIが画像の終端になる）
+
+    Args:
+        chunks: バイト列のイテラブル（requestsの iter_content 等）
+        boundary: multipart の boundary
+
+    Yields:
+        jpeg_bytes: 1フレーム分のJPEGバイト列
+    """
+    delimiter = b'--' + boundary
+    buffer = bytearray()
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.extend(chunk)
+        while True:
+            start = buffer.find(delimiter)
+            if start < 0:
+                # 次の区切りが来るまで末尾だけ残す
+                if len(buffer) > len(delimiter):
+                    del buffer[:-len(delimiter)]
+                break
+            header_end = buffer.find(b'\r\n\r\n', start)
+            if header_end < 0:
+                break
+            headers = bytes(buffer[start + len(delimiter):header_end]).lower()
+            body_start = header_end + 4
+
+            length_match = re.search(rb'content-length:\s*(\d+)', headers)
+            if length_match:
+                body_end = body_start + int(length_match.group(1))
+                if len(buffer) < body_end:
+                    break
+            else:
+                eoi = buffer.find(JPEG_EOI, body_start)
+                if eoi < 0:
+                    break
+                body_end = eoi + len(JPEG_EOI)
+
+            part = bytes(buffer[body_start:body_end])
+            del buffer[:body_end]
+            if part.startswith(JPEG_SOI):
+                yield part
+
+        if len(buffer) > MAX_BUFFER_BYTES:
+            buffer.clear()
+
+
+class MjpegPassthroughStream:
+    """
+    子機のMJPEGストリームをJPEGバイト列のまま読み出す
+
+    cv2.VideoCapture と同じ isOpened()/release() を持つので、
+    停止処理（camera_caps の解放）はVideoCaptureと共通で扱える
+    """
+    def __init__(self, url, timeout=3.0, chunk_size=16384):
+        self.url = url
+        self._response = None
+        self._parts = None
+        if not REQUESTS_AVAILABLE:
+            print("警告: requestsがインストールされていません。パススルー受信は使用できません。")
+            return
+        try:
+            self._response = requests.get(url, stream=True, timeout=timeout)
+            self._response.raise_for_status()
+            boundary = parse_boundary(self._response.headers.get('Content-Type'))
+            self._parts = iter_jpeg_parts(self._response.iter_content(chunk_size=chunk_size), boundary)
+        except Exception as e:
+            print(f"[パススルー] {url} に接続できませんでした: {e}")
+            self.release()
+
+    def isOpened(self):
+        return self._response is not None
+
+    def read_jpeg(self):
+        """
+        次のJPEGフレームを読み込む
+
+        Returns:
+            (ret, jpeg_bytes): ストリーム終了・エラー時は (False, None)
+        """
+        if self._parts is None:
+            return False, None
+        try:
+            return True, next(self._parts)
+        except StopIteration:
+            self.release()
+            return False, None
+        except Exception as e:
+            print(f"[パススルー] {self.url} の読み込み中にエラー: {e}")
+            self.release()
+            return False, None
+
+    def release(self):
+        response = self._response
+        self._response = None
+        self._parts = None
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
@@ -0,0 +1,135 @@
+"""
+統合フレーム（モザイク）合成モジュール
+事前に確保したバッファへ、更新されたカメラのタイルだけをその場でリサイズして書き込む
+"""
+import cv2
+import numpy as np
+
+
+class MosaicCompositor:
+    """
+    カメラフレームをグリッド状に並べた統合フレームを差分更新で合成する
+
+    - 統合フレームのバッファは1回だけ確保し、各タイルはそのビューとして扱う
+    - update_tile() は対象カメラのタイルだけを cv2.resize(dst=...) で直接書き込む
+    - 「No Signal」タイルはカメラごとに1回だけ描画してキャッシュする
+    """
+    def __init__(self, layout):
+        """
+        Args:
+            layout: タイル配置（GridLayout）
+        """
+        self.layout = layout
+        self.tile_width = layout.tile_width
+        self.tile_height = layout.tile_height
+        num_tiles = layout.num_cameras
+        self.buffer = np.zeros((layout.height, layout.width, 3), dtype=np.uint8)
+        self._tiles = [self.buffer[layout.tile_slices(i)] for i in range(num_tiles)]
+        self._no_signal_tiles = {}
+        self._tile_geometry = [None] * num_tiles  # タイルごとの配置 (new_w, new_h, pad_w, pad_h)
+        self._tile_source_size = [None] * num_tiles  # タイルごとの入力フレームサイズ (w, h)
+        self._geometry_cache = {}  # 入力サイズ -> 配置
+        for i in range(num_tiles):
+            self.clear_tile(i)
+
+    def _fit_geometry(self, src_width, src_height):
+        """
+        アスペクト比を保持してタイルに収める配置を計算（入力サイズごとにキャッシュ）
+        """
+        key = (src_width, src_height)
+        geometry = self._geometry_cache.get(key)
+        if geometry is not None:
+            return geometry
+
+        original_aspect = src_width / src_height
+        target_aspect = self.tile_width / self.tile_height
+        if original_aspect > target_aspect:
+            # 幅基準でリサイズ
+            new_w = self.tile_width
+            new_h = int(self.tile_width / original_aspect)
+        else:
+            # 高さ基準でリサイズ
+            new_h = self.tile_height
+            new_w = int(self.tile_height * original_aspect)
+
+        # 中央配置
+        pad_h = (self.tile_height - new_h) // 2
+        pad_w = (self.tile_width - new_w) // 2
+        geometry = (new_w, new_h, pad_w, pad_h)
+        self._geometry_cache[key] = geometry
+        return geometry
+
+    def _no_signal_tile(self, index):
+        tile = self._no_signal_tiles.get(index)
+        if tile is None:
+            tile = np.zeros((self.tile_height, self.tile_width, 3), dtype=np.uint8)
+            cv2.putText(tile, f'Camera {index} - No Signal',
+                        (10, self.tile_height // 2),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (128, 128, 128), 1)
+            self._no_signal_tiles[index] = tile
+        return tile
+
+    def update_tile(self, index, frame):
+        """
+        指定タイルだけを新しいフレームで更新（他のタイルには触れない）
+        """
+        tile = self._tiles[index]
+        src_height, src_width = frame.shape[:2]
+        geometry = self._fit_geometry(src_width, src_height)
+        new_w, new_h, pad_w, pad_h = geometry
+
+        # 配置が変わった場合（初回・No Signalからの復帰・解像度変更）だけ余白を塗り直す
+        if self._tile_geometry[index] != geometry:
+            tile[:] = 0
+            self._tile_geometry[index] = geometry
+
+        self._tile_source_size[index] = (src_width, src_height)
+
+        cv2.resize(frame, (new_w, new_h), dst=tile[pad_h:pad_h + new_h, pad_w:pad_w + new_w])
+
+    def clear_tile(self, index):
+        """
+        指定タイルを「No Signal」表示に戻す
+        """
+        self._tiles[index][:] = self._no_signal_tile(index)
+        self._tile_geometry[index] = None
+        self._tile_source_size[index] = None
+
+    def _tile_transform(self, index, src_size=None):
+        """
+        カメラフレーム座標 → 統合フレーム座標の変換 (scale_x, scale_y, offset_x, offset_y)
+        """
+        src_size = src_size or self._tile_source_size[index]
+        if src_size is None:
+            return None
+        new_w, new_h, pad_w, pad_h = self._fit_geometry(*src_size)
+        origin_x, origin_y = self.layout.tile_origin(index)
+        return new_w / src_size[0], new_h / src_size[1], origin_x + pad_w, origin_y + pad_h
+
+    def bbox_to_mosaic(self, index, bbox, src_size=None):
+        """
+        カメラフレーム座標のbbox [x1, y1, x2, y2] を統合フレーム上の座標に変換
+
+        Args:
+            src_size: カメラフレームのサイズ (w, h)。省略時はタイルに最後に描画したフレームのサイズ
+
+        Returns:
+            bbox: 統合フレーム上のbbox（タイルが未描画の場合はNone）
+        """
+        transform = self._tile_transform(index, src_size)
+        if transform is None:
+            return None
+        sx, sy, ox, oy = transform
+        x1, y1, x2, y2 = bbox
+        return [x1 * sx + ox, y1 * sy + oy, x2 * sx + ox, y2 * sy + oy]
+
+    def bbox_from_mosaic(self, index, bbox, src_size=None):
+        """
+        統合フレーム上のbboxをカメラフレーム座標に戻す（bbox_to_mosaicの逆変換）
+        """
+        transform = self._tile_transform(index, src_size)
+        if transform is None:
+            return None
+        sx, sy, ox, oy = transform
+        x1, y1, x2, y2 = bbox
+        return [(x1 - ox) / sx, (y1 - oy) / sy, (x2 - ox) / sx, (y2 - oy) / sy]
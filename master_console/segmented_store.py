@@ -0,0 +1,134 @@
+"""
+時間で区切ったJSONLファイル群（セグメント）への記録
+生の検出データを N 分ごとのファイルに追記し、保持期間を過ぎたファイルは削除するだけで済ませる
+（ファイル全体を読み直して書き換える処理をしない）
+
+ファイル名: <prefix>-YYYYMMDD-HHMM.jsonl（セグメントの開始時刻、ローカル時刻）
+"""
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+from jsonl_writer import BufferedJsonlWriter
+
+
+class SegmentedJsonlStore:
+    """
+    N分ごとのセグメントファイルに行を追記する
+
+    - write_many() は行の時刻が属するセグメントに書き込む（セグメントが変わったら書き込み先を切り替える）
+    - enforce_retention() は保持期間より前に終わったセグメントを削除する（ファイル数に比例、行数に依存しない）
+    - iter_range() は期間に重なるセグメントだけを読んで行を返す
+    """
+    def __init__(self, directory, prefix='detections', segment_minutes=5, retention_minutes=30, flush_interval=1.0):
+        """
+        Args:
+            directory: セグメントファイルを置くディレクトリ
+            prefix: ファイル名の接頭辞
+            segment_minutes: 1ファイルにまとめる時間（分）。60の約数を指定する
+            retention_minutes: 保持期間（分）
+            flush_interval: バッファの書き出し間隔（秒）
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_minutes = segment_minutes
+        self.retention_minutes = retention_minutes
+        self._pattern = re.compile(rf'^{re.escape(prefix)}-(\d{{8}}-\d{{4}})\.jsonl$')
+        os.makedirs(directory, exist_ok=True)
+        self._current_segment = None
+        self._writer = BufferedJsonlWriter(None, flush_interval=flush_interval)
+        self.removed_segments = 0
+
+    def segment_start(self, when):
+        """時刻が属するセグメントの開始時刻"""
+        minute = when.minute - when.minute % self.segment_minutes
+        return when.replace(minute=minute, second=0, microsecond=0)
+
+    def segment_path(self, start):
+        return os.path.join(self.directory, f"{self.prefix}-{start.strftime('%Y%m%d-%H%M')}.jsonl")
+
+    def write_many(self, rows, when):
+        """
+        行を追記（書き込み自体はバックグラウンドでまとめて行う）
+
+        Args:
+            rows: 行（dict）のリスト
+            when: 行の時刻（datetime）。書き込むセグメントを決める
+        """
+        start = self.segment_start(when)
+        if start != self._current_segment:
+            # 切り替え前に溜まっている行は前のセグメントに書き出される
+            self._writer.rotate(self.segment_path(start))
+            self._current_segment = start
+        self._writer.write_many(rows)
+
+    def flush(self):
+        self._writer.flush()
+
+    def list_segments(self):
+        """
+        Returns:
+            [(開始時刻, パス), ...]: 開始時刻の昇順（開始時刻はタイムゾーンなし）
+        """
+        segments = []
+        for name in os.listdir(self.directory):
+            match = self._pattern.match(name)
+            if match:
+                start = datetime.strptime(match.group(1), '%Y%m%d-%H%M')
+                segments.append((start, os.path.join(self.directory, name)))
+        segments.sort()
+        return segments
+
+    def enforce_retention(self, now):
+        """
+        保持期間より前に終わったセグメントを削除
+
+        Returns:
+            removed: 削除したファイル数
+        """
+        cutoff = _naive(now) - timedelta(minutes=self.retention_minutes)
+        current = _naive(self._current_segment) if self._current_segment is not None else None
+        removed = 0
+        for start, path in self.list_segments():
+            if start + timedelta(minutes=self.segment_minutes) > cutoff or start == current:
+                continue
+            try:
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        self.removed_segments += removed
+        return removed
+
+    def iter_range(self, start, end, parse_timestamp):
+        """
+        期間内（start <= 時刻 < end）の行を時刻順のセグメント順に返す
+
+        Args:
+            parse_timestamp: 行の timestamp 文字列を start/end と比較できる datetime に変換する関数
+        """
+        self.flush()
+        naive_start, naive_end = _naive(start), _naive(end)
+        for segment_start, path in self.list_segments():
+            if segment_start + timedelta(minutes=self.segment_minutes) <= naive_start or segment_start >= naive_end:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        when = parse_timestamp(row.get('timestamp', ''))
+                        if when is not None and start <= when < end:
+                            yield row
+            except FileNotFoundError:
+                continue  # 読み込み中に保持期間切れで削除された
+
+    def close(self):
+        self._writer.close()
+
+
+def _naive(dt):
+    return dt.replace(tzinfo=None) if dt.tzinfo else dt
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from grid_layout import GridLayout
+
+
+@pytest.mark.parametrize(
+    "num_cameras, columns, expected",
+    [
+        (1, None, (1, 1)),
+        (2, None, (1, 2)),
+        (4, None, (2, 2)),
+        (5, None, (2, 3)),
+        (9, None, (3, 3)),
+        (10, None, (3, 4)),
+        (5, 2, (3, 2)),
+        (3, 4, (1, 4)),
+    ],
+)
+def test_rows_and_columns(num_cameras, columns, expected):
+    layout = GridLayout(num_cameras, 320, 240, columns=columns)
+    assert (layout.rows, layout.columns) == expected
+    assert (layout.width, layout.height) == (expected[1] * 320, expected[0] * 240)
+    # 全カメラがちょうど1セルずつ割り当てられ、残りのセルは -1
+    cells = layout.cell_to_camera.ravel()
+    assert sorted(cells[cells >= 0].tolist()) == list(range(num_cameras))
+
+
+def test_rejects_no_cameras():
+    with pytest.raises(ValueError):
+        GridLayout(0, 320, 240)
+
+
+def test_tile_origin_and_slices_are_row_major():
+    layout = GridLayout(5, 320, 240)
+    assert [layout.tile_origin(i) for i in range(5)] == [(0, 0), (320, 0), (640, 0), (0, 240), (320, 240)]
+    buffer = np.zeros((layout.height, layout.width), dtype=np.int16)
+    for camera_id in range(5):
+        rows, cols = layout.tile_slices(camera_id)
+        buffer[rows, cols] += camera_id + 1
+    # タイル同士が重ならず、空きセルには何も書かれない
+    assert set(np.unique(buffer).tolist()) == {0, 1, 2, 3, 4, 5}
+    assert (buffer[240:, 640:] == 0).all()
+
+
+def test_camera_at_matches_tiles_and_empty_cells():
+    layout = GridLayout(5, 320, 240)
+    for camera_id in range(5):
+        x, y = layout.tile_origin(camera_id)
+        assert layout.camera_at(x, y) == camera_id
+        assert layout.camera_at(x + 319, y + 239) == camera_id
+    assert layout.camera_at(700, 300) is None
+    # 範囲外の座標は端のセルに丸める
+    assert layout.camera_at(-5, -5) == 0
+    assert layout.camera_at(10000, 10) == 2
+
+
+def test_camera_at_scales_resized_coordinates():
+    layout = GridLayout(4, 320, 240)
+    # 統合フレーム（640x480）を 320x240 に縮小して推論した座標
+    assert layout.camera_at(100, 100, frame_width=320, frame_height=240) == 0
+    assert layout.camera_at(200, 50, frame_width=320, frame_height=240) == 1
+    assert layout.camera_at(50, 200, frame_width=320, frame_height=240) == 2
+    assert layout.camera_at(200, 200, frame_width=320, frame_height=240) == 3
+
+
+def test_cameras_at_matches_camera_at():
+    layout = GridLayout(7, 160, 120)
+    rng = np.random.default_rng(0)
+    xs = rng.uniform(-10, layout.width + 10, size=200)
+    ys = rng.uniform(-10, layout.height + 10, size=200)
+    expected = [layout.camera_at(x, y) for x, y in zip(xs, ys)]
+    expected = [-1 if camera_id is None else camera_id for camera_id in expected]
+    assert layout.cameras_at(xs, ys).tolist() == expected
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from minute_aggregator import MinuteAggregator
+
+
+def _rows(camera_id, direction, count, prefix='t'):
+    return [{'camera_id': camera_id, 'direction': direction, 'detection_id': f'{prefix}{i}'} for i in range(count)]
+
+
+def test_pop_completed_returns_minutes_before_end_time_in_order():
+    aggregator = MinuteAggregator()
+    aggregator.add(datetime(2024, 1, 1, 12, 1), _rows(1, 'left', 2))
+    aggregator.add(datetime(2024, 1, 1, 12, 0), _rows(1, 'right', 3))
+    aggregator.add(datetime(2024, 1, 1, 12, 2), _rows(2, 'right', 1))
+    completed = aggregator.pop_completed(datetime(2024, 1, 1, 12, 2))
+    assert [minute for minute, _, _ in completed] == [datetime(2024, 1, 1, 12, 0), datetime(2024, 1, 1, 12, 1)]
+    assert completed[0][1] == {(1, 'right'): 3}
+    assert completed[1][2] == {1: {'t0', 't1'}}
+    assert aggregator.pending_minutes() == 1
+
+
+def test_late_rows_for_an_emitted_minute_go_to_the_next_open_minute():
+    aggregator = MinuteAggregator()
+    emitted = datetime(2024, 1, 1, 12, 0)
+    aggregator.add(emitted, _rows(1, 'right', 10))
+    assert len(aggregator.pop_completed(datetime(2024, 1, 1, 12, 1))) == 1
+
+    # 分の境界で取り出した後に、前の分の時刻で保存が届いた
+    aggregator.add(emitted, _rows(1, 'right', 2, prefix='late'))
+    aggregator.add(datetime(2024, 1, 1, 12, 1), _rows(1, 'left', 1))
+    completed = aggregator.pop_completed(datetime(2024, 1, 1, 12, 2))
+
+    # 取り出し済みの分をもう一度書き出さない（一部だけの行で上書きしない）
+    assert [minute for minute, _, _ in completed] == [datetime(2024, 1, 1, 12, 1)]
+    assert completed[0][1] == {(1, 'right'): 2, (1, 'left'): 1}
+    assert aggregator.late_count == 2
+
+
+def test_end_time_going_backwards_does_not_lower_the_watermark():
+    aggregator = MinuteAggregator()
+    aggregator.pop_completed(datetime(2024, 1, 1, 12, 5))
+    aggregator.pop_completed(datetime(2024, 1, 1, 12, 3))
+    aggregator.add(datetime(2024, 1, 1, 12, 4), _rows(1, 'left', 1))
+    assert aggregator.pop_completed(datetime(2024, 1, 1, 12, 5)) == []
+    assert [minute for minute, _, _ in aggregator.pop_completed(datetime(2024, 1, 1, 12, 6))] == [datetime(2024, 1, 1, 12, 5)]
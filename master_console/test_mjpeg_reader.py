@@ -0,0 +1,70 @@
+import pytest
+
+from mjpeg_reader import MAX_BUFFER_BYTES, iter_jpeg_parts, parse_boundary
+
+
+def _jpeg(payload):
+    return b'\xff\xd8' + payload + b'\xff\xd9'
+
+
+def _part(jpeg, boundary=b'frame', content_length=True):
+    headers = b'Content-Type: image/jpeg\r\n'
+    if content_length:
+        headers += b'Content-Length: ' + str(len(jpeg)).encode('ascii') + b'\r\n'
+    return b'--' + boundary + b'\r\n' + headers + b'\r\n' + jpeg + b'\r\n'
+
+
+def _chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [
+        ('multipart/x-mixed-replace; boundary=frame', b'frame'),
+        ('multipart/x-mixed-replace; boundary="--myboundary"', b'myboundary'),
+        ('multipart/x-mixed-replace;boundary=abc; charset=utf-8', b'abc'),
+        ('multipart/x-mixed-replace', b'frame'),
+        (None, b'frame'),
+    ],
+)
+def test_parse_boundary(content_type, expected):
+    assert parse_boundary(content_type) == expected
+
+
+@pytest.mark.parametrize("content_length", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+def test_iter_jpeg_parts_splits_frames_across_chunks(content_length, chunk_size):
+    frames = [_jpeg(b'a' * 10), _jpeg(b'b' * 50), _jpeg(b'c')]
+    stream = b''.join(_part(frame, content_length=content_length) for frame in frames)
+    assert list(iter_jpeg_parts(_chunks(stream, chunk_size))) == frames
+
+
+def test_content_length_allows_eoi_inside_the_image():
+    # サムネイル等で途中にEOIマーカーがあっても、Content-Length があれば全体を1枚として切り出す
+    frame = _jpeg(b'x\xff\xd9y')
+    assert list(iter_jpeg_parts(_chunks(_part(frame), 3))) == [frame]
+
+
+def test_custom_boundary_and_leading_garbage():
+    frames = [_jpeg(b'1'), _jpeg(b'2')]
+    stream = b'garbage before the first part' + b''.join(_part(frame, boundary=b'cam') for frame in frames)
+    assert list(iter_jpeg_parts([stream], boundary=b'cam')) == frames
+
+
+def test_skips_parts_that_are_not_jpeg():
+    stream = _part(b'not a jpeg') + _part(_jpeg(b'ok'))
+    assert list(iter_jpeg_parts([stream])) == [_jpeg(b'ok')]
+
+
+def test_incomplete_last_frame_is_not_returned():
+    frame = _jpeg(b'z' * 20)
+    stream = _part(frame) + _part(frame)[:-10]
+    assert list(iter_jpeg_parts(_chunks(stream, 16))) == [frame]
+
+
+def test_oversized_buffer_is_discarded_and_stream_recovers():
+    # Content-Length が壊れていて終端が来ないパートは上限で捨て、次のパートから読み直す
+    broken = b'--frame\r\nContent-Length: 999999999\r\n\r\n' + b'\x00' * (MAX_BUFFER_BYTES + 1)
+    frame = _jpeg(b'after')
+    assert list(iter_jpeg_parts([broken, _part(frame)])) == [frame]
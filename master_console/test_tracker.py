@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import tracker
+from tracker import MultiCameraTracker, RecentPositions, SortTracker, iou_matrix, match_by_iou
+
+
+@pytest.fixture(params=["greedy", "scipy"])
+def matcher(request, monkeypatch):
+    """対応付けは貪欲法とハンガリアン法（scipyがある場合のみ）の両方で確認する"""
+    if request.param == "scipy":
+        pytest.importorskip("scipy")
+        monkeypatch.setattr(tracker, "SCIPY_AVAILABLE", True)
+    else:
+        monkeypatch.setattr(tracker, "SCIPY_AVAILABLE", False)
+    return request.param
+
+
+def test_iou_matrix():
+    a = [[0, 0, 10, 10], [20, 20, 30, 30]]
+    b = [[0, 0, 10, 10], [5, 0, 15, 10], [100, 100, 110, 110]]
+    iou = iou_matrix(a, b)
+    assert iou.shape == (2, 3)
+    np.testing.assert_allclose(iou[0], [1.0, 50 / 150, 0.0])
+    np.testing.assert_allclose(iou[1], [0.0, 0.0, 0.0])
+    assert iou_matrix([], b).shape == (0, 3)
+
+
+def test_match_by_iou_is_one_to_one_and_respects_threshold(matcher):
+    iou = np.array([
+        [0.9, 0.8, 0.0],
+        [0.85, 0.1, 0.0],
+        [0.0, 0.0, 0.2],
+    ])
+    matches = {tuple(pair) for pair in match_by_iou(iou, 0.3)}
+    # 検出0と1が同じトラック0を取り合う。閾値未満の (2, 2) は対応させない
+    assert len({det for det, _ in matches}) == len(matches)
+    assert len({track for _, track in matches}) == len(matches)
+    assert (2, 2) not in matches
+    if matcher == "greedy":
+        # IoUの大きい (0, 0) を先に確定するので、検出1は閾値以上の相手が残らない
+        assert matches == {(0, 0)}
+    else:
+        # IoUの合計が最大になる組み合わせ
+        assert matches == {(0, 1), (1, 0)}
+    assert len(match_by_iou(np.zeros((0, 3)), 0.3)) == 0
+
+
+def test_ids_stay_stable_for_moving_boxes(matcher):
+    sort = SortTracker(max_age=3, iou_threshold=0.3)
+    first = sort.update([[0, 0, 20, 40], [100, 0, 120, 40]])
+    assert list(first) == [1, 2]
+    for step in range(1, 10):
+        # 2人が逆向きに毎フレーム2px移動し、検出の順番も入れ替わる
+        boxes = [[100 - 2 * step, 0, 120 - 2 * step, 40], [2 * step, 0, 20 + 2 * step, 40]]
+        assert list(sort.update(boxes)) == [2, 1]
+    assert len(sort) == 2
+
+
+def test_track_survives_short_gap_and_expires_after_max_age(matcher):
+    sort = SortTracker(max_age=2, iou_threshold=0.3)
+    box = [[50, 50, 70, 90]]
+    assert list(sort.update(box)) == [1]
+    assert list(sort.update(box)) == [1]
+    sort.update([])
+    sort.update([])
+    # max_age フレームまでの欠落なら同じIDを引き継ぐ
+    assert list(sort.update(box)) == [1]
+    for _ in range(3):
+        sort.update([])
+    assert len(sort) == 0
+    assert list(sort.update(box)) == [2]
+
+
+def test_multi_camera_tracker_keeps_ids_per_camera():
+    multi = MultiCameraTracker()
+    assert list(multi.update(0, [[0, 0, 10, 10]])) == [1]
+    assert list(multi.update(1, [[0, 0, 10, 10], [50, 50, 60, 60]])) == [1, 2]
+    assert multi.active_tracks() == {0: 1, 1: 2}
+
+
+def test_recent_positions_evicts_old_and_excess_entries():
+    positions = RecentPositions(max_age_seconds=10.0, max_entries=2)
+    positions.update(1, (0, 0), now=0.0)
+    positions.update(2, (1, 1), now=5.0)
+    positions.update(1, (2, 2), now=6.0)
+    positions.update(3, (3, 3), now=7.0)
+    # 件数の上限で最も更新が古いID 2 を削除
+    assert positions.get(2) is None
+    assert positions.get(1) == (2, 2)
+    positions.evict(now=16.5)
+    assert positions.get(1) is None
+    assert positions.get(3) == (3, 3)
+    assert positions.evicted_count == 2
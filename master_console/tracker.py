@@ -0,0 +1,236 @@
+"""
+人物トラッキングモジュール（SORT方式）
+カメラごとにカルマンフィルタで各トラックの位置を予測し、検出とのIoUで対応付けて安定したトラックIDを振る
+
+- 予測・更新は全トラック分をまとめて行列演算する（トラック数に対してPythonのループを回さない）
+- 対応付けはハンガリアン法（scipyがあれば linear_sum_assignment、無ければIoUの大きい順の貪欲法）
+- 一定フレーム数対応する検出が無かったトラックは削除する
+"""
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# scipyのインポート（オプション。ultralyticsの依存で通常は入っている）
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# 状態ベクトル: [cx, cy, s(面積), r(縦横比), vx, vy, vs]、観測: [cx, cy, s, r]
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_H = np.eye(4, 7)
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    2組のbbox（N×4, M×4: x1, y1, x2, y2）のIoU行列（N×M）を計算
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)))
+    a = np.asarray(boxes_a, dtype=float)[:, None, :]
+    b = np.asarray(boxes_b, dtype=float)[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def match_by_iou(iou, threshold):
+    """
+    IoU行列から検出とトラックの1対1の対応を求める
+
+    Returns:
+        matches: (検出index, トラックindex) の配列（K×2）。IoUが閾値未満の組は含めない
+    """
+    if iou.size == 0:
+        return np.zeros((0, 2), dtype=int)
+    if SCIPY_AVAILABLE:
+        rows, cols = linear_sum_assignment(-iou)
+    else:
+        # 貪欲法: IoUの大きい組から順に確定する
+        order = np.argsort(-iou, axis=None)
+        used_rows, used_cols, rows, cols = set(), set(), [], []
+        for flat in order:
+            row, col = divmod(int(flat), iou.shape[1])
+            if iou[row, col] < threshold:
+                break
+            if row in used_rows or col in used_cols:
+                continue
+            used_rows.add(row)
+            used_cols.add(col)
+            rows.append(row)
+            cols.append(col)
+        rows, cols = np.array(rows, dtype=int), np.array(cols, dtype=int)
+    matches = np.stack([rows, cols], axis=1) if len(rows) else np.zeros((0, 2), dtype=int)
+    return matches[iou[matches[:, 0], matches[:, 1]] >= threshold]
+
+
+def _boxes_to_z(boxes):
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / np.maximum(h, 1e-6)], axis=1)
+
+
+def _x_to_boxes(x):
+    w = np.sqrt(np.clip(x[:, 2] * x[:, 3], 0, None))
+    h = x[:, 2] / np.maximum(w, 1e-6)
+    return np.stack([x[:, 0] - w / 2, x[:, 1] - h / 2, x[:, 0] + w / 2, x[:, 1] + h / 2], axis=1)
+
+
+class SortTracker:
+    """
+    1台のカメラのトラック群（カルマンフィルタの状態を配列でまとめて持つ）
+    """
+    def __init__(self, max_age=8, iou_threshold=0.3):
+        """
+        Args:
+            max_age: 検出と対応しないまま保持するフレーム数（超えたトラックは削除）
+            iou_threshold: 対応付けに必要な予測位置とのIoU
+        """
+        self.max_age = max_age
+        self.iou_threshold = iou_threshold
+        self.next_id = 1
+        self._x = np.zeros((0, 7))
+        self._P = np.zeros((0, 7, 7))
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._misses = np.zeros(0, dtype=np.int64)  # 連続で対応しなかったフレーム数
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _predict(self):
+        """全トラックの位置を1フレーム分進める"""
+        # 面積が負にならないよう、縮小しすぎる速度は0にする
+        shrinking = self._x[:, 2] + self._x[:, 6] <= 0
+        self._x[shrinking, 6] = 0.0
+        self._x = self._x @ _F.T
+        self._P = _F @ self._P @ _F.T + _Q
+
+    def _correct(self, track_index, z):
+        """対応した検出でトラックの状態を更新"""
+        x = self._x[track_index]
+        P = self._P[track_index]
+        S = _H @ P @ _H.T + _R
+        K = P @ _H.T @ np.linalg.inv(S)
+        y = z - x @ _H.T
+        self._x[track_index] = x + np.einsum('nij,nj->ni', K, y)
+        self._P[track_index] = (np.eye(7) - K @ _H) @ P
+
+    def update(self, boxes):
+        """
+        1フレーム分の検出でトラックを更新
+
+        Args:
+            boxes: 検出のbbox（N×4: x1, y1, x2, y2）
+
+        Returns:
+            track_ids: 各検出のトラックID（N、int）
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        if len(self._ids):
+            self._predict()
+
+        predicted = _x_to_boxes(self._x)
+        matches = match_by_iou(iou_matrix(boxes, predicted), self.iou_threshold)
+
+        track_ids = np.zeros(len(boxes), dtype=np.int64)
+        matched_tracks = np.zeros(len(self._ids), dtype=bool)
+        if len(matches):
+            det_index, track_index = matches[:, 0], matches[:, 1]
+            self._correct(track_index, _boxes_to_z(boxes[det_index]))
+            track_ids[det_index] = self._ids[track_index]
+            matched_tracks[track_index] = True
+        self._misses[matched_tracks] = 0
+        self._misses[~matched_tracks] += 1
+
+        # 古いトラックを削除
+        alive = self._misses <= self.max_age
+        self._x, self._P, self._ids, self._misses = self._x[alive], self._P[alive], self._ids[alive], self._misses[alive]
+
+        # 対応しなかった検出は新しいトラックにする
+        new_dets = np.ones(len(boxes), dtype=bool)
+        new_dets[matches[:, 0]] = False
+        count = int(new_dets.sum())
+        if count:
+            new_ids = np.arange(self.next_id, self.next_id + count)
+            self.next_id += count
+            x = np.zeros((count, 7))
+            x[:, :4] = _boxes_to_z(boxes[new_dets])
+            self._x = np.concatenate([self._x, x])
+            self._P = np.concatenate([self._P, np.repeat(_P0[None], count, axis=0)])
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._misses = np.concatenate([self._misses, np.zeros(count, dtype=np.int64)])
+            track_ids[new_dets] = new_ids
+        return track_ids
+
+
+class MultiCameraTracker:
+    """
+    カメラごとに独立したSortTrackerを持つ（トラックIDはカメラ内で一意）
+    """
+    def __init__(self, max_age=8, iou_threshold=0.3):
+        self.max_age = max_age
+        self.iou_threshold = iou_threshold
+        self.trackers = {}
+
+    def update(self, camera_id, boxes):
+        tracker = self.trackers.get(camera_id)
+        if tracker is None:
+            tracker = SortTracker(self.max_age, self.iou_threshold)
+            self.trackers[camera_id] = tracker
+        return tracker.update(boxes)
+
+    def active_tracks(self):
+        return {camera_id: len(tracker) for camera_id, tracker in self.trackers.items()}
+
+
+class RecentPositions:
+    """
+    トラックIDごとの直近の位置（方向判定用）を上限付きで保持する
+
+    最後に更新した順に並べておき、古いものから順に削除する
+    - max_age_seconds より長く更新されていないエントリ
+    - 件数が max_entries を超えた分
+    """
+    def __init__(self, max_age_seconds=10.0, max_entries=2000):
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # track_id -> (x, y, 更新時刻)
+        self.evicted_count = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, track_id):
+        """
+        Returns:
+            (x, y): 保持していない場合は None
+        """
+        entry = self._entries.get(track_id)
+        return None if entry is None else entry[:2]
+
+    def update(self, track_id, position, now=None):
+        now = time.time() if now is None else now
+        self._entries[track_id] = (position[0], position[1], now)
+        self._entries.move_to_end(track_id)
+        self.evict(now)
+
+    def evict(self, now=None):
+        """古いエントリと上限を超えた分を削除"""
+        now = time.time() if now is None else now
+        cutoff = now - self.max_age_seconds
+        entries = self._entries
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest[2] >= cutoff and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+            self.evicted_count += 1
@@ -9,8 +9,16 @@ import queue
 import threading
 import json
 import os
+import sys
 from pathlib import Path
 import config
+from grid_layout import GridLayout
+from tracker import MultiCameraTracker, RecentPositions
+from segmented_store import SegmentedJsonlStore
+from minute_aggregator import MinuteAggregator
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # リポジトリ直下の共有モジュール
+from peopleflow_store import get_store
 
 try:
     from zoneinfo import ZoneInfo
@@ -26,6 +34,15 @@ except ImportError:
     print("インストール: pip install ultralytics")
 
 
+def boxes_to_array(yolo_results):
+    """
+    Resultsオブジェクトの検出結果を1回でnumpy配列（N×6: x1, y1, x2, y2, conf, cls）に変換
+    """
+    if yolo_results.boxes is None or len(yolo_results.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    return yolo_results.boxes.data.cpu().numpy()
+
+
 def _resolve_local_timezone():
     tz_name = os.environ.get("APP_TIMEZONE", "Asia/Tokyo")
     if ZoneInfo:
@@ -68,28 +85,50 @@ class YOLOProcessor:
     """
     YOLOによる人物検出とトラッキング処理
     """
-    def __init__(self, model_path=None, confidence_threshold=0.5):
+    def __init__(self, model_path=None, confidence_threshold=0.5, layout=None, load_model=True):
         """
         初期化
         
         Args:
             model_path: YOLOモデルのパス（Noneの場合はデフォルトモデルを使用）
             confidence_threshold: 検出の信頼度閾値
+            layout: 統合フレームのタイル配置（GridLayout、Noneの場合はconfigから生成）
+            load_model: Falseの場合はモデルを読み込まない（推論を別プロセスのワーカーで行う場合）
         """
         self.confidence_threshold = confidence_threshold
+        self.layout = layout or GridLayout(
+            config.MAX_CAMERAS, config.FRAME_WIDTH, config.FRAME_HEIGHT, columns=config.GRID_COLUMNS or None
+        )
         self.detection_queue = queue.Queue()  # 検出結果を保存するキュー
         default_data_dir = str(Path(__file__).resolve().parents[1] / "predictor" / "data")
         self.data_dir = os.environ.get("PEOPLEFLOW_DATA_DIR", default_data_dir)
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
+        # 1分ごとの集計（検出のたびにメモリ上で加算）
+        self.minute_aggregator = MinuteAggregator()
+        # PEOPLEFLOW_STORAGE=sqlite の場合は集計・生の検出データを共有のSQLiteに書く
+        self.store = get_store()
+        # 生の検出データの記録（監査用、オプション）
+        # N分ごとのファイルに分けて追記し、保持期間を過ぎたファイルは削除する
+        self.detection_store = None
+        if config.SAVE_RAW_DETECTIONS and self.store is None:
+            self.detection_store = SegmentedJsonlStore(
+                os.path.join(self.data_dir, "detections"),
+                segment_minutes=config.DETECTION_SEGMENT_MINUTES,
+                retention_minutes=config.DETECTION_RETENTION_MINUTES,
+                flush_interval=config.DETECTION_FLUSH_SECONDS
+            )
         
         # YOLOモデルの読み込み
         self.model = None
-        self.tracker = {}  # トラッキング用（簡易実装）
-        self.previous_positions = {}  # 前フレームの位置（方向判定用）
-        
-        # 統計用データ
-        self.detection_history = []  # 検出履歴
+        self.tracker = MultiCameraTracker(
+            max_age=config.TRACKER_MAX_AGE, iou_threshold=config.TRACKER_IOU_THRESHOLD
+        )  # カメラごとのトラッキング（SORT）
+        self.previous_positions = RecentPositions(
+            max_age_seconds=config.POSITION_MAX_AGE_SECONDS, max_entries=config.POSITION_MAX_ENTRIES
+        )  # 前フレームの位置（方向判定用。古いトラックの分は自動で削除）
+        self._tracked_tile_versions = {}  # 統合フレームのタイルごとに、トラッキングに反映済みの版数
+        self._tile_detections = {}  # 統合フレームのタイルごとの直近の検出結果（変化しなかったタイルの描画用）
         
         # 1分ごとの集計処理用
         self.aggregation_running = False
@@ -98,7 +137,9 @@ class YOLOProcessor:
         self.last_cleanup_time = None  # 最後にクリーンアップを実行した時刻
         
         # モデルを読み込む
-        if YOLO_AVAILABLE:
+        if not load_model:
+            print("YOLOモデルは推論ワーカー側で読み込みます")
+        elif YOLO_AVAILABLE:
             self.load_model(model_path)
         else:
             print("YOLOは使用できません（ultralyticsがインストールされていません）")
@@ -124,13 +165,15 @@ class YOLOProcessor:
             print(f"✗ YOLOモデルの読み込みに失敗しました: {e}")
             self.model = None
     
-    def process_frame(self, frame, camera_id=None):
+    def process_frame(self, frame, camera_id=None, in_place=False, tile_versions=None):
         """
         フレームに対して人物検出を実行
         
         Args:
             frame: 入力フレーム（BGR形式）
             camera_id: カメラID（統合フレームの場合はNone）
+            in_place: Trueの場合は入力フレームに直接描画する（コピーしない）
+            tile_versions: 統合フレームのカメラIDごとのタイルの版数（process_frame_result を参照）
         
         Returns:
             processed_frame: 検出結果を描画したフレーム
@@ -145,17 +188,9 @@ class YOLOProcessor:
             # YOLOで検出（personクラス = 0）
             results = self.model(frame, conf=self.confidence_threshold, classes=[0], verbose=False)
             
-            # 検出結果をパース
-            detections = self.parse_detections(results[0], frame)
-            
-            # 検出結果をフレームに描画
-            processed_frame = self.draw_detections(frame, detections)
-            
-            # 検出結果をキューに追加
-            if detections:
-                self.save_detection_data(detections, camera_id)
-            
-            return processed_frame, detections
+            return self.process_frame_result(
+                frame, boxes_to_array(results[0]), camera_id, in_place=in_place, tile_versions=tile_versions
+            )
             
         except Exception as e:
             print(f"YOLO処理エラー: {e}")
@@ -163,77 +198,207 @@ class YOLOProcessor:
             traceback.print_exc()
             return frame, []
     
-    def parse_detections(self, yolo_results, frame):
+    def process_frame_result(self, frame, boxes_data, camera_id=None, in_place=False, tile_versions=None):
+        """
+        推論済みの検出結果（boxes.data配列）をパースし、描画・保存する
+        （推論ワーカーから結果を受け取った場合もここで処理する）
+        
+        Args:
+            frame: 推論したフレーム（BGR形式）
+            boxes_data: 検出結果の配列（N×6: x1, y1, x2, y2, conf, cls）
+            camera_id: カメラID（統合フレームの場合はNone）
+            in_place: Trueの場合は入力フレームに直接描画する（コピーしない）
+            tile_versions: 統合フレームのカメラIDごとのタイルの版数
+                （指定した場合は前回から変化したタイルだけトラッキング・保存し、
+                  変化していないタイルは直近の検出結果をそのまま描画する。Noneの場合は全タイルを処理）
+        
+        Returns:
+            processed_frame: 検出結果を描画したフレーム
+            detections: 検出結果のリスト（変化したタイルの分のみ）
+        """
+        updated_cameras = self._changed_tiles(tile_versions) if tile_versions is not None else None
+        
+        # 検出結果をパース
+        detections = self.parse_detection_array(boxes_data, frame, updated_cameras=updated_cameras)
+        
+        drawn = detections
+        if updated_cameras is not None:
+            for cam in updated_cameras:
+                self._tile_detections[cam] = [d for d in detections if d['camera_id'] == cam]
+            drawn = detections + [
+                d for cam, held in self._tile_detections.items() if cam not in updated_cameras for d in held
+            ]
+        
+        # 検出結果をフレームに描画
+        processed_frame = self.draw_detections(frame, drawn, in_place=in_place)
+        
+        # 検出結果をキューに追加
+        if detections:
+            self.save_detection_data(detections, camera_id)
+        
+        return processed_frame, detections
+    
+    def process_batch(self, frames_by_camera):
+        """
+        カメラごとのフレームをまとめて1回のバッチ推論で人物検出
+        （統合フレームを縮小せずに各カメラの解像度で検出でき、タイル境界をまたぐ誤判定もない）
+        
+        Args:
+            frames_by_camera: {camera_id: フレーム（BGR形式）}
+        
+        Returns:
+            detections: 全カメラ分の検出結果のリスト（bboxは各カメラフレームの座標）
+        """
+        if self.model is None or not frames_by_camera:
+            return []
+        
+        frames = list(frames_by_camera.values())
+        try:
+            # リストで渡すとultralyticsが1バッチとして推論する
+            results = self.model(frames, conf=self.confidence_threshold, classes=[0], verbose=False)
+            return self.process_batch_results(frames_by_camera, [boxes_to_array(result) for result in results])
+            
+        except Exception as e:
+            print(f"YOLOバッチ処理エラー: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+    
+    def process_batch_results(self, frames_by_camera, boxes_data_list):
+        """
+        バッチ推論の結果（カメラごとのboxes.data配列）をパースして保存
+        
+        Args:
+            frames_by_camera: {camera_id: フレーム}（推論に渡した順）
+            boxes_data_list: 各フレームの検出結果の配列のリスト
+        
+        Returns:
+            detections: 全カメラ分の検出結果のリスト
+        """
+        detections = []
+        for (camera_id, frame), boxes_data in zip(frames_by_camera.items(), boxes_data_list):
+            detections.extend(self.parse_detection_array(boxes_data, frame, camera_id=camera_id))
+        
+        if detections:
+            self.save_detection_data(detections)
+        
+        return detections
+    
+    def parse_detections(self, yolo_results, frame, camera_id=None):
         """
         YOLOの検出結果をパース
         
         Args:
             yolo_results: YOLOモデルの出力（Resultsオブジェクト）
             frame: 現在のフレーム（位置計算用）
+            camera_id: 単一カメラのフレームの場合のカメラID（統合フレームの場合はNoneで位置から判定）
         
         Returns:
             detections: 検出結果のリスト
         """
-        detections = []
+        return self.parse_detection_array(boxes_to_array(yolo_results), frame, camera_id)
+    
+    def parse_detection_array(self, boxes_data, frame, camera_id=None, updated_cameras=None):
+        """
+        検出結果の配列（Resultsのboxes.dataをnumpyにしたもの）をパース
         
-        if yolo_results.boxes is None or len(yolo_results.boxes) == 0:
-            return detections
+        Args:
+            boxes_data: 検出結果の配列（N×6: x1, y1, x2, y2, conf, cls）
+            frame: 現在のフレーム（位置計算用）
+            camera_id: 単一カメラのフレームの場合のカメラID（統合フレームの場合はNoneで位置から判定）
+            updated_cameras: 統合フレームのうち前回から変化したタイルのカメラID（Noneの場合は全カメラ）
         
-        frame_height, frame_width = frame.shape[:2]
+        Returns:
+            detections: 検出結果のリスト（変化していないタイル・カメラの無いセルの検出は含めない）
+        """
+        # 変化したタイル（単一カメラの場合はそのカメラ）のトラックだけを1フレーム進める
+        # 変化していないタイルまで進めると、止まった映像上でトラックが速度のまま流れ、max_age も早く尽きる
+        if camera_id is not None:
+            updated_cameras = [camera_id]
+        elif updated_cameras is None:
+            updated_cameras = list(range(self.layout.num_cameras))
+        
+        if boxes_data is None or len(boxes_data) == 0:
+            self.track_objects(np.zeros((0, 4)), np.zeros(0, dtype=int), updated_cameras)
+            return []
+        
+        # 人物（class_id = 0）のみを処理
+        boxes_data = np.asarray(boxes_data)
+        persons = boxes_data[boxes_data[:, -1].astype(int) == 0]
+        boxes = persons[:, :4].astype(float)
+        confidences = persons[:, -2].astype(float)
+        
+        # 中心座標を計算
+        centers = (boxes[:, :2] + boxes[:, 2:4]) / 2
+        
+        # 統合フレームの場合はタイル配置からカメラIDを判定（-1はカメラの無いセル）
+        if camera_id is None:
+            frame_height, frame_width = frame.shape[:2]
+            camera_ids = self.layout.cameras_at(centers[:, 0], centers[:, 1], frame_width, frame_height)
+        else:
+            camera_ids = np.full(len(persons), camera_id, dtype=int)
         
-        for i, box in enumerate(yolo_results.boxes):
-            # バウンディングボックスの座標を取得
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            confidence = float(box.conf[0].cpu().numpy())
-            class_id = int(box.cls[0].cpu().numpy())
-            
-            # 人物（class_id = 0）のみを処理
-            if class_id != 0:
-                continue
-            
-            # 中心座標を計算
-            center_x = (x1 + x2) / 2
-            center_y = (y1 + y2) / 2
-            
-            # 統合フレームからカメラIDを判定
-            camera_id = self.determine_camera_id_from_position(center_x, center_y, frame_width, frame_height)
+        # 変化していないタイルの検出は前回と同じ画素なので二重に数えない（カメラの無いセル -1 も除く）
+        keep = np.isin(camera_ids, list(updated_cameras))
+        boxes, confidences, centers, camera_ids = boxes[keep], confidences[keep], centers[keep], camera_ids[keep]
+        
+        # カメラごとにトラッキングしてIDを振る
+        track_numbers = self.track_objects(boxes, camera_ids, updated_cameras)
+        
+        # ここから先だけ検出ごとにPythonの辞書を作る
+        detections = []
+        for bbox, center, confidence, cam, track_number in zip(
+                boxes.tolist(), centers.tolist(), confidences.tolist(), camera_ids.tolist(), track_numbers.tolist()):
+            detection_camera_id = cam if cam >= 0 else None
+            center_x, center_y = center
             
             # トラッキングID（カメラIDを含める）
-            track_id = f"camera{camera_id}_person_{i}"
+            track_id = f"camera{detection_camera_id}_person_{track_number}"
             
-            # 移動方向を判定（カメラごとにトラッキング）
+            # 移動方向を判定（同じトラックの前回位置と比較）
             direction = None
-            if track_id in self.previous_positions:
-                prev_x = self.previous_positions[track_id][0]
+            previous = self.previous_positions.get(track_id)
+            if previous is not None:
+                prev_x = previous[0]
                 direction = self.determine_direction(track_id, (center_x, center_y), (prev_x, center_y))
             
             # 位置を更新
-            self.previous_positions[track_id] = (center_x, center_y)
+            self.previous_positions.update(track_id, (center_x, center_y))
             
-            detection = {
+            detections.append({
                 'track_id': track_id,
-                'camera_id': camera_id,
-                'bbox': [float(x1), float(y1), float(x2), float(y2)],
-                'center': [float(center_x), float(center_y)],
+                'camera_id': detection_camera_id,
+                'bbox': bbox,
+                'center': center,
                 'confidence': confidence,
                 'direction': direction
-            }
-            detections.append(detection)
+            })
         
         return detections
     
-    def draw_detections(self, frame, detections):
+    def tracking_stats(self):
+        """
+        トラッキング関連の保持件数（長時間運用でメモリが増え続けていないかの確認用）
+        """
+        return {
+            'active_tracks': self.tracker.active_tracks(),
+            'previous_positions': len(self.previous_positions),
+            'previous_positions_evicted': self.previous_positions.evicted_count,
+        }
+    
+    def draw_detections(self, frame, detections, in_place=False):
         """
         検出結果をフレームに描画
         
         Args:
             frame: 入力フレーム
             detections: 検出結果のリスト
+            in_place: Trueの場合は入力フレームに直接描画する（Falseの場合はコピーに描画）
         
         Returns:
             processed_frame: 検出結果を描画したフレーム
         """
-        processed_frame = frame.copy()
+        processed_frame = frame if in_place else frame.copy()
         
         for detection in detections:
             x1, y1, x2, y2 = [int(v) for v in detection['bbox']]
@@ -255,30 +420,44 @@ class YOLOProcessor:
         
         return processed_frame
     
-    def track_objects(self, detections, frame):
+    def track_objects(self, boxes, camera_ids, updated_cameras):
         """
-        検出したオブジェクトをトラッキング
+        検出したオブジェクトをカメラごとにトラッキング
         
         Args:
-            detections: 検出結果
-            frame: 現在のフレーム
+            boxes: 検出のbbox（N×4）
+            camera_ids: 各検出のカメラID（N）
+            updated_cameras: 今回のフレームに含まれるカメラID（検出が無いカメラもトラックを1フレーム進める）
         
         Returns:
-            tracked_objects: トラッキング結果
+            track_numbers: 各検出のカメラ内トラック番号（N）
         """
-        # TODO: DeepSORT等のトラッキング処理を実装
-        tracked_objects = []
-        return tracked_objects
+        track_numbers = np.zeros(len(boxes), dtype=np.int64)
+        # カメラの無いセル（-1）の検出はトラッキングしない
+        cameras = {cam for cam in set(updated_cameras) | set(np.unique(camera_ids).tolist()) if cam >= 0}
+        for cam in cameras:
+            mask = camera_ids == cam
+            track_numbers[mask] = self.tracker.update(cam, boxes[mask])
+        return track_numbers
+    
+    def _changed_tiles(self, tile_versions):
+        """
+        前回トラッキングした時から版数が進んだタイルのカメラIDを返す
+        （推論ワーカーの結果が前後して届いても、古い版で巻き戻さない）
+        """
+        changed = []
+        for cam, version in tile_versions.items():
+            if version > self._tracked_tile_versions.get(cam, 0):
+                self._tracked_tile_versions[cam] = version
+                changed.append(cam)
+        return changed
     
     def determine_camera_id_from_position(self, center_x, center_y, frame_width, frame_height):
         """
         統合フレーム内の位置からカメラIDを判定
         
-        統合フレームの構造（2x2グリッド）:
-        - 左上（カメラ0）: (0, 0) から (FRAME_WIDTH, FRAME_HEIGHT)
-        - 右上（カメラ1）: (FRAME_WIDTH, 0) から (2*FRAME_WIDTH, FRAME_HEIGHT)
-        - 左下（カメラ2）: (0, FRAME_HEIGHT) から (FRAME_WIDTH, 2*FRAME_HEIGHT)
-        - 右下（カメラ3）: (FRAME_WIDTH, FRAME_HEIGHT) から (2*FRAME_WIDTH, 2*FRAME_HEIGHT)
+        統合フレームの構造はGridLayoutに従う（4台なら2x2グリッド、カメラは行優先で配置）。
+        判定は統合フレームの合成と共有しているセル→カメラIDの対応表を引くだけ。
         
         Args:
             center_x: 検出された人物の中心X座標
@@ -287,25 +466,9 @@ class YOLOProcessor:
             frame_height: 統合フレームの高さ
         
         Returns:
-            camera_id: カメラID (0-3)
-        """
-        # 各カメラのサイズ
-        cam_width = config.FRAME_WIDTH
-        cam_height = config.FRAME_HEIGHT
-        
-        # どのカメラ領域にいるかを判定
-        if center_x < cam_width:
-            # 左側
-            if center_y < cam_height:
-                return 0  # 左上（カメラ0）
-            else:
-                return 2  # 左下（カメラ2）
-        else:
-            # 右側
-            if center_y < cam_height:
-                return 1  # 右上（カメラ1）
-            else:
-                return 3  # 右下（カメラ3）
+            camera_id: カメラID（カメラが割り当てられていない領域の場合はNone）
+        """
+        return self.layout.camera_at(center_x, center_y, frame_width, frame_height)
     
     def determine_direction(self, track_id, current_position, previous_position):
         """
@@ -340,8 +503,9 @@ class YOLOProcessor:
             detections: 検出結果（各detectionにcamera_idが含まれる）
             camera_id_param: パラメータとして渡されたカメラID（統合フレームの場合はNone）
         """
-        timestamp = format_local_iso()
-        jsonl_file = os.path.join(self.data_dir, "detections.jsonl")
+        now = now_local()
+        timestamp = format_local_iso(now)
+        rows = []
         
         for detection in detections:
             # 検出結果からcamera_idを取得（統合フレームの場合はdetectionに含まれる）
@@ -356,16 +520,41 @@ class YOLOProcessor:
                 "person_count": 1,
                 "detection_id": detection.get("track_id", "unknown")
             }
-            
-            # JSONL形式で追記
-            with open(jsonl_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(data, ensure_ascii=False) + '\n')
+            rows.append(data)
             
             # キューにも追加（リアルタイム処理用）
             try:
                 self.detection_queue.put_nowait(data)
             except queue.Full:
                 pass
+        
+        # 1分ごとの集計に加算
+        self.minute_aggregator.add(now.replace(second=0, microsecond=0), rows)
+        
+        # JSONL形式で追記（書き込みはバックグラウンドでまとめて行う）
+        if self.detection_store is not None:
+            self.detection_store.write_many(rows, now)
+        elif self.store is not None and config.SAVE_RAW_DETECTIONS:
+            try:
+                self.store.insert_detections(rows)
+            except Exception as e:
+                print(f"[YOLO] 検出データの保存エラー: {e}")
+    
+    def read_detections(self, start_time, end_time):
+        """
+        記録した生の検出データのうち、指定期間（start_time <= 時刻 < end_time）の行を返す
+        
+        Args:
+            start_time, end_time: タイムゾーン付きのdatetime
+        
+        Returns:
+            rows: 検出データのイテレータ（記録していない場合は空）
+        """
+        if self.store is not None:
+            return iter(self.store.detections_between(format_local_iso(start_time), format_local_iso(end_time)))
+        if self.detection_store is None:
+            return iter(())
+        return self.detection_store.iter_range(start_time, end_time, parse_to_local_datetime)
     
     def get_latest_detections(self, max_count=10):
         """
@@ -406,6 +595,16 @@ class YOLOProcessor:
             self.aggregation_thread.join(timeout=2)
         print("[集計処理] 1分ごとの集計処理を停止しました")
     
+    def close(self):
+        """
+        集計処理を停止し、バッファに残っている検出データを書き出す
+        """
+        self.stop_aggregation_thread()
+        # 終わっている分の集計がまだ書き出されていなければ書き出す
+        self._aggregate_detections(now_local().replace(second=0, microsecond=0))
+        if self.detection_store is not None:
+            self.detection_store.close()
+    
     def _aggregation_worker(self):
         """
         1分ごとの集計処理を実行するワーカースレッド
@@ -423,7 +622,7 @@ class YOLOProcessor:
                 if self.last_aggregation_time is None or minute_start > self.last_aggregation_time:
                     if self.last_aggregation_time is not None:
                         # 前回の集計期間のデータを集計
-                        self._aggregate_detections(self.last_aggregation_time, minute_start)
+                        self._aggregate_detections(minute_start)
                     
                     self.last_aggregation_time = minute_start
                 
@@ -447,139 +646,79 @@ class YOLOProcessor:
                 traceback.print_exc()
                 time.sleep(60)  # エラー時は60秒待機
     
-    def _aggregate_detections(self, start_time, end_time):
+    def _aggregate_detections(self, end_time):
         """
-        指定期間の検出データを集計
+        指定時刻より前の分の集計を保存（カウントはsave_detection_dataでメモリ上に加算済み）
         
         Args:
-            start_time: 集計開始時刻（datetime）
-            end_time: 集計終了時刻（datetime）
+            end_time: 集計終了時刻（datetime）。これより前に始まった分を全て書き出す
         """
-        jsonl_file = os.path.join(self.data_dir, "detections.jsonl")
         minutely_file = os.path.join(self.data_dir, "detections_minutely.jsonl")
         
-        if not os.path.exists(jsonl_file):
-            return
-        
-        # 期間内のデータを読み込んで集計
-        aggregated_data = {}  # {(camera_id, direction): count}
-        unique_detections = {}  # {camera_id: set of detection_ids}
-        
         try:
-            with open(jsonl_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        data = json.loads(line.strip())
-                        timestamp_str = data.get('timestamp', '')
-                        detection_time = parse_to_local_datetime(timestamp_str)
-                        if detection_time is None:
-                            continue
-                        
-                        # 集計期間内かチェック
-                        if start_time <= detection_time < end_time:
-                            camera_id = data.get('camera_id')
-                            direction = data.get('direction', 'unknown')
-                            detection_id = data.get('detection_id', '')
-                            
-                            if camera_id is not None:
-                                # カメラIDと方向ごとに集計
-                                key = (camera_id, direction)
-                                aggregated_data[key] = aggregated_data.get(key, 0) + 1
-                                
-                                # ユニークな検出IDを記録
-                                if camera_id not in unique_detections:
-                                    unique_detections[camera_id] = set()
-                                if detection_id:
-                                    unique_detections[camera_id].add(detection_id)
-                    except (json.JSONDecodeError, ValueError, KeyError) as e:
-                        continue  # 不正な行はスキップ
-            
-            # 集計結果をカメラごとにまとめる
-            for internal_id in range(4):  # 0-3のカメラID（表示上は1始まり）
-                right_count = aggregated_data.get((internal_id, 'right'), 0)
-                left_count = aggregated_data.get((internal_id, 'left'), 0)
-                unknown_count = aggregated_data.get((internal_id, None), 0) + aggregated_data.get((internal_id, 'unknown'), 0)
-                total_count = right_count + left_count + unknown_count
-                unique_count = len(unique_detections.get(internal_id, set()))
-                display_camera_id = internal_id + 1
-                
-                if total_count > 0:  # データがある場合のみ保存
-                    aggregated_result = {
-                        'timestamp': format_local_iso(start_time),
-                        'camera_id': display_camera_id,
-                        'right_count': right_count,
-                        'left_count': left_count,
-                        'unknown_count': unknown_count,
-                        'total_count': total_count,
-                        'unique_detections': unique_count
-                    }
-                    
-                    # 1分ごとの集計データを保存
-                    with open(minutely_file, 'a', encoding='utf-8') as f:
-                        f.write(json.dumps(aggregated_result, ensure_ascii=False) + '\n')
-                    
-                    print(f"[集計処理] {start_time.strftime('%Y-%m-%d %H:%M')} - カメラ{display_camera_id}: "
-                          f"右={right_count}, 左={left_count}, 合計={total_count}, ユニーク={unique_count}")
-        
+            for minute_start, aggregated_data, unique_detections in self.minute_aggregator.pop_completed(end_time):
+                self._write_minutely_rows(minutely_file, minute_start, aggregated_data, unique_detections)
         except Exception as e:
             print(f"[集計処理] 集計中にエラー: {e}")
             import traceback
             traceback.print_exc()
     
+    def _write_minutely_rows(self, minutely_file, start_time, aggregated_data, unique_detections):
+        """
+        1分間の集計（{(camera_id, direction): count} と {camera_id: set of detection_ids}）をカメラごとに保存
+        """
+        rows = []
+        # 集計結果をカメラごとにまとめる
+        for internal_id in range(self.layout.num_cameras):  # 0始まりのカメラID（表示上は1始まり）
+            right_count = aggregated_data.get((internal_id, 'right'), 0)
+            left_count = aggregated_data.get((internal_id, 'left'), 0)
+            unknown_count = aggregated_data.get((internal_id, None), 0) + aggregated_data.get((internal_id, 'unknown'), 0)
+            total_count = right_count + left_count + unknown_count
+            unique_count = len(unique_detections.get(internal_id, set()))
+            display_camera_id = internal_id + 1
+            
+            if total_count > 0:  # データがある場合のみ保存
+                rows.append({
+                    'timestamp': format_local_iso(start_time),
+                    'camera_id': display_camera_id,
+                    'right_count': right_count,
+                    'left_count': left_count,
+                    'unknown_count': unknown_count,
+                    'total_count': total_count,
+                    'unique_detections': unique_count
+                })
+                print(f"[集計処理] {start_time.strftime('%Y-%m-%d %H:%M')} - カメラ{display_camera_id}: "
+                      f"右={right_count}, 左={left_count}, 合計={total_count}, ユニーク={unique_count}")
+        
+        if not rows:
+            return
+        # 1分ごとの集計データを保存
+        if self.store is not None:
+            self.store.upsert_minutely(rows)
+        else:
+            with open(minutely_file, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+    
     def _cleanup_old_data(self):
         """
-        30分より古いデータを削除
+        保持期間（既定30分）より古い検出データのセグメントファイル（SQLiteの場合は行）を削除
         """
-        jsonl_file = os.path.join(self.data_dir, "detections.jsonl")
-        
-        if not os.path.exists(jsonl_file):
+        if self.store is not None:
+            cutoff = now_local() - timedelta(minutes=config.DETECTION_RETENTION_MINUTES)
+            try:
+                removed_count = self.store.delete_detections_before(format_local_iso(cutoff))
+                if removed_count > 0:
+                    print(f"[クリーンアップ] {removed_count}件の古い検出データを削除しました")
+            except Exception as e:
+                print(f"[クリーンアップ] エラー: {e}")
+            return
+        if self.detection_store is None:
             return
-        
-        # 30分前の時刻を計算
-        cutoff_time = now_local() - timedelta(minutes=30)
         
         try:
-            # ファイルを読み込んで、30分以内のデータのみを保持
-            kept_lines = []
-            removed_count = 0
-            total_count = 0
-            
-            with open(jsonl_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    total_count += 1
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        data = json.loads(line)
-                        timestamp_str = data.get('timestamp', '')
-                        detection_time = parse_to_local_datetime(timestamp_str)
-                        if detection_time is None:
-                            kept_lines.append(line)
-                            continue
-                        
-                        # 30分以内のデータのみを保持
-                        if detection_time >= cutoff_time:
-                            kept_lines.append(line)
-                        else:
-                            removed_count += 1
-                    except json.JSONDecodeError:
-                        # JSONパースエラーは削除
-                        removed_count += 1
-                        continue
-            
-            # ファイルを上書き（30分以内のデータのみ）
+            removed_count = self.detection_store.enforce_retention(now_local())
             if removed_count > 0:
-                with open(jsonl_file, 'w', encoding='utf-8') as f:
-                    for line in kept_lines:
-                        f.write(line + '\n')
-                
-                print(f"[クリーンアップ] {removed_count}件の古いデータを削除しました "
-                      f"(保持: {len(kept_lines)}件, 合計: {total_count}件)")
-            else:
-                print(f"[クリーンアップ] 削除する古いデータはありませんでした (合計: {total_count}件)")
-        
+                print(f"[クリーンアップ] {removed_count}個の古いセグメントファイルを削除しました")
         except Exception as e:
             print(f"[クリーンアップ] エラー: {e}")
             import traceback
@@ -1,10 +1,12 @@
 from flask import Flask, jsonify, request
-import json, os, signal, subprocess, pathlib, threading, unicodedata, time
+import json, os, signal, subprocess, pathlib, sys, threading, unicodedata, time
 from datetime import datetime
 from typing import Optional
 
 BASE_DIR = pathlib.Path(__file__).resolve().parent
 ROOT = BASE_DIR.parent
+sys.path.append(str(ROOT))  # リポジトリ直下の共有モジュール
+from peopleflow_store import get_store
 STATIC_DIR = BASE_DIR / "static"
 
 app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path="")
@@ -65,6 +67,7 @@ MASTER_CMD = [PYTHON, str(ROOT / "master_console" / "app.py")]
 STREAM_PID = f"/tmp/peopleflow_stream_{CAMERA_ID}_{CAMERA_PORT}.pid"
 MASTER_PID = f"/tmp/peopleflow_master_{MASTER_PORT}.pid"
 ORDERS_FILE = ROOT / "predictor" / "data" / "orders.jsonl"
+ORDER_STORE = get_store()  # PEOPLEFLOW_STORAGE=sqlite の場合は orders.jsonl の代わりにSQLiteに記録
 
 _order_lock = threading.Lock()
 _orders_loaded = False
@@ -289,11 +292,12 @@ def _record_order_count(
     event_time = event_time.replace(microsecond=0)
     event_ts = event_time.strftime("%Y-%m-%dT%H:%M:%S")
     with _order_lock:
-        _load_existing_orders()
-        if order_id:
-            existing_ts = _known_order_ids.get(order_id)
-            if existing_ts:
-                return existing_ts, False
+        if ORDER_STORE is None:
+            _load_existing_orders()
+            if order_id:
+                existing_ts = _known_order_ids.get(order_id)
+                if existing_ts:
+                    return existing_ts, False
         payload = {
             "timestamp": event_ts,
             "order_occurred": True,
@@ -305,6 +309,9 @@ def _record_order_count(
         payload["takoyaki_count"] = order_count
         if order_id:
             payload["order_id"] = order_id
+        if ORDER_STORE is not None:
+            # order_id の重複はDB側の一意制約で弾く（他のプロセスが記録した分も含む）
+            return ORDER_STORE.insert_order(payload)
         ORDERS_FILE.parent.mkdir(parents=True, exist_ok=True)
         with ORDERS_FILE.open("a", encoding="utf-8") as handle:
             handle.write(json.dumps(payload, ensure_ascii=False) + "\n")
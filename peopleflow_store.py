@@ -0,0 +1,304 @@
+"""
+人流・注文データの SQLite ストア（WALモード）
+母艦（生の検出データ・1分ごとの集計）、注文カウンタ（注文）、予測（読み込み）で1つのDBファイルを共有する
+
+JSONLファイルへの追記・全件読み直しの代わりに使う（PEOPLEFLOW_STORAGE=sqlite で有効）。
+- timestamp 列にインデックスがあるので「直近60分」「最新の1分」は範囲検索で済む
+- 書き込みはトランザクション単位なので、複数プロセスが同時に書いても行が混ざらない
+- 時刻はローカル時刻の "YYYY-MM-DDTHH:MM:SS" 文字列（JSONLと同じ形式、文字列順 = 時刻順）
+
+【移行】既存のJSONLを取り込む（1回だけ実行、再実行しても二重には取り込まない）:
+    python peopleflow_store.py migrate
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_DATA_DIR = ROOT / "predictor" / "data"
+
+# jsonl: 従来どおりJSONLファイル / sqlite: このモジュールのDB
+STORAGE_BACKEND = os.environ.get("PEOPLEFLOW_STORAGE", "jsonl").strip().lower()
+DB_PATH = Path(os.environ.get("PEOPLEFLOW_DB", str(DEFAULT_DATA_DIR / "peopleflow.sqlite3"))).expanduser()
+
+MINUTELY_COLUMNS = ("camera_id", "right_count", "left_count", "unknown_count", "total_count", "unique_detections")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    camera_id INTEGER,
+    direction TEXT,
+    detection_id TEXT,
+    person_count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS detections_timestamp ON detections (timestamp);
+
+CREATE TABLE IF NOT EXISTS detections_minutely (
+    timestamp TEXT NOT NULL,
+    camera_id INTEGER NOT NULL,
+    right_count INTEGER NOT NULL DEFAULT 0,
+    left_count INTEGER NOT NULL DEFAULT 0,
+    unknown_count INTEGER NOT NULL DEFAULT 0,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    unique_detections INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (timestamp, camera_id)
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    order_id TEXT UNIQUE,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_timestamp ON orders (timestamp);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def sqlite_enabled() -> bool:
+    return STORAGE_BACKEND == "sqlite"
+
+
+class PeopleflowStore:
+    """
+    スレッドごとに接続を持つ（sqlite3 の接続はスレッド間で共有しない）
+    """
+
+    def __init__(self, path: Path | str | None = None, timeout: float = 10.0):
+        self.path = Path(path) if path else DB_PATH
+        self.timeout = timeout
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection()  # スキーマ作成とWALの設定
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=self.timeout)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ===== 生の検出データ（母艦） =====
+    def insert_detections(self, rows: Iterable[Dict]) -> int:
+        values = [
+            (
+                row.get("timestamp"),
+                row.get("camera_id"),
+                row.get("direction"),
+                row.get("detection_id"),
+                row.get("person_count", 1),
+            )
+            for row in rows
+            if row.get("timestamp")
+        ]
+        if not values:
+            return 0
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO detections (timestamp, camera_id, direction, detection_id, person_count) "
+                "VALUES (?, ?, ?, ?, ?)",
+                values,
+            )
+        return len(values)
+
+    def detections_between(self, start: str, end: str) -> List[Dict]:
+        """start <= timestamp < end の検出データ（時刻順）"""
+        cursor = self._connection().execute(
+            "SELECT timestamp, camera_id, direction, person_count, detection_id FROM detections "
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, id",
+            (start, end),
+        )
+        return [dict(row) for row in cursor]
+
+    def delete_detections_before(self, timestamp: str) -> int:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM detections WHERE timestamp < ?", (timestamp,)).rowcount
+
+    # ===== 1分ごとの集計（母艦が書き、予測が読む） =====
+    def upsert_minutely(self, rows: Iterable[Dict]) -> int:
+        """同じ分・カメラの行は後から書いたもので置き換える（JSONLで後の行が優先されるのと同じ）"""
+        values = [
+            (row["timestamp"], *(int(row.get(column) or 0) for column in MINUTELY_COLUMNS))
+            for row in rows
+            if row.get("timestamp") and row.get("camera_id") is not None
+        ]
+        if not values:
+            return 0
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO detections_minutely (timestamp, camera_id, right_count, left_count, "
+                "unknown_count, total_count, unique_detections) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+        return len(values)
+
+    def minutely_rows(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """detections_minutely.jsonl と同じ形式の行（時刻順）。start/end は省略可（start <= timestamp < end）"""
+        query = "SELECT timestamp, " + ", ".join(MINUTELY_COLUMNS) + " FROM detections_minutely"
+        conditions, params = _range_conditions(start, end)
+        cursor = self._connection().execute(query + conditions + " ORDER BY timestamp, camera_id", params)
+        return [dict(row) for row in cursor]
+
+    def latest_minutely_rows(self) -> List[Dict]:
+        """最新の1分の行（カメラごと）"""
+        cursor = self._connection().execute(
+            "SELECT timestamp, " + ", ".join(MINUTELY_COLUMNS) + " FROM detections_minutely "
+            "WHERE timestamp = (SELECT MAX(timestamp) FROM detections_minutely) ORDER BY camera_id"
+        )
+        return [dict(row) for row in cursor]
+
+    def version(self) -> Tuple[Optional[int], Optional[int]]:
+        """集計・注文の最後の行番号（追加・置き換えがあると変わる）"""
+        row = self._connection().execute(
+            "SELECT (SELECT MAX(rowid) FROM detections_minutely), (SELECT MAX(id) FROM orders)"
+        ).fetchone()
+        return row[0], row[1]
+
+    # ===== 注文（注文カウンタが書き、予測が読む） =====
+    def insert_order(self, payload: Dict) -> Tuple[str, bool]:
+        """
+        注文を1件記録する。order_id が記録済みなら何もしない
+
+        Returns:
+            (記録されている timestamp, 新規に記録したか)
+        """
+        order_id = payload.get("order_id") or None
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO orders (timestamp, order_id, payload) VALUES (?, ?, ?)",
+                (payload["timestamp"], order_id, json.dumps(payload, ensure_ascii=False)),
+            )
+            if cursor.rowcount:
+                return payload["timestamp"], True
+            existing = conn.execute("SELECT timestamp FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+        return (existing["timestamp"] if existing else payload["timestamp"]), False
+
+    def orders(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """orders.jsonl と同じ形式の行（時刻順）"""
+        conditions, params = _range_conditions(start, end)
+        cursor = self._connection().execute(
+            "SELECT payload FROM orders" + conditions + " ORDER BY timestamp, id", params
+        )
+        return [json.loads(row["payload"]) for row in cursor]
+
+    def recent_orders(self, limit: int = 10) -> List[Dict]:
+        cursor = self._connection().execute(
+            "SELECT payload FROM orders ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,)
+        )
+        rows = [json.loads(row["payload"]) for row in cursor]
+        rows.reverse()
+        return rows
+
+    # ===== JSONLからの移行 =====
+    def migrate_from_jsonl(self, data_dir: Path | str | None = None) -> Dict[str, int]:
+        """
+        data_dir の detections_minutely.jsonl / orders.jsonl / detections/*.jsonl を取り込む
+        ファイルごとに取り込み済みの印を meta に残し、2回目以降は取り込まない
+
+        Returns:
+            {ファイル名: 取り込んだ行数}
+        """
+        data_dir = Path(data_dir) if data_dir else DEFAULT_DATA_DIR
+        sources = [
+            (data_dir / "detections_minutely.jsonl", self.upsert_minutely),
+            (data_dir / "orders.jsonl", self._insert_orders),
+        ]
+        sources += [(path, self.insert_detections) for path in sorted((data_dir / "detections").glob("*.jsonl"))]
+        imported: Dict[str, int] = {}
+        for path, insert in sources:
+            if not path.exists():
+                continue
+            key = f"migrated:{path.resolve()}"
+            conn = self._connection()
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                continue
+            count = insert(_read_jsonl(path))
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(count)))
+            imported[path.name] = count
+        return imported
+
+    def _insert_orders(self, rows: Iterable[Dict]) -> int:
+        return sum(1 for row in rows if row.get("timestamp") and self.insert_order(row)[1])
+
+
+def _range_conditions(start: Optional[str], end: Optional[str]) -> Tuple[str, tuple]:
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("timestamp < ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), tuple(params)
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    rows: List[Dict] = []
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            try:
+                rows.append(json.loads(stripped))
+            except json.JSONDecodeError:
+                continue
+    return rows
+
+
+_default_store: Optional[PeopleflowStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[PeopleflowStore]:
+    """PEOPLEFLOW_STORAGE=sqlite のときだけ共有のストアを返す（それ以外は None）"""
+    global _default_store
+    if not sqlite_enabled():
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = PeopleflowStore()
+        return _default_store
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="人流・注文データの SQLite ストア")
+    parser.add_argument("command", choices=["migrate"], help="migrate: 既存のJSONLを取り込む")
+    parser.add_argument("--data-dir", default=str(DEFAULT_DATA_DIR), help="JSONLのあるディレクトリ")
+    parser.add_argument("--db", default=str(DB_PATH), help="SQLiteファイル")
+    args = parser.parse_args()
+
+    store = PeopleflowStore(args.db)
+    imported = store.migrate_from_jsonl(args.data_dir)
+    if not imported:
+        print(f"[store] 取り込むファイルはありません（取り込み済み）: {args.db}")
+    for name, count in imported.items():
+        print(f"[store] {name}: {count} 行を取り込みました -> {args.db}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
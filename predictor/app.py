@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import hashlib
 import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-from flask import Flask, jsonify, render_template
+from flask import Flask, Response, jsonify, render_template, request
 
 from dummy import DummyDataGenerator
+from online_learner import ONLINE_LEARNING_ENABLED, OnlineLearner
 from predict_realtime import (
     DATA_DIR,
+    DETECTIONS_FILE,
+    MODEL_FILE,
+    MODEL_REGISTRY,
+    ORDERS_FILE,
+    RESULTS_FILE,
+    STORE,
     compute_busy_level,
     describe_influences,
     build_prediction_history,
@@ -16,6 +28,7 @@ from predict_realtime import (
     load_model,
     load_prediction_results_text,
     predict_from_features,
+    prediction_history_stats,
     recent_orders,
 )
 
@@ -26,7 +39,11 @@ app = Flask(
     static_folder=str(BASE_DIR / "static"),
 )
 dummy_generator = DummyDataGenerator()
+online_learner = OnlineLearner()
 PREDICT_PORT = int(os.environ.get("PREDICT_PORT", "5100"))
+# SSE: データの更新を確認する間隔（秒）と、変化がないときに接続維持のコメントを送る間隔（秒）
+STREAM_CHECK_SECONDS = float(os.environ.get("PREDICT_STREAM_CHECK_SECONDS", "1.0"))
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get("PREDICT_STREAM_KEEPALIVE_SECONDS", "15"))
 
 REAL_DETECTIONS_FILE = Path(
     os.environ.get("PREDICTOR_REAL_DETECTIONS_FILE", str((BASE_DIR / "data" / "detections_minutely.jsonl")))
@@ -36,6 +53,83 @@ DUMMY_DETECTIONS_FILE = Path(
 )
 
 
+class _RequestTimer:
+    """処理ごとの所要時間を記録して Server-Timing ヘッダー（ブラウザの開発者ツールで見られる）にする"""
+
+    def __init__(self):
+        self.marks = []
+        self._last = time.perf_counter()
+
+    def lap(self, name: str, description: str | None = None) -> None:
+        now = time.perf_counter()
+        self.marks.append((name, (now - self._last) * 1000, description))
+        self._last = now
+
+    def header(self) -> str:
+        parts = []
+        for name, duration, description in self.marks:
+            desc = f';desc="{description}"' if description else ""
+            parts.append(f"{name};dur={duration:.2f}{desc}")
+        return ", ".join(parts)
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _data_version() -> tuple:
+    """予測の内容に関わる入力の版（ファイルの inode/サイズ/更新時刻、SQLiteの最終行、履歴の期間を決める現在の分）"""
+    files = (MODEL_FILE, REAL_DETECTIONS_FILE, DUMMY_DETECTIONS_FILE, DETECTIONS_FILE, ORDERS_FILE, RESULTS_FILE)
+    return (
+        tuple(_file_signature(path) for path in files),
+        STORE.version() if STORE is not None else None,
+        dummy_generator.is_running(),
+        datetime.now().replace(second=0, microsecond=0),
+    )
+
+
+class _PredictionPayloadCache:
+    """
+    /api/predict の内容を入力が変わったときだけ計算し、ポーリング・SSEの全クライアントで共有する
+    （同時に来たリクエストはロックで待たせ、計算は1回で済ませる）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version: Optional[tuple] = None
+        self.status = 200
+        self.body = ""
+        self.etag = ""
+        self.timing = ""
+
+    def get(self) -> Tuple[int, str, str, str]:
+        """
+        Returns:
+            (ステータス, JSON本文, ETag, Server-Timing)
+        """
+        timer = _RequestTimer()
+        version = _data_version()
+        timer.lap("version")
+        with self._lock:
+            if version == self.version:
+                timer.lap("cache", "hit")
+                return self.status, self.body, self.etag, timer.header()
+            status, payload = _compute_prediction(timer)
+            self.body = app.json.dumps(payload)
+            timer.lap("serialize")
+            self.status, self.version = status, version
+            self.etag = hashlib.sha1(self.body.encode("utf-8")).hexdigest()[:20]
+            self.timing = timer.header()
+            return self.status, self.body, self.etag, self.timing
+
+
+_prediction_cache = _PredictionPayloadCache()
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -43,9 +137,47 @@ def index():
 
 @app.get("/api/predict")
 def api_predict():
+    status, body, etag, timing = _prediction_cache.get()
+    response = Response(body, status=status, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Server-Timing"] = timing
+    # If-None-Match が一致すれば本文なしの 304 を返す
+    return response.make_conditional(request)
+
+
+@app.get("/api/predict/stream")
+def api_predict_stream():
+    """予測の内容が変わったときだけ送る Server-Sent Events"""
+    # 再接続時はブラウザが最後に受け取った id を送ってくるので、同じ内容は送り直さない
+    request_etag = request.headers.get("Last-Event-ID")
+
+    def events():
+        last_etag = request_etag
+        last_sent = time.monotonic()
+        while True:
+            _, body, etag, _ = _prediction_cache.get()
+            if etag != last_etag:
+                last_etag = etag
+                last_sent = time.monotonic()
+                yield f"id: {etag}\ndata: {body}\n\n"
+            elif time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+            time.sleep(STREAM_CHECK_SECONDS)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _compute_prediction(timer: _RequestTimer) -> Tuple[int, Dict]:
     model = load_model()
+    timer.lap("model")
     if not model:
-        return jsonify({"ok": False, "error": "model.json が見つかりません。train_model.py を実行してください。"}), 404
+        return 404, {"ok": False, "error": "model.json が見つかりません。train_model.py を実行してください。"}
 
     source = "real"
     snapshot = None
@@ -54,27 +186,32 @@ def api_predict():
         if snapshot is not None:
             source = "dummy"
     if snapshot is None:
-        snapshot = load_latest_features_from(REAL_DETECTIONS_FILE)
+        # 共有のSQLiteを使う場合は最新の1分だけを読む
+        snapshot = load_latest_features() if STORE is not None else load_latest_features_from(REAL_DETECTIONS_FILE)
         source = "real"
     if snapshot is None:
-        return (
-            jsonify(
-                {
-                    "ok": False,
-                    "error": "最新の検出データがありません（real/dummy 両方とも空）。",
-                    "source": source,
-                    "real_detections_file": str(REAL_DETECTIONS_FILE),
-                    "dummy_detections_file": str(DUMMY_DETECTIONS_FILE),
-                }
-            ),
-            404,
-        )
+        return 404, {
+            "ok": False,
+            "error": "最新の検出データがありません（real/dummy 両方とも空）。",
+            "source": source,
+            "real_detections_file": str(REAL_DETECTIONS_FILE),
+            "dummy_detections_file": str(DUMMY_DETECTIONS_FILE),
+        }
 
+    timer.lap("features")
     timestamp, features = snapshot
     prediction = predict_from_features(model, features)
     influences = describe_influences(model, features)
     busy_level = compute_busy_level(prediction)
+    timer.lap("predict")
+    history_before = prediction_history_stats()
     history = build_prediction_history(model)
+    history_after = prediction_history_stats()
+    timer.lap(
+        "history",
+        f"hit {history_after['hits'] - history_before['hits']} / "
+        f"miss {history_after['misses'] - history_before['misses']}",
+    )
     latest_actual = None
     for entry in reversed(history):
         actual_value = entry.get("actual")
@@ -101,9 +238,26 @@ def api_predict():
             "trained_at": model.get("trained_at"),
         },
         "recent_orders": recent_orders(),
-        "report_preview": load_prediction_results_text(),
     }
-    return jsonify(response)
+    timer.lap("orders")
+    response["report_preview"] = load_prediction_results_text()
+    timer.lap("report")
+    return 200, response
+
+
+@app.post("/api/model/reload")
+def model_reload():
+    """model.json を更新時刻に関係なく読み直す（学習スクリプトの実行後などに使う）"""
+    model = MODEL_REGISTRY.reload()
+    if model is None:
+        return jsonify({"ok": False, "error": f"{MODEL_FILE} を読み込めませんでした。"}), 404
+    return jsonify({"ok": True, "trained_at": model.data.get("trained_at"), "models": MODEL_REGISTRY.loaded()})
+
+
+@app.get("/api/model/online")
+def model_online_status():
+    """オンライン学習の状態（PREDICTOR_ONLINE_LEARNING=1 で起動時に開始）"""
+    return jsonify({"ok": True, "enabled": ONLINE_LEARNING_ENABLED, **online_learner.status()})
 
 
 @app.get("/api/dummy/status")
@@ -124,4 +278,6 @@ def dummy_stop():
 
 
 if __name__ == "__main__":
+    if ONLINE_LEARNING_ENABLED:
+        online_learner.start()
     app.run(host="0.0.0.0", port=PREDICT_PORT, debug=False)
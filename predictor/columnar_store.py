@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# 1分ごとの集計（detections_minutely.jsonl の1行 = 1レコード）
+MINUTELY_DTYPE = np.dtype(
+    [
+        ("timestamp", "datetime64[s]"),
+        ("camera_id", "<i4"),
+        ("left_count", "<i4"),
+        ("right_count", "<i4"),
+        ("unknown_count", "<i4"),
+        ("total_count", "<i4"),
+        ("unique_detections", "<i4"),
+    ]
+)
+
+# 注文（orders.jsonl の1行 = 1レコード、target は予測対象のたこ焼き個数）
+ORDER_DTYPE = np.dtype([("timestamp", "datetime64[s]"), ("target", "<i4")])
+
+
+def columnar_path(jsonl_path: Path) -> Path:
+    """JSONL に対応する固定長レコードファイル（同じディレクトリの .bin）"""
+    return jsonl_path.with_suffix(".bin")
+
+
+def _state_path(bin_path: Path) -> Path:
+    return bin_path.with_suffix(".state.json")
+
+
+def load_records(bin_path: Path, dtype: np.dtype) -> np.ndarray:
+    """固定長レコードファイルを構造化配列としてそのまま読み込む（書き込み途中の末尾は読まない）"""
+    if not bin_path.exists():
+        return np.zeros(0, dtype=dtype)
+    with bin_path.open("rb") as handle:
+        data = handle.read()
+    usable = len(data) - len(data) % dtype.itemsize
+    return np.frombuffer(data[:usable], dtype=dtype).copy()
+
+
+def append_records(bin_path: Path, records: np.ndarray) -> None:
+    if len(records) == 0:
+        return
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+    with bin_path.open("ab") as handle:
+        handle.write(np.ascontiguousarray(records).tobytes())
+
+
+def _load_state(bin_path: Path) -> Optional[Dict]:
+    try:
+        with _state_path(bin_path).open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _save_state(bin_path: Path, state: Dict) -> None:
+    path = _state_path(bin_path)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(state, handle)
+    os.replace(tmp_path, path)
+
+
+def sync_from_jsonl(
+    jsonl_path: Path,
+    bin_path: Path,
+    dtype: np.dtype,
+    row_to_record: Callable[[Dict], Optional[tuple]],
+) -> int:
+    """
+    JSONL に追記された行だけを固定長レコードに変換して .bin に追記する
+
+    変換済みのバイト位置と inode を .state.json に記録しておき、次回はその続きから読む。
+    JSONL が切り詰められた・置き換えられた場合は .bin を作り直す。
+
+    Returns:
+        追記したレコード数
+    """
+    if not jsonl_path.exists():
+        return 0
+    stat = jsonl_path.stat()
+    state = _load_state(bin_path)
+    offset = 0
+    expected_records = 0
+    if state and state.get("inode") == stat.st_ino and state.get("offset", 0) <= stat.st_size:
+        offset = int(state["offset"])
+        expected_records = int(state.get("records", 0))
+    record_bytes = bin_path.stat().st_size if bin_path.exists() else 0
+    if offset == 0 or record_bytes != expected_records * dtype.itemsize:
+        # 初回・ファイルの入れ替え・.bin の不整合はすべて作り直し
+        offset = 0
+        expected_records = 0
+        bin_path.unlink(missing_ok=True)
+    if offset == stat.st_size:
+        return 0
+
+    with jsonl_path.open("rb") as handle:
+        handle.seek(offset)
+        chunk = handle.read()
+    # 書き込み途中の最終行は次回に回す
+    complete = chunk.rfind(b"\n") + 1
+    records = []
+    for line in chunk[:complete].splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        try:
+            row = json.loads(stripped)
+        except json.JSONDecodeError:
+            continue
+        record = row_to_record(row)
+        if record is not None:
+            records.append(record)
+    array = np.array(records, dtype=dtype)
+    append_records(bin_path, array)
+    _save_state(
+        bin_path,
+        {"inode": stat.st_ino, "offset": offset + complete, "records": expected_records + len(array)},
+    )
+    return len(array)
+
+
+def main() -> None:
+    """detections_minutely.jsonl / orders.jsonl を .bin に変換して読み込み時間を表示"""
+    from predict_realtime import (
+        DETECTIONS_FILE,
+        ORDERS_FILE,
+        load_detections,
+        load_orders,
+        sync_columnar,
+    )
+
+    detections_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DETECTIONS_FILE
+    orders_path = Path(sys.argv[2]) if len(sys.argv) > 2 else ORDERS_FILE
+    added = sync_columnar(detections_path, orders_path)
+    print(f"[columnar] 変換: 検出 +{added[0]} 件 -> {columnar_path(detections_path)}")
+    print(f"[columnar] 変換: 注文 +{added[1]} 件 -> {columnar_path(orders_path)}")
+
+    for label, load_jsonl, dtype, path in (
+        ("検出", load_detections, MINUTELY_DTYPE, detections_path),
+        ("注文", load_orders, ORDER_DTYPE, orders_path),
+    ):
+        start = time.perf_counter()
+        rows = load_jsonl(path)
+        jsonl_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        records = load_records(columnar_path(path), dtype)
+        array_ms = (time.perf_counter() - start) * 1000
+        print(f"[columnar] {label}: JSONL {len(rows)} 行 {jsonl_ms:.1f} ms / 配列 {len(records)} 件 {array_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
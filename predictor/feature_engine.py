@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _parse_minutes(raw: str | None, default: Sequence[int]) -> List[int]:
+    if raw is None:
+        return list(default)
+    values: List[int] = []
+    for part in str(raw).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            value = int(part)
+        except ValueError:
+            continue
+        if value > 0:
+            values.append(value)
+    return sorted(set(values))
+
+
+def _parse_stats(raw: str | None) -> List[str]:
+    stats = [part.strip().lower() for part in str(raw or "").split(",")]
+    return [stat for stat in ("sum", "mean") if stat in stats]
+
+
+# 何分前の値を特徴量に加えるか（カンマ区切り、空文字で無効）
+LAG_MINUTES = _parse_minutes(os.environ.get("PREDICTOR_FEATURE_LAGS"), (5, 10))
+# 直近何分の合計・平均を特徴量に加えるか（カンマ区切り、空文字で無効）
+WINDOW_MINUTES = _parse_minutes(os.environ.get("PREDICTOR_FEATURE_WINDOWS"), (5, 15))
+ROLLING_STATS = _parse_stats(os.environ.get("PREDICTOR_FEATURE_ROLLING", "mean"))
+# 時刻（1日の中の位置）を sin/cos で加えるか
+TIME_OF_DAY = os.environ.get("PREDICTOR_FEATURE_TIME_OF_DAY", "1").strip().lower() in ("1", "true", "yes")
+
+
+class FeatureEngine:
+    """
+    1分ごとの基本特徴量（カメラ×方向の人数）から、ラグ・移動窓・時刻の特徴量を作る
+
+    - 分を添字にした連続した配列に並べ、記録の無い分は0で埋めてから numpy でまとめて計算する
+    - ラグ: t - lag 分の値 / 移動窓: t - window + 1 〜 t 分の合計・平均（累積和の差）
+    - 時刻: 0時からの分を1日で1周する角度にした sin / cos
+    - ある分の特徴量はその分と直前 lookback 分だけで決まるので、最新の分だけなら直近 lookback 分を渡せばよい
+    """
+
+    def __init__(
+        self,
+        base_names: Sequence[str],
+        lags: Sequence[int] = LAG_MINUTES,
+        windows: Sequence[int] = WINDOW_MINUTES,
+        rolling_stats: Sequence[str] = ROLLING_STATS,
+        time_of_day: bool = TIME_OF_DAY,
+    ):
+        self.base_names = list(base_names)
+        self.lags = list(lags)
+        self.windows = list(windows) if rolling_stats else []
+        self.rolling_stats = list(rolling_stats)
+        self.time_of_day = time_of_day
+        self.names = list(self.base_names)
+        self.names += [f"{name}_lag{lag}" for lag in self.lags for name in self.base_names]
+        self.names += [
+            f"{name}_{stat}{window}"
+            for window in self.windows
+            for stat in self.rolling_stats
+            for name in self.base_names
+        ]
+        if self.time_of_day:
+            self.names += ["tod_sin", "tod_cos"]
+        self.lookback = max([*self.lags, *(window - 1 for window in self.windows)], default=0)
+
+    def config(self) -> Dict:
+        """model.json に残す設定"""
+        return {
+            "lags": self.lags,
+            "windows": self.windows,
+            "rolling_stats": self.rolling_stats,
+            "time_of_day": self.time_of_day,
+        }
+
+    def transform(self, minutes: np.ndarray, values: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """
+        Args:
+            minutes: 時刻順の分（datetime64[m]、重複なし）
+            values: 各分の基本特徴量 (分数 × 基本特徴量数)
+            rows: 特徴量を求める分の位置（省略時は全ての分）
+        Returns:
+            (len(rows) × len(names)) の行列
+        """
+        rows = np.arange(len(minutes)) if rows is None else np.asarray(rows, dtype=np.int64)
+        if len(minutes) == 0 or len(rows) == 0:
+            return np.zeros((len(rows), len(self.names)))
+        values = np.asarray(values, dtype=float).reshape(len(minutes), len(self.base_names))
+
+        offsets = (minutes - minutes[0]).astype(np.int64)
+        grid = np.zeros((int(offsets[-1]) + 1, len(self.base_names)))
+        grid[offsets] = values
+        at = offsets[rows]
+
+        parts = [grid[at]]
+        for lag in self.lags:
+            source = at - lag
+            parts.append(np.where((source >= 0)[:, None], grid[np.maximum(source, 0)], 0.0))
+        if self.windows:
+            cumulative = np.vstack([np.zeros((1, grid.shape[1])), np.cumsum(grid, axis=0)])
+            for window in self.windows:
+                total = cumulative[at + 1] - cumulative[np.maximum(at + 1 - window, 0)]
+                for stat in self.rolling_stats:
+                    parts.append(total if stat == "sum" else total / window)
+        if self.time_of_day:
+            selected = minutes[rows]
+            minute_of_day = (selected - selected.astype("datetime64[D]")).astype(np.int64)
+            angle = 2 * np.pi * minute_of_day / MINUTES_PER_DAY
+            parts.append(np.column_stack([np.sin(angle), np.cos(angle)]))
+        return np.hstack(parts)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class JsonlTail:
+    """
+    JSONLファイルを前回読んだ位置から読み進める（tail -f のように追記分だけをパースする）
+
+    読んだバイト位置と inode を覚えておき、ファイルが切り詰められた（サイズが位置より小さい）か
+    置き換えられた（inode が変わった）場合は先頭から読み直す。
+    改行で終わっていない最終行は書き込み途中とみなし、次回に回す。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._inode: Optional[int] = None
+        self._offset = 0
+
+    @property
+    def position(self) -> Tuple[Optional[int], int]:
+        """(inode, 読み終えたバイト位置)。内容が変わったかどうかの判定に使う"""
+        return self._inode, self._offset
+
+    def read_new(self) -> Tuple[List[Dict], bool]:
+        """
+        Returns:
+            (追記された行, 先頭から読み直したか)。読み直した場合、呼び出し側はそれまでの内容を捨てる
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            reset = self._inode is not None
+            self._inode = None
+            self._offset = 0
+            return [], reset
+
+        reset = self._inode is not None and (stat.st_ino != self._inode or stat.st_size < self._offset)
+        if reset:
+            self._offset = 0
+        self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return [], reset
+
+        with self.path.open("rb") as handle:
+            handle.seek(self._offset)
+            chunk = handle.read(stat.st_size - self._offset)
+        complete = chunk.rfind(b"\n") + 1
+        rows: List[Dict] = []
+        for line in chunk[:complete].splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+            try:
+                rows.append(json.loads(stripped))
+            except json.JSONDecodeError:
+                continue
+        self._offset += complete
+        return rows, reset
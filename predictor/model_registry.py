@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    path: Path
+    version: Tuple[int, int]  # (更新時刻 ns, サイズ)
+    data: Dict  # model.json の内容
+    intercept: float
+    coefficients: np.ndarray  # feature_names の並びに揃えた係数（モデルに無い特徴量は0）
+    loaded_at: float
+
+
+class ModelRegistry:
+    """
+    model.json を1回だけ読み込んで保持し、ファイルの更新時刻が変わったときだけ読み直す
+
+    - 複数のモデル（実データ用・ダミー用、予測時間ごとなど）をパスごとに保持できる
+    - 読み直しは新しい LoadedModel を作ってから差し替える（読み込み中も前の版を返せる）
+    - 書き込み途中などで読めなかった場合は前の版を使い続ける
+    """
+
+    def __init__(self, feature_names: Sequence[str], default_path: Path):
+        self.feature_names = list(feature_names)
+        self.default_path = Path(default_path)
+        self._models: Dict[Path, LoadedModel] = {}
+        self._failed: Dict[Path, Tuple[int, int]] = {}  # 読めなかった版（同じ版を何度も読み直さない）
+        self._lock = threading.Lock()
+
+    def get(self, path: Path | None = None) -> Optional[LoadedModel]:
+        return self._get(Path(path) if path else self.default_path, force=False)
+
+    def reload(self, path: Path | None = None) -> Optional[LoadedModel]:
+        """更新時刻に関係なく読み直す（読めなかった場合は None を返し、前の版を使い続ける）"""
+        return self._get(Path(path) if path else self.default_path, force=True)
+
+    def _get(self, path: Path, force: bool) -> Optional[LoadedModel]:
+        try:
+            stat = path.stat()
+        except OSError:
+            with self._lock:
+                self._models.pop(path, None)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        current = self._models.get(path)
+        if not force and (
+            (current is not None and current.version == version) or self._failed.get(path) == version
+        ):
+            return current
+        return self._load(path, version, force)
+
+    def loaded(self) -> List[Dict]:
+        return [
+            {
+                "path": str(model.path),
+                "trained_at": model.data.get("trained_at"),
+                "loaded_at": model.loaded_at,
+                "features": len(model.coefficients),
+            }
+            for model in list(self._models.values())
+        ]
+
+    def _load(self, path: Path, version: Tuple[int, int], force: bool) -> Optional[LoadedModel]:
+        with self._lock:
+            current = self._models.get(path)
+            if not force and current is not None and current.version == version:
+                return current  # 他のスレッドが読み込み済み
+            try:
+                with path.open("r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+            except (OSError, json.JSONDecodeError) as exc:
+                print(f"[model] {path} を読み込めませんでした（前の版を使用）: {exc}")
+                self._failed[path] = version
+                return None if force else current
+            self._failed.pop(path, None)
+            unknown = [name for name in data.get("feature_names", []) if name not in self.feature_names]
+            if unknown:
+                print(f"[model] {path} の特徴量 {', '.join(unknown)} は現在の設定に無いため使いません")
+            model = LoadedModel(
+                path=path,
+                version=version,
+                data=data,
+                intercept=float(data.get("intercept", 0.0)),
+                coefficients=self.align(data),
+                loaded_at=time.time(),
+            )
+            self._models[path] = model
+            return model
+
+    def find(self, data: Dict) -> Optional[LoadedModel]:
+        """data（load_model が返したdict）を読み込んだ LoadedModel。ファイルは見に行かない"""
+        for model in list(self._models.values()):
+            if model.data is data:
+                return model
+        return None
+
+    def align(self, data: Dict) -> np.ndarray:
+        """model.json の係数を feature_names の並びのベクトルにする"""
+        by_name = {
+            name: float(coef) for name, coef in zip(data.get("feature_names", []), data.get("coefficients", []))
+        }
+        return np.array([by_name.get(name, 0.0) for name in self.feature_names], dtype=float)
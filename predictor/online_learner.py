@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from predict_realtime import (
+    FEATURE_NAMES,
+    build_dataset_records,
+    feature_matrix,
+    get_model,
+    load_latest_features,
+    save_model,
+)
+from regression import IncrementalLeastSquares
+from train_model import RIDGE_ALPHA, model_from_solver
+
+# 1 にすると app.py の起動時にオンライン学習を始める
+ONLINE_LEARNING_ENABLED = os.environ.get("PREDICTOR_ONLINE_LEARNING", "0").strip().lower() in ("1", "true", "yes")
+# 新しいデータを確認する間隔（秒）と、model.json に書き出す間隔（秒）
+ONLINE_INTERVAL_SECONDS = float(os.environ.get("PREDICTOR_ONLINE_INTERVAL_SECONDS", "60"))
+ONLINE_SNAPSHOT_SECONDS = float(os.environ.get("PREDICTOR_ONLINE_SNAPSHOT_SECONDS", "600"))
+
+
+class OnlineLearner:
+    """
+    1分ごとの集計と注文が揃った分から順にモデルへ追加し、定期的に model.json に書き出す
+
+    - 対応付けは build_dataset_records と同じ（horizon 分後の ±tolerance 分で最も近い注文）
+    - ある分の注文が確定するのは horizon + tolerance 分後なので、最新の集計の分からそれだけ前の分までを追加する
+    - 学習の状態（IncrementalLeastSquares）は model.json の least_squares / trained_until から続きを始める
+    - model.json が外から書き換えられた（学習スクリプトを実行した）場合は、そちらの状態から始め直す
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float = ONLINE_INTERVAL_SECONDS,
+        snapshot_seconds: float = ONLINE_SNAPSHOT_SECONDS,
+        horizon_minutes: int = 10,
+        tolerance_minutes: int = 5,
+    ):
+        self.interval_seconds = interval_seconds
+        self.snapshot_seconds = snapshot_seconds
+        self.horizon_minutes = horizon_minutes
+        self.tolerance_minutes = tolerance_minutes
+        self.solver: Optional[IncrementalLeastSquares] = None
+        self.learned_until: Optional[datetime] = None  # 追加済みの最後の分
+        self.pending_updates = 0  # 書き出していない追加件数
+        self.total_updates = 0
+        self.last_snapshot: Optional[str] = None
+        self._restored = False
+        self._model_version: Optional[Tuple[int, int]] = None  # 状態を読み込んだ（書き出した）model.json の版
+        self._last_snapshot_time = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+        self.snapshot()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.step()
+                if time.monotonic() - self._last_snapshot_time >= self.snapshot_seconds:
+                    self.snapshot()
+            except Exception as exc:  # pragma: no cover
+                print(f"[online] 学習中にエラー: {exc}")
+            self._stop_event.wait(self.interval_seconds)
+
+    def _restore(self) -> None:
+        """model.json の学習状態から始める（状態が無い・特徴量が違う場合は最初から学習する）"""
+        model = get_model()
+        self._restored = True
+        self._model_version = model.version if model is not None else None
+        self.solver, self.learned_until = None, None
+        data = model.data if model is not None else {}
+        state = data.get("least_squares")
+        trained_until = data.get("trained_until")
+        if (
+            state
+            and trained_until
+            and data.get("feature_names") == FEATURE_NAMES
+            and len(state.get("z", [])) == len(FEATURE_NAMES) + 1
+        ):
+            self.solver = IncrementalLeastSquares.from_dict(state)
+            self.learned_until = datetime.fromisoformat(trained_until)
+            print(f"[online] {trained_until} までの学習状態から再開します（{self.solver.n_samples} 件）")
+
+    def step(self) -> int:
+        """
+        確定した分を追加する
+
+        Returns:
+            追加した件数
+        """
+        latest = load_latest_features()
+        if latest is None:
+            return 0
+        horizon = timedelta(minutes=self.horizon_minutes)
+        tolerance = timedelta(minutes=self.tolerance_minutes)
+        # この分までは対応する注文の候補が出揃っている
+        settled_until = datetime.fromisoformat(latest[0]) - horizon - tolerance
+
+        with self._lock:
+            model = get_model()
+            if not self._restored or (model is not None and model.version != self._model_version):
+                self._restore()
+            since = self.learned_until + timedelta(minutes=1) if self.learned_until else None
+            if since is not None and since > settled_until:
+                return 0
+            records = [
+                record
+                for record in build_dataset_records(self.horizon_minutes, self.tolerance_minutes, since=since)
+                if record[0] <= settled_until
+            ]
+            self.learned_until = settled_until
+            if not records:
+                return 0
+            X = feature_matrix([features for _, features, _, _ in records])
+            X_design = np.hstack([np.ones((len(records), 1)), X])
+            y = np.asarray([order_count for _, _, order_count, _ in records], dtype=float)
+            if self.solver is None:
+                self.solver = IncrementalLeastSquares.from_data(X_design, y, RIDGE_ALPHA)
+            elif len(records) == 1:
+                self.solver.add(X_design[0], y[0])
+            else:
+                self.solver.add_many(X_design, y)
+            self.pending_updates += len(records)
+            self.total_updates += len(records)
+            return len(records)
+
+    def snapshot(self) -> bool:
+        """追加した分があれば model.json に書き出す（予測側は更新時刻の変化で読み直す）"""
+        with self._lock:
+            self._last_snapshot_time = time.monotonic()
+            if self.solver is None or not self.pending_updates:
+                return False
+            model_dict = model_from_solver(self.solver, self.learned_until.isoformat())
+            model_dict["online_updates"] = self.total_updates
+            save_model(model_dict)
+            model = get_model()
+            self._model_version = model.version if model is not None else None
+            self.last_snapshot = model_dict["trained_at"]
+            print(
+                f"[online] model.json を更新しました: +{self.pending_updates} 件 "
+                f"（計 {model_dict['trained_samples']} 件, R^2 {model_dict['r2']:.4f}）"
+            )
+            self.pending_updates = 0
+            return True
+
+    def status(self) -> Dict:
+        return {
+            "running": self.is_running(),
+            "learned_until": self.learned_until.isoformat() if self.learned_until else None,
+            "samples": self.solver.n_samples if self.solver is not None else 0,
+            "pending_updates": self.pending_updates,
+            "total_updates": self.total_updates,
+            "last_snapshot": self.last_snapshot,
+            "interval": self.interval_seconds,
+            "snapshot_interval": self.snapshot_seconds,
+        }
+
+
+if __name__ == "__main__":
+    learner = OnlineLearner()
+    print(
+        f"[online] オンライン学習を開始します（確認 {learner.interval_seconds:.0f} 秒ごと、"
+        f"書き出し {learner.snapshot_seconds:.0f} 秒ごと。Ctrl+C で終了）"
+    )
+    learner.start()
+    try:
+        while learner.is_running():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        learner.stop()
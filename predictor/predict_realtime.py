@@ -2,12 +2,32 @@ from __future__ import annotations
 
 import json
 import os
+import sys
+import threading
 import unicodedata
+from bisect import bisect_left, insort
+from operator import itemgetter
 from datetime import datetime, timedelta
+from itertools import chain
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from feature_engine import FeatureEngine
+from columnar_store import (
+    MINUTELY_DTYPE,
+    ORDER_DTYPE,
+    columnar_path,
+    load_records,
+    sync_from_jsonl,
+)
+from jsonl_tail import JsonlTail
+from model_registry import LoadedModel, ModelRegistry
 
 BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR.parent))  # リポジトリ直下の共有モジュール
+from peopleflow_store import get_store
 
 
 def _parse_camera_ids(raw: str | None) -> List[int]:
@@ -46,8 +66,17 @@ MODEL_FILE = _resolve_file("PREDICTOR_MODEL_FILE", DATA_DIR / "model.json")
 RESULTS_FILE = _resolve_file("PREDICTOR_RESULTS_FILE", DATA_DIR / "prediction_results.txt")
 
 CAMERA_IDS = _parse_camera_ids(os.environ.get("PREDICTOR_CAMERA_IDS"))
-FEATURE_NAMES = [f"cam{camera_id}_{direction}" for camera_id in CAMERA_IDS for direction in ("left", "right")]
+# 1分ごとのカメラ×方向の人数（build_feature_map の列）
+BASE_FEATURE_NAMES = [f"cam{camera_id}_{direction}" for camera_id in CAMERA_IDS for direction in ("left", "right")]
+# 学習・予測に使う特徴量（基本特徴量 + ラグ・移動窓・時刻。feature_engine の設定による）
+FEATURE_ENGINE = FeatureEngine(BASE_FEATURE_NAMES)
+FEATURE_NAMES = FEATURE_ENGINE.names
 TAKOYAKI_UNIT_PRICE = int(os.environ.get("TAKOYAKI_UNIT_PRICE", "50"))
+# jsonl: 毎回JSONLを読む / columnar: JSONLの追記分を固定長レコード(.bin)に変換してから配列で読む
+STORAGE_BACKEND = os.environ.get("PREDICTOR_STORAGE", "jsonl").strip().lower()
+# PEOPLEFLOW_STORAGE=sqlite の場合、既定のデータ（パス指定なし）は共有のSQLiteから読む
+STORE = get_store()
+MODEL_REGISTRY = ModelRegistry(FEATURE_NAMES, MODEL_FILE)
 
 
 def _normalize_text(value: str | None) -> str:
@@ -118,8 +147,64 @@ def load_orders(path: Path | None = None) -> List[Dict]:
     return _read_jsonl(path or ORDERS_FILE)
 
 
+def _to_datetime64(value) -> Optional[np.datetime64]:
+    if not value:
+        return None
+    try:
+        parsed = _parse_timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    return np.datetime64(parsed.replace(tzinfo=None), "s")
+
+
+def _detection_record(row: Dict) -> Optional[tuple]:
+    timestamp = _to_datetime64(row.get("timestamp"))
+    if timestamp is None or row.get("camera_id") is None:
+        return None
+    return (
+        timestamp,
+        _safe_int(row.get("camera_id")),
+        _safe_int(row.get("left_count")),
+        _safe_int(row.get("right_count")),
+        _safe_int(row.get("unknown_count")),
+        _safe_int(row.get("total_count")),
+        _safe_int(row.get("unique_detections")),
+    )
+
+
+def _order_record(row: Dict) -> Optional[tuple]:
+    timestamp = _to_datetime64(row.get("timestamp"))
+    if timestamp is None:
+        return None
+    return timestamp, _order_target_value(row)
+
+
+def sync_columnar(detections_path: Path | None = None, orders_path: Path | None = None) -> Tuple[int, int]:
+    """JSONLの追記分を .bin に反映（戻り値は追加した検出・注文のレコード数）"""
+    detections_path = detections_path or DETECTIONS_FILE
+    orders_path = orders_path or ORDERS_FILE
+    return (
+        sync_from_jsonl(detections_path, columnar_path(detections_path), MINUTELY_DTYPE, _detection_record),
+        sync_from_jsonl(orders_path, columnar_path(orders_path), ORDER_DTYPE, _order_record),
+    )
+
+
+def load_detection_array(path: Path | None = None) -> np.ndarray:
+    """1分ごとの集計を MINUTELY_DTYPE の構造化配列で返す（ファイル順）"""
+    path = path or DETECTIONS_FILE
+    sync_from_jsonl(path, columnar_path(path), MINUTELY_DTYPE, _detection_record)
+    return load_records(columnar_path(path), MINUTELY_DTYPE)
+
+
+def load_order_array(path: Path | None = None) -> np.ndarray:
+    """注文を ORDER_DTYPE の構造化配列で返す（ファイル順）"""
+    path = path or ORDERS_FILE
+    sync_from_jsonl(path, columnar_path(path), ORDER_DTYPE, _order_record)
+    return load_records(columnar_path(path), ORDER_DTYPE)
+
+
 def _empty_feature_template() -> Dict[str, int]:
-    return {name: 0 for name in FEATURE_NAMES}
+    return {name: 0 for name in BASE_FEATURE_NAMES}
 
 
 def _safe_int(value, default: int = 0) -> int:
@@ -215,8 +300,12 @@ def _price_to_takoyaki_count(total_price: Optional[float]) -> Optional[int]:
     return max(1, int(round(total_price / TAKOYAKI_UNIT_PRICE)))
 
 
-def build_feature_map(detections: Iterable[Dict]) -> Dict[str, Dict[str, int]]:
-    feature_map: Dict[str, Dict[str, int]] = {}
+def build_feature_map(
+    detections: Iterable[Dict], feature_map: Dict[str, Dict[str, int]] | None = None
+) -> Dict[str, Dict[str, int]]:
+    """feature_map を渡した場合はそれに追記する（既にある分のdictは書き換えずに新しいdictに置き換える）"""
+    feature_map = {} if feature_map is None else feature_map
+    updated = set()
     for row in detections:
         timestamp = row.get("timestamp")
         camera_id = row.get("camera_id")
@@ -225,23 +314,238 @@ def build_feature_map(detections: Iterable[Dict]) -> Dict[str, Dict[str, int]]:
         camera_id = int(camera_id)
         if camera_id not in CAMERA_IDS:
             continue
-        if timestamp not in feature_map:
-            feature_map[timestamp] = _empty_feature_template()
+        if timestamp not in updated:
+            previous = feature_map.get(timestamp)
+            feature_map[timestamp] = dict(previous) if previous else _empty_feature_template()
+            updated.add(timestamp)
         feature_map[timestamp][f"cam{camera_id}_left"] = int(row.get("left_count", 0))
         feature_map[timestamp][f"cam{camera_id}_right"] = int(row.get("right_count", 0))
     return feature_map
 
 
+class _DetectionTailCache:
+    """detections_minutely.jsonl の追記分だけをパースして特徴量マップを更新する"""
+
+    def __init__(self, path: Path):
+        self.tail = JsonlTail(path)
+        self.feature_map: Dict[str, Dict[str, int]] = {}
+        self.latest_ts: Optional[str] = None
+        self.minutes: List[Tuple[datetime, str]] = []  # 時刻順の (時刻, timestamp)
+
+    def refresh(self) -> None:
+        rows, reset = self.tail.read_new()
+        if reset:
+            self.feature_map, self.latest_ts, self.minutes = {}, None, []
+        if not rows:
+            return
+        # 参照中の呼び出し側に影響しないよう、新しいdictに追記して差し替える
+        previous = self.feature_map
+        self.feature_map = build_feature_map(rows, dict(previous))
+        added = [ts for ts in dict.fromkeys(row.get("timestamp") for row in rows) if ts in self.feature_map]
+        if added:
+            latest_ts = max(added)
+            self.latest_ts = max(latest_ts, self.latest_ts) if self.latest_ts else latest_ts
+        new_minutes = [ts for ts in added if ts not in previous]
+        if new_minutes:
+            minutes = list(self.minutes)
+            for ts in new_minutes:
+                insort(minutes, (_parse_timestamp(ts), ts))
+            self.minutes = minutes
+
+
+class _OrderTailCache:
+    """orders.jsonl の追記分だけをパースして、時刻順の注文と (時刻, 目的変数) の系列を更新する"""
+
+    def __init__(self, path: Path):
+        self.tail = JsonlTail(path)
+        self.rows: List[Dict] = []
+        self.series: List[Tuple[datetime, int]] = []
+        self.times: List[datetime] = []
+
+    def refresh(self) -> None:
+        rows, reset = self.tail.read_new()
+        if reset:
+            self.rows, self.series, self.times = [], [], []
+        if not rows:
+            return
+        # 安定ソート済みの既存分の後ろに足して安定ソートすれば、全件を読み直してソートした場合と同じ順になる
+        self.rows = sorted(self.rows + rows, key=lambda row: row.get("timestamp", ""))
+        self.series = sorted(self.series + _parse_order_series(rows), key=lambda item: item[0])
+        self.times = [order_time for order_time, _ in self.series]
+
+
+_tail_lock = threading.Lock()
+_detection_caches: Dict[Path, _DetectionTailCache] = {}
+_order_caches: Dict[Path, _OrderTailCache] = {}
+
+
+def _tail_feature_map(
+    path: Path | None,
+) -> Tuple[Dict[str, Dict[str, int]], Optional[str], List[Tuple[datetime, str]]]:
+    """Returns: (特徴量マップ, 最新の timestamp, 時刻順の分)。呼び出し側は書き換えないこと"""
+    path = path or DETECTIONS_FILE
+    with _tail_lock:
+        cache = _detection_caches.get(path)
+        if cache is None:
+            cache = _detection_caches[path] = _DetectionTailCache(path)
+        cache.refresh()
+        return cache.feature_map, cache.latest_ts, cache.minutes
+
+
+def _tail_orders(
+    path: Path | None,
+) -> Tuple[List[Dict], List[Tuple[datetime, int]], List[datetime], Tuple[Optional[int], int]]:
+    """Returns: (時刻順の注文, 時刻順の (時刻, 目的変数), その時刻だけのリスト, ファイルの読み込み位置)。呼び出し側は書き換えないこと"""
+    path = path or ORDERS_FILE
+    with _tail_lock:
+        cache = _order_caches.get(path)
+        if cache is None:
+            cache = _order_caches[path] = _OrderTailCache(path)
+        cache.refresh()
+        return cache.rows, cache.series, cache.times, cache.tail.position
+
+
+def feature_map_from_array(records: np.ndarray) -> Dict[str, Dict[str, int]]:
+    """build_feature_map と同じ結果を MINUTELY_DTYPE の配列から作る（同じ分・カメラの行は後の行を優先）"""
+    camera_ids = np.asarray(CAMERA_IDS)
+    records = records[np.isin(records["camera_id"], camera_ids)]
+    if len(records) == 0:
+        return {}
+    times, time_index = np.unique(records["timestamp"], return_inverse=True)
+    camera_order = np.argsort(camera_ids, kind="stable")
+    camera_index = camera_order[np.searchsorted(camera_ids[camera_order], records["camera_id"])]
+
+    keys = time_index * len(camera_ids) + camera_index
+    _, last_reversed = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - last_reversed
+
+    values = np.zeros((len(times), len(BASE_FEATURE_NAMES)), dtype=np.int64)
+    values[time_index[last], 2 * camera_index[last]] = records["left_count"][last]
+    values[time_index[last], 2 * camera_index[last] + 1] = records["right_count"][last]
+    timestamps = np.datetime_as_string(times, unit="s").tolist()
+    return {timestamp: dict(zip(BASE_FEATURE_NAMES, row)) for timestamp, row in zip(timestamps, values.tolist())}
+
+
+def _load_feature_map(path: Path | None = None, since: datetime | None = None) -> Dict[str, Dict[str, int]]:
+    """since を指定した場合はその時刻以降の分だけを返す（どの保存形式でも、それより前の分は特徴量を作らない）"""
+    if path is None and STORE is not None:
+        return build_feature_map(STORE.minutely_rows(start=since.isoformat() if since else None))
+    if STORAGE_BACKEND == "columnar":
+        records = load_detection_array(path)
+        if since is not None:
+            records = records[records["timestamp"] >= np.datetime64(since.replace(tzinfo=None), "s")]
+        return feature_map_from_array(records)
+    feature_map, _, minutes = _tail_feature_map(path)
+    if since is None:
+        return feature_map
+    return {timestamp: feature_map[timestamp] for _, timestamp in minutes[bisect_left(minutes, (since,)) :]}
+
+
+def _sorted_minutes(feature_map: Dict[str, Dict[str, int]]) -> List[Tuple[datetime, str]]:
+    return sorted((_parse_timestamp(timestamp), timestamp) for timestamp in feature_map)
+
+
+def _engineer_matrix(
+    feature_map: Dict[str, Dict[str, int]],
+    timestamps: Sequence[str] | None = None,
+    minutes: List[Tuple[datetime, str]] | None = None,
+) -> Tuple[List[str], np.ndarray]:
+    """
+    基本特徴量のマップ（build_feature_map）から、ラグ・移動窓・時刻を加えた特徴量の行列を作る（列は FEATURE_NAMES の順）
+
+    ラグ・移動窓には feature_map の全ての分を使う。timestamps を指定した場合はその分の行だけを返す。
+    minutes（時刻順の (時刻, timestamp)）を渡すと並べ替えを省く
+
+    Returns:
+        (各行の timestamp, 行列)
+    """
+    minutes = _sorted_minutes(feature_map) if minutes is None else minutes
+    keys = [timestamp for _, timestamp in minutes]
+    minute_index = np.array([parsed.replace(tzinfo=None) for parsed, _ in minutes], dtype="datetime64[m]")
+    values = _rows_matrix([feature_map[timestamp] for timestamp in keys], BASE_FEATURE_NAMES, _BASE_GETTER)
+    if timestamps is None:
+        return keys, FEATURE_ENGINE.transform(minute_index, values)
+    position = {timestamp: index for index, timestamp in enumerate(keys)}
+    selected = [timestamp for timestamp in timestamps if timestamp in position]
+    rows = np.array([position[timestamp] for timestamp in selected], dtype=np.int64)
+    return selected, FEATURE_ENGINE.transform(minute_index, values, rows)
+
+
+def engineer_features(
+    feature_map: Dict[str, Dict[str, int]], timestamps: Sequence[str] | None = None
+) -> Dict[str, Dict[str, float]]:
+    """_engineer_matrix の結果を {timestamp: {特徴量名: 値}} にする（学習・予測で共通）"""
+    selected, matrix = _engineer_matrix(feature_map, timestamps)
+    return {timestamp: dict(zip(FEATURE_NAMES, row)) for timestamp, row in zip(selected, matrix.tolist())}
+
+
+def _latest_features(
+    feature_map: Dict[str, Dict[str, int]], minutes: List[Tuple[datetime, str]] | None = None
+) -> Optional[Tuple[str, Dict[str, float]]]:
+    """最新の分の特徴量。直近 lookback 分だけから計算する（履歴全体は計算し直さない）"""
+    if not feature_map:
+        return None
+    if minutes is None:
+        latest_ts = max(feature_map.keys())
+        start_ts = (_parse_timestamp(latest_ts) - timedelta(minutes=FEATURE_ENGINE.lookback)).isoformat()
+        window = _sorted_minutes({ts: None for ts in feature_map if start_ts <= ts <= latest_ts})
+    else:
+        latest_time, latest_ts = minutes[-1]
+        window = minutes[bisect_left(minutes, (latest_time - timedelta(minutes=FEATURE_ENGINE.lookback),)) :]
+    context = {timestamp: feature_map[timestamp] for _, timestamp in window}
+    _, matrix = _engineer_matrix(context, [latest_ts], window)
+    return latest_ts, dict(zip(FEATURE_NAMES, matrix[0].tolist()))
+
+
+def _parse_order_series(rows: Iterable[Dict]) -> List[Tuple[datetime, int]]:
+    order_series: List[Tuple[datetime, int]] = []
+    for order in rows:
+        timestamp_value = order.get("timestamp")
+        if not timestamp_value:
+            continue
+        target_value = _order_target_value(order)
+        order_series.append((_parse_timestamp(timestamp_value), target_value))
+    return order_series
+
+
+def _load_order_series(path: Path | None = None, since: datetime | None = None) -> List[Tuple[datetime, int]]:
+    if path is None and STORE is not None:
+        order_series = _parse_order_series(STORE.orders(start=since.isoformat() if since else None))
+        order_series.sort(key=lambda item: item[0])
+        return order_series
+    if STORAGE_BACKEND == "columnar":
+        records = load_order_array(path)
+        records = records[np.argsort(records["timestamp"], kind="stable")]
+        return list(zip(records["timestamp"].tolist(), records["target"].tolist()))
+    return _tail_orders(path)[1]
+
+
 def _find_order_for_target(
-    orders: List[Tuple[datetime, int]], target_time: datetime, tolerance: timedelta
+    orders: List[Tuple[datetime, int]],
+    target_time: datetime,
+    tolerance: timedelta,
+    order_times: List[datetime] | None = None,
 ) -> Optional[Tuple[datetime, int]]:
+    """
+    target_time に最も近い注文（差が tolerance 以内）。差が同じ場合は先の注文（同時刻が複数あれば最初の1件）
+
+    orders は時刻順であること。order_times（orders の時刻だけのリスト）を渡すと作り直さずに二分探索する
+    """
+    if order_times is None:
+        order_times = [order_time for order_time, _ in orders]
+    index = bisect_left(order_times, target_time)
     best: Optional[Tuple[datetime, int]] = None
     best_diff = tolerance + timedelta(seconds=1)
-    for order_time, order_count in orders:
-        diff = abs(order_time - target_time)
+    if index > 0:
+        # target_time より前で最も近い時刻（同時刻が複数あれば最初の1件）
+        before = bisect_left(order_times, order_times[index - 1], 0, index)
+        diff = target_time - order_times[before]
+        if diff <= tolerance:
+            best, best_diff = orders[before], diff
+    if index < len(orders):
+        diff = order_times[index] - target_time
         if diff <= tolerance and diff < best_diff:
-            best = (order_time, order_count)
-            best_diff = diff
+            best = orders[index]
     return best
 
 
@@ -271,30 +575,29 @@ def build_dataset_records(
     tolerance_minutes: int = 5,
     detections_path: Path | None = None,
     orders_path: Path | None = None,
+    since: datetime | None = None,
 ) -> List[Tuple[datetime, Dict[str, int], int, datetime]]:
-    detections = load_detections(detections_path)
-    orders_raw = load_orders(orders_path)
-    if not detections or not orders_raw:
-        return []
-
-    feature_map = build_feature_map(detections)
-    order_series: List[Tuple[datetime, int]] = []
-    for order in orders_raw:
-        timestamp_value = order.get("timestamp")
-        if not timestamp_value:
-            continue
-        target_value = _order_target_value(order)
-        order_series.append((_parse_timestamp(timestamp_value), target_value))
-    order_series.sort(key=lambda item: item[0])
-
+    """since を指定した場合は、その時刻以降の分だけを返す（SQLiteの場合は範囲検索で読む）"""
     horizon = timedelta(minutes=horizon_minutes)
     tolerance = timedelta(minutes=tolerance_minutes)
+    # ラグ・移動窓の計算に使うので、since より lookback 分前から読む
+    lookback = timedelta(minutes=FEATURE_ENGINE.lookback)
+    feature_map = engineer_features(_load_feature_map(detections_path, since - lookback if since else None))
+    if not feature_map:
+        return []
+    order_series = _load_order_series(orders_path, since + horizon - tolerance if since else None)
+    if not order_series:
+        return []
+
+    order_times = [order_time for order_time, _ in order_series]
     dataset: List[Tuple[datetime, Dict[str, int], int, datetime]] = []
 
     for timestamp_str, feature_values in feature_map.items():
         base_time = _parse_timestamp(timestamp_str)
+        if since and base_time < since:
+            continue
         target = base_time + horizon
-        match = _find_order_for_target(order_series, target, tolerance)
+        match = _find_order_for_target(order_series, target, tolerance, order_times)
         if match is None:
             continue
         dataset.append((base_time, feature_values, match[1], match[0]))
@@ -303,70 +606,201 @@ def build_dataset_records(
     return dataset
 
 
-def load_model() -> Optional[Dict]:
-    if not MODEL_FILE.exists():
-        return None
-    with MODEL_FILE.open("r", encoding="utf-8") as handle:
-        try:
-            return json.load(handle)
-        except json.JSONDecodeError:
-            return None
+def get_model(path: Path | None = None) -> Optional[LoadedModel]:
+    """読み込み済みのモデル（ファイルが更新されていれば読み直す）。path 省略時は MODEL_FILE"""
+    return MODEL_REGISTRY.get(path)
+
+
+def load_model(path: Path | None = None) -> Optional[Dict]:
+    model = MODEL_REGISTRY.get(path)
+    return model.data if model is not None else None
 
 
 def save_model(model_dict: Dict) -> None:
     _ensure_data_dir()
-    with MODEL_FILE.open("w", encoding="utf-8") as handle:
+    MODEL_FILE.parent.mkdir(parents=True, exist_ok=True)
+    # 書き込み途中のファイルを読まれないよう、一時ファイルに書いてから置き換える
+    tmp_path = MODEL_FILE.with_name(MODEL_FILE.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
         json.dump(model_dict, handle, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MODEL_FILE)
 
 
-def load_latest_features() -> Optional[Tuple[str, Dict[str, int]]]:
-    detections = load_detections()
-    if not detections:
-        return None
-    feature_map = build_feature_map(detections)
-    if not feature_map:
-        return None
-    latest_ts = max(feature_map.keys())
-    return latest_ts, feature_map[latest_ts]
+def load_latest_features() -> Optional[Tuple[str, Dict[str, float]]]:
+    if STORE is not None:
+        latest_rows = STORE.latest_minutely_rows()
+        if not latest_rows:
+            return None
+        # 最新の分とその前 lookback 分だけを読む
+        start = _parse_timestamp(latest_rows[0]["timestamp"]) - timedelta(minutes=FEATURE_ENGINE.lookback)
+        return _latest_features(build_feature_map(STORE.minutely_rows(start=start.isoformat())))
+    return load_latest_features_from(DETECTIONS_FILE)
 
 
-def load_latest_features_from(path: Path) -> Optional[Tuple[str, Dict[str, int]]]:
-    detections = load_detections(path)
-    if not detections:
-        return None
-    feature_map = build_feature_map(detections)
-    if not feature_map:
-        return None
-    latest_ts = max(feature_map.keys())
-    return latest_ts, feature_map[latest_ts]
-
-
-def predict_from_features(model: Dict, features: Dict[str, int]) -> float:
-    prediction = float(model.get("intercept", 0.0))
-    for name, coef in zip(model.get("feature_names", []), model.get("coefficients", [])):
-        prediction += float(coef) * float(features.get(name, 0))
-    return max(0.0, prediction)
-
-
-def describe_influences(model: Dict, features: Dict[str, int]) -> List[Dict]:
-    influences: List[Dict] = []
-    names = model.get("feature_names", [])
-    coefs = model.get("coefficients", [])
-    for name, coef in zip(names, coefs):
-        value = float(features.get(name, 0))
-        contribution = value * float(coef)
-        influences.append(
-            {
-                "feature": name,
-                "value": value,
-                "coefficient": float(coef),
-                "contribution": contribution,
-            }
+def load_latest_features_from(path: Path) -> Optional[Tuple[str, Dict[str, float]]]:
+    if STORAGE_BACKEND != "columnar":
+        feature_map, latest_ts, minutes = _tail_feature_map(path)
+        if latest_ts is None:
+            return None
+        return _latest_features(feature_map, minutes)
+    return _latest_features(_load_feature_map(path))
+
+
+def _model_vectors(model: Dict | LoadedModel) -> Tuple[float, np.ndarray]:
+    """(切片, FEATURE_NAMES の並びの係数ベクトル)。読み込み済みのモデルなら読み込み時に作ったベクトルを使う"""
+    if not isinstance(model, LoadedModel):
+        model = MODEL_REGISTRY.find(model) or model
+    if isinstance(model, LoadedModel):
+        return model.intercept, model.coefficients
+    return float(model.get("intercept", 0.0)), MODEL_REGISTRY.align(model)
+
+
+_FEATURE_GETTER = itemgetter(*FEATURE_NAMES)
+_BASE_GETTER = itemgetter(*BASE_FEATURE_NAMES)
+
+
+def _rows_matrix(rows: Sequence[Dict], names: List[str], getter: itemgetter) -> np.ndarray:
+    count = len(rows) * len(names)
+    try:
+        values = np.fromiter(chain.from_iterable(map(getter, rows)), dtype=float, count=count)
+    except (KeyError, TypeError):
+        # 特徴量が1個のとき・特徴量が欠けているdictがあるとき
+        values = np.array([[row.get(name, 0) for name in names] for row in rows], dtype=float)
+    return values.reshape(len(rows), len(names))
+
+
+def feature_matrix(rows: Sequence[Dict[str, float]]) -> np.ndarray:
+    """特徴量dictの並びを (分数 × 特徴量数) の行列にする（列は FEATURE_NAMES の順）"""
+    return _rows_matrix(rows, FEATURE_NAMES, _FEATURE_GETTER)
+
+
+def predict_batch(model: Dict | LoadedModel, X: np.ndarray) -> np.ndarray:
+    """分ごとの予測をまとめて計算する（X は feature_matrix の行列、1回の行列積）"""
+    intercept, coefficients = _model_vectors(model)
+    return np.maximum(X @ coefficients + intercept, 0.0)
+
+
+def score_batch(model: Dict | LoadedModel, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns:
+        (分ごとの予測, 分ごと・特徴量ごとの寄与 (分数 × 特徴量数))
+    """
+    _, coefficients = _model_vectors(model)
+    return predict_batch(model, X), X * coefficients
+
+
+def predict_from_features(model: Dict | LoadedModel, features: Dict[str, int]) -> float:
+    return float(predict_batch(model, feature_matrix([features]))[0])
+
+
+def describe_influences(model: Dict | LoadedModel, features: Dict[str, int]) -> List[Dict]:
+    _, coefficients = _model_vectors(model)
+    values = feature_matrix([features])[0]
+    contributions = values * coefficients
+    model_features = set((model.data if isinstance(model, LoadedModel) else model).get("feature_names", []))
+    influences = [
+        {
+            "feature": name,
+            "value": value,
+            "coefficient": coef,
+            "contribution": contribution,
+        }
+        for name, value, coef, contribution in zip(
+            FEATURE_NAMES, values.tolist(), coefficients.tolist(), contributions.tolist()
         )
+        if name in model_features
+    ]
     influences.sort(key=lambda item: abs(item["contribution"]), reverse=True)
     return influences
 
 
+def _model_version(model: Dict) -> tuple:
+    return (
+        model.get("trained_at"),
+        model.get("intercept"),
+        tuple(model.get("feature_names", [])),
+        tuple(model.get("coefficients", [])),
+    )
+
+
+class _PredictionHistoryCache:
+    """
+    分ごとの (予測, 実測) を覚えておき、要求された期間のうち変わった分だけを計算し直す
+
+    - モデル・horizon・tolerance が変わったら全て捨てる
+    - 注文ファイルの読み込み位置が変わったら（新しい注文）期間内の対応付けをやり直す
+    - 特徴量（ラグ・移動窓を含む）の値が変わった分と新しい分だけ予測し直す
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key: Optional[tuple] = None
+        self.orders_position: Optional[tuple] = None
+        self.entries: Dict[str, Tuple[bytes, Optional[Dict]]] = {}  # timestamp -> (特徴量の値, entry)
+        self.hits = 0
+        self.misses = 0
+
+    def window(
+        self, model: Dict, cutoff: datetime | None, horizon_minutes: int, tolerance_minutes: int
+    ) -> List[Dict]:
+        feature_map, _, minutes = _tail_feature_map(None)
+        _, order_series, order_times, orders_position = _tail_orders(None)
+        horizon = timedelta(minutes=horizon_minutes)
+        tolerance = timedelta(minutes=tolerance_minutes)
+        start = bisect_left(minutes, (cutoff,)) if cutoff else 0
+        selected = minutes[start:]
+        matrix = np.zeros((0, len(FEATURE_NAMES)))
+        if selected:
+            # 期間の最初の分のラグ・移動窓に必要な分から計算する
+            lookback = timedelta(minutes=FEATURE_ENGINE.lookback)
+            context = minutes[bisect_left(minutes, (selected[0][0] - lookback,)) :]
+            _, matrix = _engineer_matrix(feature_map, [timestamp_str for _, timestamp_str in selected], context)
+
+        with self.lock:
+            key = (_model_version(model), horizon_minutes, tolerance_minutes)
+            if key != self.key or orders_position != self.orders_position:
+                self.key, self.orders_position, self.entries = key, orders_position, {}
+            entries: Dict[str, Tuple[bytes, Optional[Dict]]] = {}
+            series: List[Dict] = []
+            pending: List[Tuple[Dict, int]] = []  # 予測がまだの (entry, matrix の行)
+            for row, (base_time, timestamp_str) in enumerate(selected):
+                features = matrix[row].tobytes()
+                cached = self.entries.get(timestamp_str)
+                if cached is not None and cached[0] == features:
+                    entry = cached[1]
+                    self.hits += 1
+                else:
+                    entry = None
+                    match = _find_order_for_target(order_series, base_time + horizon, tolerance, order_times)
+                    if match is not None:
+                        entry = {
+                            "timestamp": base_time.isoformat(),
+                            "prediction": None,
+                            "actual": match[1],
+                            "actual_timestamp": match[0].isoformat(),
+                        }
+                        pending.append((entry, row))
+                    self.misses += 1
+                entries[timestamp_str] = (features, entry)
+                if entry is not None:
+                    series.append(entry)
+            # 計算し直す分はまとめて1回の行列積で予測する
+            if pending:
+                predictions = predict_batch(model, matrix[[row for _, row in pending]])
+                for (entry, _), prediction in zip(pending, predictions.tolist()):
+                    entry["prediction"] = prediction
+            # 期間外になった分は捨てる
+            self.entries = entries
+        return series
+
+
+_history_cache = _PredictionHistoryCache()
+
+
+def prediction_history_stats() -> Dict[str, int]:
+    return {"hits": _history_cache.hits, "misses": _history_cache.misses, "cached": len(_history_cache.entries)}
+
+
 def build_prediction_history(
     model: Dict,
     window_minutes: int = 60,
@@ -378,23 +812,29 @@ def build_prediction_history(
     if not model:
         return []
 
-    records = build_dataset_records(horizon_minutes, tolerance_minutes)
+    cutoff = datetime.now() - timedelta(minutes=window_minutes) if window_minutes else None
+    if STORE is None and STORAGE_BACKEND != "columnar":
+        # JSONLの追記分だけを読むキャッシュから、期間内の分だけを計算する
+        series = [dict(entry) for entry in _history_cache.window(model, cutoff, horizon_minutes, tolerance_minutes)]
+        if max_points and len(series) > max_points:
+            series = series[-max_points:]
+        return series
+
+    records = build_dataset_records(horizon_minutes, tolerance_minutes, since=cutoff)
     if not records:
         return []
 
-    cutoff = datetime.now() - timedelta(minutes=window_minutes) if window_minutes else None
-    series: List[Dict] = []
-    for base_time, features, actual, actual_time in records:
-        if cutoff and base_time < cutoff:
-            continue
-        series.append(
-            {
-                "timestamp": base_time.isoformat(),
-                "prediction": predict_from_features(model, features),
-                "actual": actual,
-                "actual_timestamp": actual_time.isoformat(),
-            }
-        )
+    records = [record for record in records if not cutoff or record[0] >= cutoff]
+    predictions = predict_batch(model, feature_matrix([record[1] for record in records]))
+    series: List[Dict] = [
+        {
+            "timestamp": base_time.isoformat(),
+            "prediction": prediction,
+            "actual": actual,
+            "actual_timestamp": actual_time.isoformat(),
+        }
+        for (base_time, _, actual, actual_time), prediction in zip(records, predictions.tolist())
+    ]
     series.sort(key=lambda item: item["timestamp"])
     if max_points and len(series) > max_points:
         series = series[-max_points:]
@@ -420,9 +860,10 @@ def load_prediction_results_text() -> str:
 
 
 def recent_orders(limit: int = 10) -> List[Dict]:
-    rows = load_orders()
-    rows.sort(key=lambda row: row.get("timestamp", ""))
-    selected = rows[-limit:]
+    if STORE is not None:
+        selected = STORE.recent_orders(limit)
+    else:
+        selected = _tail_orders(None)[0][-limit:]
     enriched: List[Dict] = []
     for row in selected:
         item = dict(row)
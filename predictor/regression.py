@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class LeastSquaresFit:
+    beta: np.ndarray  # 先頭が切片
+    std_errors: np.ndarray
+    rss: float  # 残差平方和（リッジの罰則項は含まない）
+    tss: float  # 目的変数の偏差平方和
+    n_samples: int
+
+    @property
+    def dof(self) -> int:
+        return max(int(self.n_samples - len(self.beta)), 1)
+
+    @property
+    def r2(self) -> float:
+        return 0.0 if self.tss <= 0 else max(0.0, 1 - self.rss / self.tss)
+
+    @property
+    def rmse(self) -> float:
+        return math.sqrt(self.rss / self.n_samples) if self.n_samples else 0.0
+
+
+class IncrementalLeastSquares:
+    """
+    切片付きの重回帰を QR 分解で解き、行を追加しながら解き直せるようにする
+
+    X^T X を作らずに上三角行列 R と z = Q^T y だけを保持する（条件数が2乗にならない）。
+    - 1行の追加は Givens 回転で R と z を更新する（O(p^2)、それまでの行数に依存しない）
+    - 係数は R の後退代入で求める（O(p^2)）。標準誤差は R の逆行列の行ノルムから求める
+    - ridge > 0 のときは切片以外の係数に罰則 ridge * |beta|^2 をかける（リッジ回帰）
+    - 一度も0以外の値が入っていない列（存在しないカメラの特徴量など）は R の行・列を0のまま保ち、
+      残りの列だけで解く（係数は0。SVD を使わないので追加ごとの計算量は O(p^2) のまま）
+    - それ以外の一次従属で R が退化している場合は擬似逆行列で最小ノルム解を返す（np.linalg.pinv と同じ解）
+    """
+
+    def __init__(self, n_params: int, ridge: float = 0.0):
+        self.n_params = n_params
+        self.ridge = float(ridge)
+        # 罰則は [sqrt(ridge) * I; 目的変数 0] の行を先に入れておくのと同じ
+        penalty = np.full(n_params, math.sqrt(max(self.ridge, 0.0)))
+        penalty[0] = 0.0  # 切片には罰則をかけない
+        self.R = np.diag(penalty)
+        self.z = np.zeros(n_params)
+        self.active = penalty > 0  # 0以外の値が入ったことのある列（罰則のある列も含む）
+        self.rss = 0.0  # 罰則の行を含めた残差平方和
+        self.n_samples = 0
+        self.y_mean = 0.0
+        self.y_m2 = 0.0  # 目的変数の偏差平方和
+
+    @classmethod
+    def from_data(cls, X_design: np.ndarray, y: np.ndarray, ridge: float = 0.0) -> "IncrementalLeastSquares":
+        solver = cls(np.shape(X_design)[1], ridge)
+        solver.add_many(X_design, y)
+        return solver
+
+    def add_many(self, X_design: np.ndarray, y: np.ndarray) -> None:
+        """まとめて追加する（1回の QR 分解。行数が多いときは add を繰り返すより速い）"""
+        X_design = np.asarray(X_design, dtype=float).reshape(-1, self.n_params)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        if len(y) == 0:
+            return
+        self.active |= (X_design != 0).any(axis=0)
+        self._triangularize(X_design, y)
+        self._add_targets(y)
+
+    def _triangularize(self, X_design: np.ndarray, y: np.ndarray) -> None:
+        """[R z; X y] を使っている列だけで QR 分解し直す（使っていない列の R の行・列と z は0にする）"""
+        columns = np.flatnonzero(self.active)
+        # [R z; X y] を QR 分解すると、右端の列の上 k 個が新しい z、(k, k) 成分が z で説明できない残差になる
+        stacked = np.vstack([
+            np.column_stack([self.R[:, columns], self.z]),
+            np.column_stack([X_design[:, columns], y]),
+        ])
+        augmented = np.linalg.qr(stacked, mode="r")
+        k = len(columns)
+        self.R = np.zeros((self.n_params, self.n_params))
+        self.z = np.zeros(self.n_params)
+        self.R[np.ix_(columns, columns)] = augmented[:k, :k]
+        self.z[columns] = augmented[:k, k]
+        self.rss += float(augmented[k, k]) ** 2 if augmented.shape[0] > k else 0.0
+        self._move_unexplained_to_rss()
+
+    def add(self, x_design: np.ndarray, y: float) -> None:
+        """1行追加する（Givens 回転、O(p^2)）"""
+        x = np.array(x_design, dtype=float).reshape(self.n_params)
+        # 使っていない列の R の行・列は0なので、Givens 回転で新しく入った列もそのまま扱える
+        self.active |= x != 0
+        residual = float(y)
+        R, z = self.R, self.z
+        for k in range(self.n_params):
+            if x[k] == 0.0:
+                continue
+            r = math.hypot(R[k, k], x[k])
+            c, s = R[k, k] / r, x[k] / r
+            row = R[k, k:].copy()
+            R[k, k:] = c * row + s * x[k:]
+            x[k:] = c * x[k:] - s * row
+            z_k = z[k]
+            z[k] = c * z_k + s * residual
+            residual = c * residual - s * z_k
+        self.rss += residual * residual
+        self._move_unexplained_to_rss()
+        self._add_targets([y])
+
+    def _move_unexplained_to_rss(self) -> None:
+        """
+        R が退化している（列が一次従属）場合、z のうち R beta で表せない成分も残差になる
+
+        その成分を残差平方和に移して z から除いておく（次の追加で二重に数えないため）
+        """
+        if _is_full_rank(self.R, self.active):
+            return
+        explained = self.R @ _solve(self.R, self.z, self.active)
+        unexplained = self.z - explained
+        self.rss += float(unexplained @ unexplained)
+        self.z = explained
+
+    def _add_targets(self, values) -> None:
+        """目的変数の平均と偏差平方和を更新する（まとめて追加した分と合成する）"""
+        values = np.asarray(values, dtype=float)
+        count = len(values)
+        if count == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.n_samples + count
+        delta = mean - self.y_mean
+        self.y_m2 += m2 + delta * delta * self.n_samples * count / total
+        self.y_mean += delta * count / total
+        self.n_samples = total
+
+    def fit(self) -> LeastSquaresFit:
+        beta = _solve(self.R, self.z, self.active)
+        # 罰則の行の残差（ridge * |beta|^2）を除いたものが本来の残差平方和
+        rss = self.rss - self.ridge * float(beta[1:] @ beta[1:]) if self.ridge > 0 else self.rss
+        rss = max(rss, 0.0)
+        dof = max(self.n_samples - self.n_params, 1)
+        # Cov(beta) = sigma^2 (R^T R)^-1 = sigma^2 R^-1 R^-T（リッジの場合は近似）
+        r_inv = _inverse(self.R, self.active)
+        std_errors = np.sqrt(np.maximum((rss / dof) * (r_inv**2).sum(axis=1), 1e-12))
+        return LeastSquaresFit(
+            beta=beta,
+            std_errors=std_errors,
+            rss=rss,
+            tss=max(self.y_m2, 0.0),
+            n_samples=self.n_samples,
+        )
+
+    def to_dict(self) -> Dict:
+        """model.json に保存できる形（from_dict で復元して続きから追加できる）"""
+        return {
+            "ridge": self.ridge,
+            "R": self.R.tolist(),
+            "z": self.z.tolist(),
+            "rss": self.rss,
+            "n_samples": self.n_samples,
+            "y_mean": self.y_mean,
+            "y_m2": self.y_m2,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict) -> "IncrementalLeastSquares":
+        R = np.asarray(state["R"], dtype=float)
+        solver = cls(R.shape[0], float(state.get("ridge", 0.0)))
+        solver.R = R
+        solver.z = np.asarray(state["z"], dtype=float)
+        solver.rss = float(state.get("rss", 0.0))
+        solver.n_samples = int(state.get("n_samples", 0))
+        solver.y_mean = float(state.get("y_mean", 0.0))
+        solver.y_m2 = float(state.get("y_m2", 0.0))
+        # 使っていない列は R の列が0になっている。行にも値が残っている場合（以前の形式）は分解し直す
+        solver.active |= (R != 0).any(axis=0)
+        inactive = ~solver.active
+        if (R[inactive] != 0).any() or (solver.z[inactive] != 0).any():
+            solver._triangularize(np.zeros((0, solver.n_params)), np.zeros(0))
+        return solver
+
+
+def _is_full_rank(R: np.ndarray, active: np.ndarray) -> bool:
+    """使っている列だけの R が正則か"""
+    diagonal = np.abs(np.diag(R)[active])
+    tolerance = (diagonal.max() if len(diagonal) else 0.0) * len(diagonal) * np.finfo(float).eps
+    return bool(len(diagonal)) and bool((diagonal > tolerance).all())
+
+
+def _solve(R: np.ndarray, z: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """R beta = z を使っている列だけで解く（上三角なので後退代入）。使っていない列の係数は0、退化していれば最小ノルム解"""
+    columns = np.flatnonzero(active)
+    beta = np.zeros(len(z))
+    R_active, z_active = R[np.ix_(columns, columns)], z[columns]
+    if not _is_full_rank(R, active):
+        beta[columns] = np.linalg.pinv(R_active) @ z_active if len(columns) else 0.0
+        return beta
+    solved = np.zeros(len(columns))
+    for k in range(len(columns) - 1, -1, -1):
+        solved[k] = (z_active[k] - R_active[k, k + 1 :] @ solved[k + 1 :]) / R_active[k, k]
+    beta[columns] = solved
+    return beta
+
+
+def _inverse(R: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """使っている列だけの R の逆行列（使っていない列の行・列は0）"""
+    columns = np.flatnonzero(active)
+    inverse = np.zeros_like(R)
+    if not len(columns):
+        return inverse
+    R_active = R[np.ix_(columns, columns)]
+    if _is_full_rank(R, active):
+        inverse[np.ix_(columns, columns)] = np.linalg.solve(R_active, np.eye(len(columns)))
+    else:
+        inverse[np.ix_(columns, columns)] = np.linalg.pinv(R_active)
+    return inverse
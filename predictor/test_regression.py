@@ -0,0 +1,138 @@
+import numpy as np
+
+from regression import IncrementalLeastSquares
+
+
+def _design(n_rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = rng.poisson(20, size=(n_rows, 5)).astype(float)
+    X[:, 4] = 2 * X[:, 3]  # 一次従属な列
+    X[:, 2] = 0.0  # 常に0の列（カメラが無い場合）
+    X_design = np.hstack([np.ones((n_rows, 1)), X])
+    y = X_design @ np.array([1.0, 0.3, -0.2, 0.0, 0.1, 0.05]) + rng.normal(size=n_rows)
+    return X_design, y
+
+
+def _lstsq_reference(X_design, y):
+    beta, *_ = np.linalg.lstsq(X_design, y, rcond=None)
+    residuals = y - X_design @ beta
+    return beta, float(residuals @ residuals)
+
+
+def test_add_many_matches_lstsq_on_rank_deficient_design():
+    X_design, y = _design(200)
+    beta, rss = _lstsq_reference(X_design, y)
+    fit = IncrementalLeastSquares.from_data(X_design, y).fit()
+    np.testing.assert_allclose(fit.beta, beta, atol=1e-8)
+    np.testing.assert_allclose(fit.rss, rss, rtol=1e-9)
+
+
+def test_add_matches_add_many_on_rank_deficient_design():
+    X_design, y = _design(200, seed=1)
+    beta, rss = _lstsq_reference(X_design, y)
+    one_by_one = IncrementalLeastSquares(X_design.shape[1])
+    for row, target in zip(X_design, y):
+        one_by_one.add(row, target)
+    chunked = IncrementalLeastSquares(X_design.shape[1])
+    for start in range(0, len(y), 37):
+        chunked.add_many(X_design[start : start + 37], y[start : start + 37])
+    for solver in (one_by_one, chunked):
+        fit = solver.fit()
+        np.testing.assert_allclose(fit.beta, beta, atol=1e-8)
+        np.testing.assert_allclose(fit.rss, rss, rtol=1e-9)
+        np.testing.assert_allclose(fit.tss, float(((y - y.mean()) ** 2).sum()), rtol=1e-9)
+        assert fit.n_samples == len(y)
+
+
+def test_std_errors_match_normal_equations_on_full_rank_design():
+    rng = np.random.default_rng(2)
+    X_design = np.hstack([np.ones((300, 1)), rng.normal(size=(300, 3))])
+    y = X_design @ np.array([0.5, 1.0, -2.0, 0.25]) + rng.normal(size=300)
+    fit = IncrementalLeastSquares.from_data(X_design, y).fit()
+    beta, rss = _lstsq_reference(X_design, y)
+    covariance = rss / (300 - 4) * np.linalg.inv(X_design.T @ X_design)
+    np.testing.assert_allclose(fit.std_errors, np.sqrt(np.diag(covariance)), rtol=1e-8)
+
+
+def test_ridge_matches_closed_form_and_leaves_intercept_unpenalised():
+    X_design, y = _design(100, seed=3)
+    alpha = 5.0
+    penalty = alpha * np.eye(X_design.shape[1])
+    penalty[0, 0] = 0.0
+    expected = np.linalg.solve(X_design.T @ X_design + penalty, X_design.T @ y)
+    solver = IncrementalLeastSquares.from_data(X_design[:60], y[:60], ridge=alpha)
+    for row, target in zip(X_design[60:], y[60:]):
+        solver.add(row, target)
+    fit = solver.fit()
+    np.testing.assert_allclose(fit.beta, expected, atol=1e-8)
+    residuals = y - X_design @ expected
+    np.testing.assert_allclose(fit.rss, float(residuals @ residuals), rtol=1e-8)
+
+
+def test_state_round_trip_continues_from_snapshot():
+    X_design, y = _design(120, seed=4)
+    solver = IncrementalLeastSquares.from_data(X_design[:80], y[:80])
+    restored = IncrementalLeastSquares.from_dict(solver.to_dict())
+    restored.add_many(X_design[80:], y[80:])
+    beta, rss = _lstsq_reference(X_design, y)
+    fit = restored.fit()
+    np.testing.assert_allclose(fit.beta, beta, atol=1e-8)
+    np.testing.assert_allclose(fit.rss, rss, rtol=1e-9)
+
+
+def _full_rank_except_zero_columns(n_rows: int, seed: int):
+    """一次従属な列は無く、常に0の列（存在しないカメラ）だけがある設計行列"""
+    rng = np.random.default_rng(seed)
+    X = rng.poisson(20, size=(n_rows, 6)).astype(float)
+    X[:, [1, 4]] = 0.0
+    X_design = np.hstack([np.ones((n_rows, 1)), X])
+    y = X_design @ rng.normal(size=X_design.shape[1]) + rng.normal(size=n_rows)
+    return X_design, y
+
+
+def test_zero_columns_are_solved_without_pseudo_inverse(monkeypatch):
+    X_design, y = _full_rank_except_zero_columns(150, seed=5)
+    beta, rss = _lstsq_reference(X_design, y)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("常に0の列だけなら pinv は使わない")
+
+    monkeypatch.setattr(np.linalg, "pinv", fail)
+    solver = IncrementalLeastSquares.from_data(X_design[:50], y[:50])
+    for row, target in zip(X_design[50:], y[50:]):
+        solver.add(row, target)
+    fit = solver.fit()
+    np.testing.assert_allclose(fit.beta, beta, atol=1e-8)
+    np.testing.assert_allclose(fit.rss, rss, rtol=1e-9)
+    assert (fit.beta[[2, 5]] == 0.0).all()
+
+
+def test_column_that_starts_later_matches_lstsq():
+    X_design, y = _full_rank_except_zero_columns(200, seed=6)
+    rng = np.random.default_rng(7)
+    X_design[120:, 2] = rng.poisson(5, size=80)  # 途中からカメラが増えた
+    y[120:] += 0.7 * X_design[120:, 2]
+    beta, rss = _lstsq_reference(X_design, y)
+    for first_rows in (X_design[:100], X_design[:130]):
+        solver = IncrementalLeastSquares.from_data(first_rows, y[: len(first_rows)])
+        for row, target in zip(X_design[len(first_rows) :], y[len(first_rows) :]):
+            solver.add(row, target)
+        fit = solver.fit()
+        np.testing.assert_allclose(fit.beta, beta, atol=1e-8)
+        np.testing.assert_allclose(fit.rss, rss, rtol=1e-9)
+
+
+def test_from_dict_accepts_state_factored_with_all_columns():
+    X_design, y = _full_rank_except_zero_columns(150, seed=8)
+    # 以前の形式: 全ての列で QR 分解した R（0の列に対応する行に値が残る）
+    augmented = np.linalg.qr(np.column_stack([X_design[:100], y[:100]]), mode="r")
+    p = X_design.shape[1]
+    state = IncrementalLeastSquares.from_data(X_design[:100], y[:100]).to_dict()
+    state.update(R=augmented[:p, :p].tolist(), z=augmented[:p, p].tolist(), rss=float(augmented[p, p]) ** 2)
+    restored = IncrementalLeastSquares.from_dict(state)
+    for row, target in zip(X_design[100:], y[100:]):
+        restored.add(row, target)
+    beta, rss = _lstsq_reference(X_design, y)
+    fit = restored.fit()
+    np.testing.assert_allclose(fit.beta, beta, atol=1e-8)
+    np.testing.assert_allclose(fit.rss, rss, rtol=1e-9)
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import math
+import os
 from datetime import datetime, timezone
 from typing import Dict, List, Tuple
 
 import numpy as np
 
-from predict_realtime import FEATURE_NAMES, build_dataset_records, save_model
+from predict_realtime import FEATURE_ENGINE, FEATURE_NAMES, build_dataset_records, feature_matrix, save_model
+from regression import IncrementalLeastSquares
+
+# リッジ回帰の罰則の強さ（0 なら通常の最小二乗法）
+RIDGE_ALPHA = float(os.environ.get("PREDICTOR_RIDGE_ALPHA", "0"))
 
 
 def _approx_two_tailed_p_value(t_stat: float) -> float:
@@ -22,41 +27,18 @@ def _build_matrices() -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
     if not dataset:
         raise RuntimeError("学習用のデータが不足しています。detections_minutely.jsonl と orders.jsonl を確認してください。")
 
-    features: List[List[float]] = []
-    targets: List[float] = []
-    timestamps: List[str] = []
-    order_times: List[str] = []
-    for base_time, feature_values, order_count, order_time in dataset:
-        features.append([float(feature_values.get(name, 0)) for name in FEATURE_NAMES])
-        targets.append(float(order_count))
-        timestamps.append(base_time.isoformat())
-        order_times.append(order_time.isoformat())
-
-    X = np.asarray(features, dtype=float)
-    y = np.asarray(targets, dtype=float)
+    X = feature_matrix([feature_values for _, feature_values, _, _ in dataset])
+    y = np.asarray([order_count for _, _, order_count, _ in dataset], dtype=float)
+    timestamps: List[str] = [base_time.isoformat() for base_time, _, _, _ in dataset]
+    order_times: List[str] = [order_time.isoformat() for _, _, _, order_time in dataset]
     return X, y, timestamps, order_times
 
 
-def train(save: bool = True) -> Tuple[Dict, Dict]:
-    X, y, timestamps, order_times = _build_matrices()
-    n_samples, n_features = X.shape
-
-    X_design = np.hstack([np.ones((n_samples, 1)), X])
-    xtx = X_design.T @ X_design
-    xtx_inv = np.linalg.pinv(xtx)
-    beta = xtx_inv @ X_design.T @ y
-    predictions = X_design @ beta
-    residuals = y - predictions
-
-    dof = max(int(n_samples - len(beta)), 1)
-    ss_res = float(residuals @ residuals)
-    ss_tot = float(((y - y.mean()) ** 2).sum()) if n_samples > 1 else 0.0
-    r_squared = 0.0 if ss_tot == 0 else max(0.0, 1 - ss_res / ss_tot)
-    rmse = math.sqrt(ss_res / n_samples)
-
-    sigma_sq = ss_res / dof if dof > 0 else 0.0
-    covariance = sigma_sq * xtx_inv
-    std_errors = np.sqrt(np.maximum(np.diag(covariance), 1e-12))
+def model_from_solver(solver: IncrementalLeastSquares, trained_until: str | None = None) -> Dict:
+    """解き直した結果を model.json の形にする（学習スクリプトとオンライン学習で共通）"""
+    fit = solver.fit()
+    beta = fit.beta
+    std_errors = fit.std_errors
 
     t_stats = [float(b / se) if se else 0.0 for b, se in zip(beta, std_errors)]
     p_values = [_approx_two_tailed_p_value(t) for t in t_stats]
@@ -83,17 +65,38 @@ def train(save: bool = True) -> Tuple[Dict, Dict]:
             }
         )
 
-    model_dict = {
+    return {
         "intercept": intercept,
         "coefficients": coefficients,
         "feature_names": FEATURE_NAMES,
-        "r2": r_squared,
-        "rmse": rmse,
-        "trained_samples": n_samples,
+        # ラグ・移動窓・時刻の設定（PREDICTOR_FEATURE_*）
+        "feature_config": FEATURE_ENGINE.config(),
+        "r2": fit.r2,
+        "rmse": fit.rmse,
+        "trained_samples": fit.n_samples,
         "trained_at": datetime.now(timezone.utc).isoformat(),
         "results": results_table,
+        "ridge": solver.ridge,
+        # 新しいデータを追加して解き直すための状態（IncrementalLeastSquares.from_dict）
+        "least_squares": solver.to_dict(),
+        # 学習に使った最後の分（オンライン学習はこの次の分から追加する）
+        "trained_until": trained_until,
     }
 
+
+def train(save: bool = True, ridge: float | None = None) -> Tuple[Dict, Dict]:
+    X, y, timestamps, order_times = _build_matrices()
+    n_samples, n_features = X.shape
+    ridge = RIDGE_ALPHA if ridge is None else ridge
+
+    # X^T X の逆行列ではなく QR 分解で解く（条件数が2乗にならない）
+    X_design = np.hstack([np.ones((n_samples, 1)), X])
+    solver = IncrementalLeastSquares.from_data(X_design, y, ridge)
+    model_dict = model_from_solver(solver, timestamps[-1])
+    beta = np.array([model_dict["intercept"]] + model_dict["coefficients"])
+    predictions = X_design @ beta
+    residuals = y - predictions
+
     artifacts = {
         "timestamps": timestamps,
         "order_timestamps": order_times,